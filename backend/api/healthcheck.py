@@ -3,7 +3,8 @@ import logging
 from fastapi import APIRouter, HTTPException
 from fastapi.responses import JSONResponse
 
-from backend.db.schemas import HealthCheckResponse
+from backend.db.schemas import HealthCheckResponse, ReadinessResponse
+from backend.health import readiness_probe
 
 router = APIRouter(
     prefix="/api",
@@ -13,16 +14,32 @@ router = APIRouter(
 logger = logging.getLogger("healthcheck")
 
 
+@router.get(
+    "/health/live",
+    response_model=HealthCheckResponse,
+    summary="Liveness check endpoint",
+    responses={
+        200: {"description": "Process is up and its event loop responsive"},
+        503: {"description": "Service is unhealthy"},
+    },
+)
 @router.get(
     "/health",
     response_model=HealthCheckResponse,
-    summary="Health check endpoint",
+    summary="Health check endpoint, same as /health/live",
     responses={
         200: {"description": "Service is healthy"},
         503: {"description": "Service is unhealthy"},
     },
 )
 async def health_check():
+    """
+    Tell the orchestrator whether to restart the process.
+
+    Touches no dependency on purpose: a slow database or a loading model
+    must take the instance out of rotation (`/api/health/ready`), not get
+    it restarted.
+    """
     try:
         result = {
             "status": "healthy",
@@ -31,3 +48,42 @@ async def health_check():
     except Exception as e:
         logger.exception("Health check failed")
         raise HTTPException(status_code=503, detail=f"Service unhealthy: {str(e)}")
+
+
+@router.get(
+    "/health/ready",
+    response_model=ReadinessResponse,
+    summary="Readiness check endpoint",
+    responses={
+        200: {"description": "Model is loaded, the service can take uploads"},
+        503: {
+            "description": (
+                "Model is loading or failed, inference queue is full or the "
+                "database does not answer"
+            ),
+            "content": {
+                "application/json": {
+                    "example": {
+                        "status": "not_ready",
+                        "model": "ready",
+                        "checks": {
+                            "model": "ok",
+                            "inference_queue": "ok",
+                            "database": "pool exhausted",
+                        },
+                    }
+                }
+            },
+        },
+    },
+)
+async def readiness_check():
+    """
+    Tell load balancers whether to route inference traffic here.
+
+    `/api/health/live` answers as soon as the process is up, this one only
+    while the model is loaded, the inference queue has room and the
+    database answers. Results are cached for HEALTH_CACHE_TTL_S.
+    """
+    ready, result = await readiness_probe.check()
+    return JSONResponse(result, status_code=200 if ready else 503)
@@ -1,25 +1,59 @@
-import io
+import asyncio
+import json
 import logging
-import os
-from typing import Optional
+import math
+import uuid
+from contextlib import nullcontext
+from typing import List, NamedTuple, Optional, Tuple
 
-from fastapi import APIRouter, Depends, File, HTTPException, UploadFile, status
-from fastapi.responses import JSONResponse
-from PIL import Image, UnidentifiedImageError
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, File, Form, HTTPException, Query, UploadFile, status
+from fastapi.responses import JSONResponse, StreamingResponse
+from PIL import UnidentifiedImageError
 
 from backend import service
+from backend.cache import content_key
 from backend.config import get_settings
-from backend.db import crud
-from backend.db.database import get_db
+from backend.db.item_types import item_type_registry
 from backend.db.schemas import DetectionResult, FoundItemCreate
-from backend.utils.gps import (extract_gps_coordinates,
-                               generate_random_coordinates)
+from backend.db.writer import WriterFull, queue_found_items
+from backend.executor import InferenceUnavailable
+from backend.metrics import UPLOAD_STAGE_SECONDS, observe_prediction, timed
+from backend.utils.geo import valid_coordinates
+from backend.utils.gps import generate_random_coordinates
+from backend.utils.imaging import SNIFF_BYTES, decode_image, dhash, sniff_format
 
 settings = get_settings()
 logger = logging.getLogger("image_detection")
 
 
+class PredictionFailed(Exception):
+    pass
+
+
+class Classification(NamedTuple):
+    """What the model made of an upload, cached under the hash of its bytes"""
+
+    top_conf: float
+    top_name: str
+    explosion_radius: Optional[float]
+    # item type to save a found item as, None below the confidence threshold
+    # or when the class matches no item type
+    type_id: Optional[uuid.UUID]
+    # EXIF GPS of the uploaded bytes, the same for every exact copy
+    gps: Optional[Tuple[float, float]]
+    # random location of bytes without valid GPS, cached with the class so
+    # a resubmitted copy is placed at the same point and merges as a sighting
+    random_location: Optional[Tuple[float, float]]
+
+
+class Detection(NamedTuple):
+    classification: Classification
+    # served from the cache, not from a fresh prediction
+    cached: bool
+    # perceptual hash to cache the classification under
+    phash: Optional[int]
+
+
 router = APIRouter(
     prefix="/api",
     tags=["Image Detection"],
@@ -49,7 +83,9 @@ router = APIRouter(
         400: {"description": "Invalid image file or unsupported format"},
         413: {"description": "File too large (max 2MB)"},
         415: {"description": "Unsupported media type"},
+        422: {"description": "Coordinates out of range"},
         500: {"description": "Prediction service error"},
+        503: {"description": "Model is loading or inference queue is full"},
     },
 )
 async def upload_image(
@@ -57,148 +93,432 @@ async def upload_image(
         ...,
         description="Image file to analyze (PNG, JPEG, WebP, HEIC/HEIF). Max size: 2MB",
     ),
-    lat: Optional[float] = None,
-    lon: Optional[float] = None,
-    db: Session = Depends(get_db),
+    lat: Optional[float] = Query(None, ge=-90, le=90),
+    lon: Optional[float] = Query(None, ge=-180, le=180),
 ):
+    if lat is not None and not math.isfinite(lat):
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail=f"lat {lat} is not within -90..90",
+        )
+    if lon is not None and not math.isfinite(lon):
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail=f"lon {lon} is not within -180..180",
+        )
     if not file.content_type.startswith("image/"):
         raise HTTPException(status_code=400, detail="Uploaded file is not an image")
 
-    validate_file_size_type(file)
+    try:
+        with timed(UPLOAD_STAGE_SECONDS, stage="read"):
+            content = await read_upload(file)
+        key = content_key(content)
+        outcome, computed = await _classify_cached(content, key)
+    except InferenceUnavailable as e:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=str(e),
+            headers={"Retry-After": str(e.retry_after)},
+        )
+    except PredictionFailed as e:
+        return JSONResponse(
+            {"error": "prediction_failed", "detail": str(e)}, status_code=500
+        )
+    finally:
+        await file.close()
 
+    if outcome.cached:
+        logger.info(f"Cache hit for upload {key}, skipping prediction")
+    lat, lon = _coordinates(outcome.classification, lat, lon)
+    found_item = _found_item(outcome.classification, lat, lon)
     try:
-        content = await file.read()
-        try:
-            img_original = Image.open(io.BytesIO(content))
-            if lat is None or lon is None:
-                gps_coords = extract_gps_coordinates(img_original)
-                if gps_coords:
-                    lat, lon = gps_coords
-                    logger.info(
-                        f"Extracted GPS coordinates from image: lat={lat}, lon={lon}"
-                    )
-                else:
-                    lat, lon = generate_random_coordinates()
-                    logger.info(
-                        f"No GPS data found. Using random coordinates: lat={lat:.4f}, lon={lon:.4f}"
+        if found_item is not None:
+            with timed(UPLOAD_STAGE_SECONDS, stage="save"):
+                saved, _ = queue_found_items([found_item])
+            logger.info(
+                f"Queued {'found item' if saved else 'sighting'} for saving "
+                f"at ({found_item.lat}, {found_item.lon})"
+            )
+        if computed:
+            _remember(key, outcome)
+    except WriterFull as e:
+        logger.warning(f"Warning: Failed to save prediction to database: {str(e)}")
+
+    return JSONResponse(
+        _response(outcome.classification, lat, lon),
+        status_code=200,
+        headers={"X-Cache": "HIT" if outcome.cached else "MISS"},
+    )
+
+
+@router.post(
+    "/images/batch",
+    summary="Detect objects in many uploaded images",
+    response_description="One NDJSON line per image as soon as it is classified",
+    responses={
+        200: {
+            "description": "Stream of per-image results followed by a summary line",
+            "content": {
+                "application/x-ndjson": {
+                    "example": (
+                        '{"index": 1, "filename": "b.jpg", "status": 200, '
+                        '"cached": false, "top_conf": 0.95, "top_name": "mortars", '
+                        '"lat": 50.45, "lon": 30.52, "explosion_radius": 20.0}\n'
+                        '{"index": 0, "filename": "a.txt", "status": 400, '
+                        '"detail": "Uploaded file is not an image"}\n'
+                        '{"summary": {"files": 2, "saved": 1, "sightings": 0}}\n'
                     )
+                }
+            },
+        },
+        413: {"description": "Too many files in one batch"},
+        422: {"description": "Malformed coordinate overrides"},
+    },
+)
+async def upload_images_batch(
+    files: List[UploadFile] = File(
+        ..., description="Image files to analyze, same limits as /api/image"
+    ),
+    coords: Optional[str] = Form(
+        None,
+        description=(
+            "JSON list aligned with `files`, each entry "
+            '{"lat": float, "lon": float} or null to use the image EXIF'
+        ),
+    ),
+):
+    """
+    Classify a batch of images, e.g. photos synced after reconnecting.
 
-            img = img_original.convert("RGB")
-        except UnidentifiedImageError:
-            raise HTTPException(
-                status_code=400, detail="Uploaded file is not a valid image"
-            )
+    Images go through the batched inference path concurrently and every
+    result is streamed back as an NDJSON line as soon as it is ready, in
+    completion order; `index` refers to the position in `files`. The found
+    item of each image is queued as soon as the image is classified, the
+    write-behind writer inserts them in bulk; the final summary line reports
+    how many were queued, and how many were merged as sightings of recent
+    found items.
+    """
+    if len(files) > settings.BATCH_MAX_FILES:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"At most {settings.BATCH_MAX_FILES} files per batch",
+        )
+    overrides = _parse_coords(coords, len(files))
 
+    uploads = []
+    for index, file in enumerate(files):
         try:
-            results = service.predict(img)
-        except Exception as e:
-            return JSONResponse(
-                {"error": "prediction_failed", "detail": str(e)}, status_code=500
-            )
+            if not file.content_type.startswith("image/"):
+                raise HTTPException(
+                    status_code=400, detail="Uploaded file is not an image"
+                )
+            uploads.append((index, file.filename, await read_upload(file), None))
+        except HTTPException as e:
+            uploads.append((index, file.filename, None, e))
+        finally:
+            await file.close()
 
-        top_conf = results[0].probs.top1conf
-        top_name = results[0].names[results[0].probs.top1]
-        item_type = None
+    return StreamingResponse(
+        _stream_batch(uploads, overrides), media_type="application/x-ndjson"
+    )
 
-        if float(top_conf) >= settings.MIN_PREDICTION_CONFIDENCE:
-            try:
-                item_type = crud.get_item_type_by_title(db, top_name)
 
-                if item_type is not None:
-                    found_item_data = FoundItemCreate(
-                        lat=lat, lon=lon, type_id=item_type.id
-                    )
-                    saved_item = crud.create_found_item(db, found_item_data)
-                    logger.info(
-                        f"Saved found item to database: {saved_item.id} at ({lat}, {lon})"
-                    )
-                elif not item_type:
-                    logger.warning(
-                        f"Item type '{top_name}' not found in database. Skipping save."
-                    )
-            except Exception as e:
-                logger.warning(
-                    f"Warning: Failed to save prediction to database: {str(e)}"
-                )
+def _parse_coords(coords: Optional[str], count: int):
+    if coords is None:
+        return [(None, None)] * count
+    try:
+        entries = json.loads(coords)
+        if not isinstance(entries, list) or len(entries) != count:
+            raise ValueError(f"expected a list of {count} entries")
+        return [
+            (None, None) if entry is None else _coordinate_pair(entry)
+            for entry in entries
+        ]
+    except (ValueError, TypeError, KeyError) as e:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail=f"Invalid coords: {e}",
+        )
+
+
+def _coordinate_pair(entry: dict) -> Tuple[float, float]:
+    lat, lon = float(entry["lat"]), float(entry["lon"])
+    if not (math.isfinite(lat) and -90 <= lat <= 90):
+        raise ValueError(f"lat {entry['lat']} is not within -90..90")
+    if not (math.isfinite(lon) and -180 <= lon <= 180):
+        raise ValueError(f"lon {entry['lon']} is not within -180..180")
+    return lat, lon
+
 
-        response = {
-            "top_conf": float(top_conf),
-            "top_name": str(top_name),
-            "lat": lat,
-            "lon": lon,
-            "explosion_radius": item_type.explosion_radius if item_type else None,
-        }
-        return JSONResponse(response, status_code=200)
+async def _stream_batch(uploads, overrides):
+    # one batch request never holds more admission slots than fit in a batch
+    slots = asyncio.Semaphore(settings.INFERENCE_MAX_BATCH_SIZE)
+    saved = merged = 0
+
+    async def process(index, filename, content, error):
+        nonlocal saved, merged
+        line = {"index": index, "filename": filename}
+        if error is not None:
+            return {**line, "status": error.status_code, "detail": error.detail}
+
+        key = content_key(content)
+        try:
+            outcome, computed = await _classify_cached(content, key, slots)
+        except InferenceUnavailable as e:
+            return {**line, "status": 503, "detail": str(e)}
+        except PredictionFailed as e:
+            return {
+                **line,
+                "status": 500,
+                "error": "prediction_failed",
+                "detail": str(e),
+            }
+        except HTTPException as e:
+            return {**line, "status": e.status_code, "detail": e.detail}
+
+        lat, lon = _coordinates(outcome.classification, *overrides[index])
+        found_item = _found_item(outcome.classification, lat, lon)
+        try:
+            # queued right away, a client dropping the stream loses nothing
+            # classified so far
+            if found_item is not None:
+                new, sightings = queue_found_items([found_item])
+                saved += new
+                merged += sightings
+            if computed:
+                _remember(key, outcome)
+        except WriterFull as e:
+            logger.warning(
+                f"Warning: Failed to save batch prediction to database: {str(e)}"
+            )
+        result = _response(outcome.classification, lat, lon)
+        return {**line, "status": 200, "cached": outcome.cached, **result}
+
+    tasks = [asyncio.ensure_future(process(*upload)) for upload in uploads]
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            yield json.dumps(await next_done) + "\n"
+
+        if saved or merged:
+            logger.info(
+                f"Queued {saved} found items and {merged} sightings from batch upload"
+            )
+        summary = {"files": len(uploads), "saved": saved, "sightings": merged}
+        yield json.dumps({"summary": summary}) + "\n"
     finally:
-        await file.close()
+        for task in tasks:
+            task.cancel()
 
 
-def validate_file_size_type(upload_file: UploadFile, max_bytes: int = 2 * 1024 * 1024):
-    """Validate uploaded file-ish object for allowed mime/type and size
+async def _classify_cached(
+    content: bytes, key: str, slots: Optional[asyncio.Semaphore] = None
+) -> Tuple[Detection, bool]:
+    """Classification of an upload from the cache, or computed once
 
-    This function will read/seek the underlying file object but will restore
-    the cursor to the start so the file can be read again by the caller
+    Concurrent uploads of the same bytes share one computation. Returns the
+    detection and whether this call computed it, a computed classification
+    is cached by the caller with `_remember` once its found item is queued.
     """
-    accepted_mimes = {
-        "image/png",
-        "image/jpeg",
-        "image/jpg",
-        "image/webp",
-        "image/heic",
-        "image/heif",
-    }
+    classification = service.prediction_cache.get(key)
+    if classification is not None:
+        return Detection(classification, True, None), False
 
-    if upload_file.content_type not in accepted_mimes:
-        raise HTTPException(
-            status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
-            detail=f"Unsupported media type: {upload_file.content_type}",
+    batch_slot = slots if slots is not None else nullcontext()
+    async with batch_slot, service.executor.admit():
+        outcome, computed = await service.prediction_cache.compute_once(
+            key, lambda: _classify(content, key)
         )
+    return outcome._replace(cached=outcome.cached or not computed), computed
+
 
-    fobj = upload_file.file
+async def _classify(content: bytes, key: str) -> Detection:
+    """Decode and classify one upload
 
+    Nothing is cached or written to the database here, the coordinates
+    and whether to save a found item are decided for each upload.
+    """
     try:
-        fobj.seek(0, os.SEEK_END)
-        size = fobj.tell()
-    except Exception:
-        size = 0
-        chunks = []
-        fobj.seek(0)
-        while True:
-            chunk = fobj.read(64 * 1024)
-            if not chunk:
-                break
-            chunks.append(chunk)
-            size += len(chunk)
-            if size > max_bytes:
-                raise HTTPException(
-                    status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
-                    detail="Too large",
-                )
-        fobj.seek(0)
+        target_size = await service.get_input_size()
+    except InferenceUnavailable:
+        raise
+    except Exception as e:
+        raise PredictionFailed(str(e)) from e
 
-    if size > max_bytes:
-        fobj.seek(0)
+    try:
+        with timed(UPLOAD_STAGE_SECONDS, stage="decode"):
+            img, gps_coords = await asyncio.to_thread(
+                decode_image, content, target_size
+            )
+    except UnidentifiedImageError:
         raise HTTPException(
-            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, detail="Too large"
+            status_code=400, detail="Uploaded file is not a valid image"
+        )
+    except (OSError, SyntaxError, ValueError):
+        # truncated or corrupt pixel data behind a valid header
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid image file"
         )
 
+    phash = None
+    if settings.PREDICTION_CACHE_PHASH:
+        with timed(UPLOAD_STAGE_SECONDS, stage="phash"):
+            phash = await asyncio.to_thread(dhash, img)
+        similar = service.prediction_cache.get_similar(phash)
+        if similar is not None:
+            logger.info(f"Upload {key} matches a cached re-encoded copy")
+            # only the class is shared, the location is this photo's own
+            classification = similar._replace(
+                gps=gps_coords, random_location=_random_location(gps_coords)
+            )
+            return Detection(classification, True, phash)
+
     try:
-        fobj.seek(0)
-        with Image.open(fobj) as img:
-            img.verify()
-            fmt = (img.format or "").lower()
-            if fmt not in {"jpeg", "png", "gif", "webp", "heic", "heif"}:
-                pass
-    except UnidentifiedImageError:
-        fobj.seek(0)
+        # queueing for a batch included, not only the forward pass
+        with timed(UPLOAD_STAGE_SECONDS, stage="inference"):
+            prediction = await service.scheduler.submit(img)
+    except Exception as e:
+        raise PredictionFailed(str(e)) from e
+
+    top_conf = float(prediction.top_conf)
+    top_name = str(prediction.top_name)
+    observe_prediction(top_name, top_conf)
+    item_type = None
+
+    if top_conf >= settings.MIN_PREDICTION_CONFIDENCE:
+        try:
+            await item_type_registry.ensure_loaded()
+            item_type = item_type_registry.get_by_title(top_name)
+            if item_type is None:
+                logger.warning(
+                    f"Item type '{top_name}' not found in database. Skipping save."
+                )
+        except Exception as e:
+            logger.warning(f"Warning: Failed to look up item type: {str(e)}")
+
+    classification = Classification(
+        top_conf=top_conf,
+        top_name=top_name,
+        explosion_radius=item_type.explosion_radius if item_type else None,
+        type_id=item_type.id if item_type else None,
+        gps=gps_coords,
+        random_location=_random_location(gps_coords),
+    )
+    return Detection(classification, False, phash)
+
+
+def _random_location(
+    gps: Optional[Tuple[float, float]],
+) -> Optional[Tuple[float, float]]:
+    """A random location for an upload whose EXIF holds no valid GPS
+
+    EXIF GPS that is not finite or out of range, e.g. from 0/0 rationals,
+    counts as missing.
+    """
+    if gps and valid_coordinates(*gps):
+        return None
+    if gps:
+        logger.warning(f"Ignoring invalid GPS coordinates from image: {gps}")
+    return generate_random_coordinates()
+
+
+def _coordinates(
+    classification: Classification, lat: Optional[float], lon: Optional[float]
+) -> Tuple[float, float]:
+    """Location of one upload: the given one, its EXIF GPS or a random one
+
+    The random location is drawn once per classification, exact copies
+    served from the cache are placed at the same point.
+    """
+    if lat is not None and lon is not None:
+        return lat, lon
+    if classification.random_location is None:
+        lat, lon = classification.gps
+        logger.info(f"Extracted GPS coordinates from image: lat={lat}, lon={lon}")
+    else:
+        lat, lon = classification.random_location
+        logger.info(
+            f"No GPS data found. Using random coordinates: lat={lat:.4f}, lon={lon:.4f}"
+        )
+    return lat, lon
+
+
+def _found_item(
+    classification: Classification, lat: float, lon: float
+) -> Optional[FoundItemCreate]:
+    if classification.type_id is None:
+        return None
+    return FoundItemCreate(lat=lat, lon=lon, type_id=classification.type_id)
+
+
+def _response(classification: Classification, lat: float, lon: float) -> dict:
+    return {
+        "top_conf": classification.top_conf,
+        "top_name": classification.top_name,
+        "lat": lat,
+        "lon": lon,
+        "explosion_radius": classification.explosion_radius,
+    }
+
+
+def _remember(key: str, outcome: Detection):
+    """Cache a computed classification, only once its found item is queued
+
+    An upload whose found item could not be queued is classified again the
+    next time, rather than served from the cache without ever being saved.
+    """
+    service.prediction_cache.put(key, outcome.classification, outcome.phash)
+
+
+ACCEPTED_MIMES = {
+    "image/png",
+    "image/jpeg",
+    "image/jpg",
+    "image/webp",
+    "image/heic",
+    "image/heif",
+}
+ACCEPTED_FORMATS = {"jpeg", "png", "gif", "webp", "heif"}
+MAX_UPLOAD_BYTES = 2 * 1024 * 1024
+CHUNK_SIZE = 64 * 1024
+
+
+async def read_upload(upload_file: UploadFile, max_bytes: int = MAX_UPLOAD_BYTES):
+    """Read an upload in one streaming pass, validating type and size
+
+    The declared mime type is checked first, then the format is sniffed from
+    the magic bytes of the first chunk and the size limit is enforced while
+    reading, so oversized or non-image bodies are rejected without being
+    buffered in full. Returns the file content.
+    """
+    if upload_file.content_type not in ACCEPTED_MIMES:
         raise HTTPException(
             status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
-            detail="Uploaded file is not a valid image",
+            detail=f"Unsupported media type: {upload_file.content_type}",
         )
-    except Exception:
-        fobj.seek(0)
+    if upload_file.size is not None and upload_file.size > max_bytes:
         raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid image file"
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, detail="Too large"
         )
 
-    fobj.seek(0)
+    content = bytearray()
+    while True:
+        chunk = await upload_file.read(CHUNK_SIZE)
+        if not chunk:
+            break
+        if not content and sniff_format(chunk[:SNIFF_BYTES]) not in ACCEPTED_FORMATS:
+            raise HTTPException(
+                status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
+                detail="Uploaded file is not a valid image",
+            )
+        content += chunk
+        if len(content) > max_bytes:
+            raise HTTPException(
+                status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                detail="Too large",
+            )
+
+    if not content:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid image file"
+        )
+    return bytes(content)
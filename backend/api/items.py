@@ -1,11 +1,23 @@
 import uuid
-from typing import List
+from datetime import datetime
+from typing import List, Optional
 
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse, StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
-from backend.db import crud, schemas
-from backend.db.database import get_db
+from backend import danger_zones, export, tiles
+from backend.config import get_settings
+from backend.db import async_crud, schemas
+from backend.db.database import get_async_db, get_db
+from backend.db.item_types import item_type_registry
+from backend.live import TooManySubscribers, live_feed
+from backend.utils.geo import BBox
+from backend.utils.pagination import decode_cursor, encode_cursor
+
+settings = get_settings()
 
 router = APIRouter(
     prefix="/api/items",
@@ -37,14 +49,16 @@ router = APIRouter(
         500: {"description": "Database error"},
     },
 )
-async def get_all_item_types(db: Session = Depends(get_db)):
+async def get_all_item_types():
     """
-    Retrieve all item types from the database.
+    Retrieve all item types.
 
-    Returns a list of all explosive item types with their explosion radius.
+    Returns a list of all explosive item types with their explosion radius,
+    served from the in-memory item type registry.
     """
     try:
-        item_types = crud.get_item_types(db)
+        await item_type_registry.ensure_loaded()
+        item_types = item_type_registry.all()
         return item_types
     except Exception as e:
         raise HTTPException(
@@ -56,12 +70,225 @@ async def get_all_item_types(db: Session = Depends(get_db)):
 # ---- FoundItem Endpoints ----
 @router.get(
     "/found",
-    response_model=List[schemas.FoundItem],
-    summary="Get all found items",
-    response_description="List of all found explosive items",
+    response_model=schemas.FoundItemPage,
+    summary="Get found items page by page",
+    response_description="One page of found explosive items, newest first",
     responses={
         200: {
             "description": "Successful retrieval of found items",
+            "content": {
+                "application/json": {
+                    "example": {
+                        "items": [
+                            {
+                                "id": "123e4567-e89b-12d3-a456-426614174000",
+                                "lat": 50.4501,
+                                "lon": 30.5234,
+                                "type_id": "123e4567-e89b-12d3-a456-426614174001",
+                                "created_at": "2024-01-15T10:30:00",
+                            }
+                        ],
+                        "next_cursor": "MjAyNC0wMS0xNVQxMDozMDowMHwxMjNlNDU2Nw",
+                    }
+                }
+            },
+        },
+        400: {"description": "Invalid cursor"},
+        500: {"description": "Database error"},
+    },
+)
+async def get_all_found_items(
+    limit: int = Query(
+        settings.FOUND_ITEMS_PAGE_SIZE, ge=1, le=settings.FOUND_ITEMS_PAGE_MAX
+    ),
+    cursor: Optional[str] = None,
+    type_id: Optional[uuid.UUID] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    db: AsyncSession = Depends(get_async_db),
+):
+    """
+    Retrieve found items, newest first, one page at a time.
+
+    - **limit**: page size
+    - **cursor**: `next_cursor` of the previous page, omit for the first page
+    - **type_id**: only items of this type
+    - **since** / **until**: only items created in `[since, until)`
+
+    `next_cursor` is null on the last page.
+    """
+    try:
+        after = decode_cursor(cursor) if cursor else None
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+    try:
+        found_items = await async_crud.get_found_items(
+            db, limit + 1, after=after, type_id=type_id, since=since, until=until
+        )
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to retrieve found items: {str(e)}",
+        )
+
+    next_cursor = None
+    if len(found_items) > limit:
+        found_items = found_items[:limit]
+        last = found_items[-1]
+        next_cursor = encode_cursor(last.created_at, last.id)
+    return {"items": found_items, "next_cursor": next_cursor}
+
+
+@router.get(
+    "/found/export",
+    summary="Export found items",
+    response_description="Every matching found item, streamed oldest first",
+    responses={
+        200: {
+            "description": "Found items with their type title and radius",
+            "content": {
+                "application/x-ndjson": {
+                    "example": (
+                        '{"id": "123e4567-e89b-12d3-a456-426614174000", '
+                        '"created_at": "2024-01-15T10:30:00", "lat": 50.4501, '
+                        '"lon": 30.5234, "geohash": "u8vxn3x8cbpq", '
+                        '"type_id": "123e4567-e89b-12d3-a456-426614174001", '
+                        '"type_title": "landmines", "explosion_radius": 8.0}\n'
+                    )
+                },
+                "text/csv": {},
+                "application/vnd.apache.arrow.stream": {},
+            },
+        },
+        400: {"description": "Unknown format, or Arrow requested without pyarrow"},
+    },
+)
+async def export_found_items(
+    fmt: str = Query("ndjson", alias="format", description="ndjson, csv or arrow"),
+    type_id: Optional[uuid.UUID] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+):
+    """
+    Stream found items for bulk analysis.
+
+    - **format**: `ndjson`, `csv` or `arrow` (Arrow IPC stream)
+    - **type_id**: only items of this type
+    - **since** / **until**: only items created in `[since, until)`
+
+    Rows come from a server-side cursor in chunks of EXPORT_CHUNK_SIZE, so
+    memory stays flat however many items match.
+    """
+    try:
+        encoder = export.create_encoder(fmt)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+    return StreamingResponse(
+        export.stream_found_items(
+            encoder, type_id, since, until, settings.EXPORT_CHUNK_SIZE
+        ),
+        media_type=encoder.media_type,
+        headers={
+            "Content-Disposition": (
+                f'attachment; filename="found_items.{encoder.extension}"'
+            )
+        },
+    )
+
+
+@router.get(
+    "/found/live",
+    summary="Subscribe to newly saved found items",
+    response_description="Server-Sent Events stream, one event per new found item",
+    responses={
+        200: {
+            "description": "Stream of found_item events, and dropped events when "
+            "the client fell behind",
+            "content": {
+                "text/event-stream": {
+                    "example": (
+                        "event: found_item\n"
+                        "id: 123e4567-e89b-12d3-a456-426614174000\n"
+                        'data: {"id": "123e4567-e89b-12d3-a456-426614174000", '
+                        '"lat": 50.4501, "lon": 30.5234, '
+                        '"type_id": "123e4567-e89b-12d3-a456-426614174001", '
+                        '"created_at": "2024-01-15T10:30:00", "sighting_count": 1}\n\n'
+                        "event: dropped\n"
+                        'data: {"count": 12}\n\n'
+                    )
+                }
+            },
+        },
+        400: {"description": "Incomplete or invalid bounding box"},
+        503: {"description": "Too many live subscribers"},
+    },
+)
+async def subscribe_found_items(
+    min_lat: Optional[float] = Query(None, ge=-90, le=90),
+    min_lon: Optional[float] = Query(None, ge=-180, le=180),
+    max_lat: Optional[float] = Query(None, ge=-90, le=90),
+    max_lon: Optional[float] = Query(None, ge=-180, le=180),
+    type_id: Optional[List[uuid.UUID]] = Query(None),
+):
+    """
+    Receive found items as they are saved instead of polling `/found`.
+
+    - **min_lat**, **min_lon**, **max_lat**, **max_lon**: only items inside
+      this box, all four or none
+    - **type_id**: only items of these types, may be repeated
+
+    Each item is a `found_item` event carrying the item as JSON. A client
+    too slow to keep up loses its oldest queued items and gets a `dropped`
+    event with their count, it should backfill with `/found?since=`. Idle
+    streams receive a comment line every LIVE_HEARTBEAT_S seconds.
+    """
+    bounds = (min_lat, min_lon, max_lat, max_lon)
+    bbox = None
+    if any(bound is not None for bound in bounds):
+        if any(bound is None for bound in bounds):
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Give all of min_lat, min_lon, max_lat and max_lon or none",
+            )
+        if min_lat > max_lat or min_lon > max_lon:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="min_lat/min_lon must not exceed max_lat/max_lon",
+            )
+        bbox = BBox(*bounds)
+
+    try:
+        subscription = live_feed.subscribe(bbox, type_id)
+    except TooManySubscribers as e:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail=str(e)
+        )
+
+    async def stream():
+        try:
+            async for message in subscription.messages(settings.LIVE_HEARTBEAT_S):
+                yield message
+        finally:
+            live_feed.unsubscribe(subscription)
+
+    return StreamingResponse(
+        stream(),
+        media_type="text/event-stream",
+        # no buffering by nginx and the like, events must go out at once
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@router.get(
+    "/found/near",
+    response_model=List[schemas.FoundItemNear],
+    summary="Get found items near a point",
+    response_description="Found items within the radius, nearest first",
+    responses={
+        200: {
+            "description": "Successful retrieval of nearby found items",
             "content": {
                 "application/json": {
                     "example": [
@@ -71,6 +298,7 @@ async def get_all_item_types(db: Session = Depends(get_db)):
                             "lon": 30.5234,
                             "type_id": "123e4567-e89b-12d3-a456-426614174001",
                             "created_at": "2024-01-15T10:30:00",
+                            "distance_m": 42.7,
                         }
                     ]
                 }
@@ -79,20 +307,224 @@ async def get_all_item_types(db: Session = Depends(get_db)):
         500: {"description": "Database error"},
     },
 )
-async def get_all_found_items(db: Session = Depends(get_db)):
+async def get_found_items_near(
+    lat: float = Query(..., ge=-90, le=90),
+    lon: float = Query(..., ge=-180, le=180),
+    radius_m: float = Query(..., gt=0, le=100_000),
+    type_id: Optional[uuid.UUID] = None,
+    limit: int = Query(
+        settings.SPATIAL_QUERY_MAX_RESULTS, ge=1, le=settings.SPATIAL_QUERY_MAX_RESULTS
+    ),
+    db: AsyncSession = Depends(get_async_db),
+):
     """
-    Retrieve all found items from the database.
+    Retrieve found items within **radius_m** metres of (**lat**, **lon**).
+
+    - **type_id**: only items of this type
+    - **limit**: at most this many of the nearest items
 
-    Returns a list of all reported explosive items with their locations.
+    Items without coordinates are never returned.
     """
     try:
-        found_items = crud.get_found_items(db)
-        return found_items
+        pairs = await async_crud.get_found_items_near(
+            db, lat, lon, radius_m, type_id, limit
+        )
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Failed to retrieve found items: {str(e)}",
         )
+    return [
+        {
+            "id": row.id,
+            "lat": row.lat,
+            "lon": row.lon,
+            "type_id": row.type_id,
+            "created_at": row.created_at,
+            "sighting_count": row.sighting_count,
+            "last_seen_at": row.last_seen_at,
+            "distance_m": distance,
+        }
+        for distance, row in pairs
+    ]
+
+
+@router.get(
+    "/found/bbox",
+    response_model=List[schemas.FoundItem],
+    summary="Get found items inside a bounding box",
+    response_description="Found items inside the box",
+    responses={
+        200: {
+            "description": "Successful retrieval of found items in the box",
+            "content": {
+                "application/json": {
+                    "example": [
+                        {
+                            "id": "123e4567-e89b-12d3-a456-426614174000",
+                            "lat": 50.4501,
+                            "lon": 30.5234,
+                            "type_id": "123e4567-e89b-12d3-a456-426614174001",
+                            "created_at": "2024-01-15T10:30:00",
+                        }
+                    ]
+                }
+            },
+        },
+        400: {"description": "Invalid bounding box"},
+        500: {"description": "Database error"},
+    },
+)
+async def get_found_items_in_bbox(
+    min_lat: float = Query(..., ge=-90, le=90),
+    min_lon: float = Query(..., ge=-180, le=180),
+    max_lat: float = Query(..., ge=-90, le=90),
+    max_lon: float = Query(..., ge=-180, le=180),
+    type_id: Optional[uuid.UUID] = None,
+    limit: int = Query(
+        settings.SPATIAL_QUERY_MAX_RESULTS, ge=1, le=settings.SPATIAL_QUERY_MAX_RESULTS
+    ),
+    db: AsyncSession = Depends(get_async_db),
+):
+    """
+    Retrieve found items inside the box from (**min_lat**, **min_lon**) to
+    (**max_lat**, **max_lon**), edges included.
+
+    - **type_id**: only items of this type
+    - **limit**: at most this many items, in no particular order
+    """
+    if min_lat > max_lat or min_lon > max_lon:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="min_lat/min_lon must not exceed max_lat/max_lon",
+        )
+    try:
+        bbox = BBox(min_lat, min_lon, max_lat, max_lon)
+        return await async_crud.get_found_items_in_bbox(db, bbox, type_id, limit)
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to retrieve found items: {str(e)}",
+        )
+
+
+@router.post(
+    "/danger-zones",
+    response_model=List[schemas.DangerZoneHit],
+    summary="Find found items whose blast radius reaches a point or route",
+    response_description="Found items in range, nearest first",
+    responses={
+        200: {
+            "description": "Found items whose explosion radius reaches the path",
+            "content": {
+                "application/json": {
+                    "example": [
+                        {
+                            "id": "123e4567-e89b-12d3-a456-426614174000",
+                            "lat": 50.4501,
+                            "lon": 30.5234,
+                            "type_id": "123e4567-e89b-12d3-a456-426614174001",
+                            "created_at": "2024-01-15T10:30:00",
+                            "explosion_radius": 8.0,
+                            "distance_m": 3.2,
+                            "segment": 0,
+                        }
+                    ]
+                }
+            },
+        },
+        400: {"description": "Empty or too long path"},
+        500: {"description": "Database error"},
+    },
+)
+async def get_danger_zone_hits(
+    query: schemas.DangerZoneQuery, db: Session = Depends(get_db)
+):
+    """
+    Check a point or a route against the blast circles of found items.
+
+    - **path**: one `{lat, lon}` vertex for a point, two or more for a route
+    - **type_id**: only items of this type
+
+    An item is returned when its distance to the nearest part of the path is
+    within its type's `explosion_radius`. `segment` is the index of the
+    closest route segment, from `path[segment]` to `path[segment + 1]`.
+    """
+    if not query.path or len(query.path) > settings.DANGER_ZONE_MAX_VERTICES:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"path must have 1 to {settings.DANGER_ZONE_MAX_VERTICES} vertices",
+        )
+    try:
+        return await run_in_threadpool(
+            danger_zones.find_hits,
+            db,
+            [(vertex.lat, vertex.lon) for vertex in query.path],
+            query.type_id,
+        )
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to check danger zones: {str(e)}",
+        )
+
+
+@router.get(
+    "/tiles/{z}/{x}/{y}",
+    response_model=schemas.Tile,
+    summary="Get clustered found items for a map tile",
+    response_description="Clusters of found items inside the tile",
+    responses={
+        200: {
+            "description": "Clusters with item counts per type",
+            "content": {
+                "application/json": {
+                    "example": {
+                        "z": 12,
+                        "x": 2395,
+                        "y": 1381,
+                        "total": 17,
+                        "clusters": [
+                            {
+                                "lat": 50.4501,
+                                "lon": 30.5234,
+                                "count": 12,
+                                "counts": {
+                                    "123e4567-e89b-12d3-a456-426614174001": 9,
+                                    "123e4567-e89b-12d3-a456-426614174002": 3,
+                                },
+                            }
+                        ],
+                    }
+                }
+            },
+        },
+        400: {"description": "Tile out of range"},
+        500: {"description": "Database error"},
+    },
+)
+async def get_tile(z: int, x: int, y: int, db: Session = Depends(get_db)):
+    """
+    Retrieve found items of one Web Mercator tile, clustered for display.
+
+    - **z** / **x** / **y**: slippy map tile coordinates
+
+    Clusters are keyed by item type id in `counts`. Responses carry an
+    `X-Cache: HIT` or `MISS` header.
+    """
+    if not 0 <= z <= settings.TILE_MAX_ZOOM or not (0 <= x < 2**z and 0 <= y < 2**z):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Tile {z}/{x}/{y} is out of range",
+        )
+    try:
+        tile, cached = await run_in_threadpool(tiles.get_tile, db, z, x, y)
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to build tile: {str(e)}",
+        )
+    return JSONResponse(tile, headers={"X-Cache": "HIT" if cached else "MISS"})
 
 
 @router.get(
@@ -111,6 +543,8 @@ async def get_all_found_items(db: Session = Depends(get_db)):
                         "lon": 30.5234,
                         "type_id": "123e4567-e89b-12d3-a456-426614174001",
                         "created_at": "2024-01-15T10:30:00",
+                        "sighting_count": 3,
+                        "last_seen_at": "2024-01-15T10:41:12",
                     }
                 }
             },
@@ -119,14 +553,16 @@ async def get_all_found_items(db: Session = Depends(get_db)):
         500: {"description": "Database error"},
     },
 )
-async def get_found_item_by_id(item_id: uuid.UUID, db: Session = Depends(get_db)):
+async def get_found_item_by_id(
+    item_id: uuid.UUID, db: AsyncSession = Depends(get_async_db)
+):
     """
     Retrieve a specific found item by its ID.
 
     - **item_id**: The UUID of the found item to retrieve
     """
     try:
-        found_item = crud.get_found_item(db, item_id)
+        found_item = await async_crud.get_found_item(db, item_id)
         if not found_item:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
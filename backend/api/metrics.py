@@ -0,0 +1,68 @@
+import logging
+
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+
+from backend import metrics, service
+from backend.db.database import pool_stats
+from backend.db.writer import found_item_writer
+from backend.dedup import recent_detections
+from backend.executor import EXECUTOR_STATES
+from backend.live import live_feed
+
+router = APIRouter(tags=["Stats"])
+
+logger = logging.getLogger("metrics")
+
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def collect_runtime():
+    """Sample queue depths and pool state into the gauges before a scrape"""
+    inference = service.executor.stats()
+    metrics.INFERENCE_PENDING.set(inference["pending"])
+    metrics.INFERENCE_MAX_PENDING.set(inference["max_pending"])
+    for state in EXECUTOR_STATES:
+        metrics.MODEL_STATE.set(int(inference["state"] == state), state=state)
+
+    metrics.SCHEDULER_QUEUE_DEPTH.set(service.scheduler.stats()["queue_depth"])
+    metrics.WRITER_QUEUE_DEPTH.set(found_item_writer.queue_depth)
+    for stat, value in recent_detections.stats().items():
+        metrics.DEDUP.set(value, stat=stat)
+    for stat, value in live_feed.stats().items():
+        metrics.LIVE.set(value, stat=stat)
+
+    cache = service.prediction_cache.stats()
+    for stat in ("entries", "hits", "similar_hits", "coalesced", "misses"):
+        metrics.PREDICTION_CACHE.set(cache[stat], stat=stat)
+
+    for engine, stats in pool_stats().items():
+        for stat, value in stats.items():
+            metrics.DB_POOL.set(value, engine=engine, stat=stat)
+
+
+@router.get(
+    "/metrics",
+    summary="Prometheus metrics",
+    response_class=PlainTextResponse,
+    responses={
+        200: {
+            "description": "Metrics in the Prometheus text exposition format",
+            "content": {
+                "text/plain": {
+                    "example": (
+                        "# HELP vanguard_upload_stage_seconds Time spent in each "
+                        "stage of POST /api/image\n"
+                        "# TYPE vanguard_upload_stage_seconds histogram\n"
+                        'vanguard_upload_stage_seconds_bucket{stage="decode",le="0.01"} 42\n'
+                    )
+                }
+            },
+        },
+    },
+)
+async def get_metrics():
+    collect_runtime()
+    return PlainTextResponse(
+        metrics.registry.render(), media_type=PROMETHEUS_CONTENT_TYPE
+    )
@@ -0,0 +1,117 @@
+import logging
+
+from fastapi import APIRouter
+
+from backend import service
+from backend.db.database import pool_stats
+from backend.db.writer import found_item_writer
+from backend.tiles import tile_cache
+
+router = APIRouter(
+    prefix="/api",
+    tags=["Stats"],
+)
+
+logger = logging.getLogger("stats")
+
+
+@router.get(
+    "/stats",
+    summary="Runtime statistics",
+    response_description="Inference throughput, queue depth and worker utilization",
+    responses={
+        200: {
+            "description": "Current runtime statistics",
+            "content": {
+                "application/json": {
+                    "example": {
+                        "inference": {
+                            "kind": "shm",
+                            "workers": [
+                                {
+                                    "index": 0,
+                                    "pid": 4242,
+                                    "alive": True,
+                                    "ready": True,
+                                    "outstanding_images": 3,
+                                    "completed_images": 1280,
+                                    "utilization": 0.82,
+                                }
+                            ],
+                            "pending": 5,
+                            "max_pending": 32,
+                            "rejected": 0,
+                            "completed_images": 1280,
+                            "images_per_second": 41.7,
+                        },
+                        "scheduler": {
+                            "queue_depth": 2,
+                            "batches": 210,
+                            "images": 1280,
+                            "avg_batch_size": 6.1,
+                        },
+                        "cache": {
+                            "entries": 311,
+                            "max_entries": 1024,
+                            "hits": 96,
+                            "similar_hits": 4,
+                            "coalesced": 2,
+                            "misses": 1184,
+                            "evictions": 0,
+                            "hit_ratio": 0.08,
+                        },
+                        "writer": {
+                            "queue_depth": 12,
+                            "max_queue": 10000,
+                            "flushed": 1162,
+                            "flushes": 140,
+                            "failed_flushes": 0,
+                            "dropped": 0,
+                            "dropped_sightings": 0,
+                            "last_flush_ms": 4.2,
+                            "avg_flush_ms": 5.1,
+                            "max_flush_ms": 31.7,
+                        },
+                        "db": {
+                            "sync": {
+                                "size": 10,
+                                "checked_out": 2,
+                                "overflow": -8,
+                                "checkouts": 5120,
+                                "timeouts": 0,
+                                "avg_wait_ms": 0.04,
+                                "max_wait_ms": 12.5,
+                            },
+                            "async": {
+                                "size": 10,
+                                "checked_out": 4,
+                                "overflow": -6,
+                                "checkouts": 40212,
+                                "timeouts": 0,
+                                "avg_wait_ms": 0.09,
+                                "max_wait_ms": 48.3,
+                            },
+                        },
+                        "tiles": {
+                            "entries": 820,
+                            "max_entries": 4096,
+                            "hits": 15230,
+                            "misses": 1044,
+                            "invalidations": 96,
+                            "hit_ratio": 0.94,
+                        },
+                    }
+                }
+            },
+        },
+    },
+)
+async def get_stats():
+    return {
+        "inference": service.executor.stats(),
+        "scheduler": service.scheduler.stats(),
+        "cache": service.prediction_cache.stats(),
+        "writer": found_item_writer.stats(),
+        "tiles": tile_cache.stats(),
+        "db": pool_stats(),
+    }
@@ -1,13 +1,26 @@
+import asyncio
 import logging
+from contextlib import asynccontextmanager
+from datetime import datetime, timedelta, timezone
 
 import uvicorn
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 
+from backend import metrics, service
 from backend.api.healthcheck import router as health_router
 from backend.api.image import router as image_router
 from backend.api.items import router as items_router
+from backend.api.metrics import router as metrics_router
+from backend.api.stats import router as stats_router
 from backend.config import get_settings
+from backend.db import crud
+from backend.db.database import SessionLocal, async_engine
+from backend.db.item_types import item_type_registry
+from backend.db.writer import found_item_writer
+from backend.dedup import recent_detections
+from backend.live import live_feed
+from backend.spatial import found_item_index
 
 settings = get_settings()
 
@@ -16,11 +29,69 @@ logging.basicConfig(
     format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
     datefmt="%Y-%m-%d %H:%M:%S",
 )
+logger = logging.getLogger("app")
+
+
+def load_spatial_index():
+    db = SessionLocal()
+    try:
+        found_item_index.load(crud.get_found_item_points(db))
+    finally:
+        db.close()
+    logger.info(f"Loaded {len(found_item_index)} found items into the grid index")
+
+
+def load_recent_detections():
+    now = datetime.now(timezone.utc).replace(tzinfo=None)
+    since = now - timedelta(seconds=recent_detections.window_s)
+    db = SessionLocal()
+    try:
+        recent_detections.load(crud.get_recent_found_items(db, since), now)
+    finally:
+        db.close()
+    logger.info(f"Loaded {len(recent_detections)} recent found items for dedup")
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    try:
+        await asyncio.to_thread(item_type_registry.load)
+    except Exception as e:
+        logger.warning(f"Could not warm item types, loading on first use: {str(e)}")
+    if settings.SPATIAL_INDEX == "memory":
+        # before the writer starts, so no insert can slip between the two
+        try:
+            await asyncio.to_thread(load_spatial_index)
+        except Exception as e:
+            logger.warning(f"Could not load grid index, using geohash: {str(e)}")
+    if recent_detections.enabled:
+        # reports of items seen before a restart still merge into them
+        try:
+            await asyncio.to_thread(load_recent_detections)
+        except Exception as e:
+            logger.warning(f"Could not load recent found items: {str(e)}")
+    live_feed.start(asyncio.get_running_loop())
+    found_item_writer.start()
+    await service.scheduler.start()
+    # not awaited: the app answers health probes while the model loads
+    warm_up = asyncio.create_task(service.warm_up()) if settings.MODEL_WARMUP else None
+    yield
+    if warm_up is not None:
+        warm_up.cancel()
+    # ends the open live streams, the server waits for them otherwise
+    live_feed.stop()
+    await service.scheduler.stop()
+    service.executor.shutdown()
+    # flush buffered found items before the process exits
+    await asyncio.to_thread(found_item_writer.stop)
+    await async_engine.dispose()
+
 
 app = FastAPI(
     title="Vanguard Vision API",
     description="API for reporting and managing found explosive items",
     docs_url="/docs" if settings.DEBUG else None,
+    lifespan=lifespan,
 )
 
 # for development
@@ -31,10 +102,15 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+if metrics.registry.enabled:
+    app.add_middleware(metrics.RequestMetricsMiddleware)
 
 app.include_router(health_router)
 app.include_router(image_router)
 app.include_router(items_router)
+app.include_router(stats_router)
+if metrics.registry.enabled:
+    app.include_router(metrics_router)
 
 if __name__ == "__main__":
     uvicorn.run(app, host="0.0.0.0", port=8000)
@@ -0,0 +1,148 @@
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, List, Optional, Tuple
+
+logger = logging.getLogger("batching")
+
+BatchRunner = Callable[[List[Any]], Awaitable[List[Any]]]
+
+
+class BatchScheduler:
+    """Collect images from concurrent requests into micro-batches
+
+    Each call to `submit` enqueues one image and waits for its own result.
+    A background task takes the first queued image, then keeps collecting
+    until either `max_batch_size` images are gathered or `max_wait_ms`
+    milliseconds have passed, and hands the whole batch to `run_batch`.
+    While all `max_concurrent_batches` slots are busy new requests keep
+    queueing, so batches grow under load instead of latency.
+    """
+
+    def __init__(
+        self,
+        run_batch: BatchRunner,
+        max_batch_size: int = 8,
+        max_wait_ms: float = 5.0,
+        max_concurrent_batches: int = 1,
+    ):
+        self._run_batch = run_batch
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max(0.0, max_wait_ms) / 1000.0
+        self.max_concurrent_batches = max(1, max_concurrent_batches)
+
+        self._queue: Optional[asyncio.Queue] = None
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._task: Optional[asyncio.Task] = None
+        self._inflight: set = set()
+
+        self.batches = 0
+        self.images = 0
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    @property
+    def queue_depth(self) -> int:
+        return self._queue.qsize() if self._queue is not None else 0
+
+    async def start(self):
+        if self.running:
+            return
+        self._queue = asyncio.Queue()
+        self._slots = asyncio.Semaphore(self.max_concurrent_batches)
+        self._task = asyncio.create_task(self._collect_forever())
+
+    async def stop(self):
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+        if self._inflight:
+            await asyncio.gather(*self._inflight, return_exceptions=True)
+
+        while self._queue is not None and not self._queue.empty():
+            _, future = self._queue.get_nowait()
+            if not future.done():
+                future.set_exception(RuntimeError("Inference scheduler stopped"))
+
+    async def submit(self, image: Any) -> Any:
+        if not self.running:
+            await self.start()
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((image, future))
+        return await future
+
+    def stats(self) -> dict:
+        return {
+            "queue_depth": self.queue_depth,
+            "batches": self.batches,
+            "images": self.images,
+            "avg_batch_size": self.images / self.batches if self.batches else 0.0,
+        }
+
+    async def _collect_forever(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            await self._slots.acquire()
+            batch = []
+            try:
+                batch.append(await self._queue.get())
+                deadline = loop.time() + self.max_wait
+                while len(batch) < self.max_batch_size:
+                    if not self._queue.empty():
+                        batch.append(self._queue.get_nowait())
+                        continue
+                    timeout = deadline - loop.time()
+                    if timeout <= 0:
+                        break
+                    try:
+                        batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                    except asyncio.TimeoutError:
+                        break
+            except BaseException:
+                self._slots.release()
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(
+                            RuntimeError("Inference scheduler stopped")
+                        )
+                raise
+
+            task = asyncio.create_task(self._dispatch(batch))
+            self._inflight.add(task)
+            task.add_done_callback(self._inflight.discard)
+
+    async def _dispatch(self, batch: List[Tuple[Any, asyncio.Future]]):
+        try:
+            # requests that gave up while queued do not need inference
+            batch = [(image, future) for image, future in batch if not future.done()]
+            if not batch:
+                return
+
+            images = [image for image, _ in batch]
+            try:
+                results = await self._run_batch(images)
+                if len(results) != len(images):
+                    raise RuntimeError(
+                        f"Model returned {len(results)} results for {len(images)} images"
+                    )
+            except Exception as e:
+                logger.exception(f"Batch of {len(images)} images failed")
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                return
+
+            self.batches += 1
+            self.images += len(images)
+            for (_, future), result in zip(batch, results):
+                if not future.done():
+                    future.set_result(result)
+        finally:
+            self._slots.release()
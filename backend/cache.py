@@ -0,0 +1,155 @@
+import asyncio
+import hashlib
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Optional, Set, Tuple
+
+# the 64-bit perceptual hash is split into this many 16-bit bands, any two
+# hashes within `PHASH_BANDS - 1` bits of each other share at least one band
+PHASH_BANDS = 4
+_BAND_BITS = 64 // PHASH_BANDS
+_BAND_MASK = (1 << _BAND_BITS) - 1
+
+
+def content_key(content: bytes) -> str:
+    return hashlib.blake2b(content, digest_size=16).hexdigest()
+
+
+def _bands(phash: int):
+    for band in range(PHASH_BANDS):
+        yield band, (phash >> (band * _BAND_BITS)) & _BAND_MASK
+
+
+class PredictionCache:
+    """LRU/TTL cache of detection results for previously seen uploads
+
+    Entries are keyed by a hash of the uploaded bytes. When a perceptual hash
+    is stored alongside, re-encoded copies of the same photo are matched too:
+    `get_similar` finds an entry within `max_distance` bits using a banded
+    index, so a lookup touches only the entries sharing one 16-bit band.
+    At most `max_entries` entries are held, the least recently used one is
+    evicted first and entries older than `ttl_seconds` are never returned.
+    `compute_once` makes concurrent submissions of the same bytes share one
+    computation instead of each running inference.
+    """
+
+    def __init__(
+        self, max_entries: int = 1024, ttl_seconds: float = 600.0, max_distance: int = 3
+    ):
+        self.max_entries = max(0, max_entries)
+        self.ttl_seconds = ttl_seconds
+        self.max_distance = min(max(0, max_distance), PHASH_BANDS - 1)
+
+        self._entries: "OrderedDict[str, Tuple[float, Optional[int], Any]]" = (
+            OrderedDict()
+        )
+        self._bands: Dict[Tuple[int, int], Set[str]] = {}
+        self._inflight: Dict[str, asyncio.Future] = {}
+
+        self.hits = 0
+        self.similar_hits = 0
+        self.coalesced = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_entries > 0
+
+    def get(self, key: str) -> Optional[Any]:
+        entry = self._lookup(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return entry
+
+    def get_similar(self, phash: int) -> Optional[Any]:
+        candidates = set()
+        for band in _bands(phash):
+            candidates.update(self._bands.get(band, ()))
+
+        best_key, best_distance = None, self.max_distance + 1
+        for key in candidates:
+            stored = self._entries[key][1]
+            distance = (stored ^ phash).bit_count()
+            if distance < best_distance:
+                best_key, best_distance = key, distance
+
+        entry = self._lookup(best_key) if best_key is not None else None
+        if entry is not None:
+            self.similar_hits += 1
+        return entry
+
+    def put(self, key: str, value: Any, phash: Optional[int] = None):
+        if not self.enabled:
+            return
+        self._remove(key)
+        self._entries[key] = (time.monotonic(), phash, value)
+        if phash is not None:
+            for band in _bands(phash):
+                self._bands.setdefault(band, set()).add(key)
+
+        while len(self._entries) > self.max_entries:
+            self._remove(next(iter(self._entries)))
+            self.evictions += 1
+
+    async def compute_once(
+        self, key: str, compute: Callable[[], Awaitable[Any]]
+    ) -> Tuple[Any, bool]:
+        """Run `compute` for `key` unless the same key is already running
+
+        Returns the result and whether this call was the one that computed it.
+        """
+        task = self._inflight.get(key)
+        if task is not None:
+            self.coalesced += 1
+            return await asyncio.shield(task), False
+
+        # run detached from the caller, a disconnecting first client must not
+        # cancel the work the others are waiting on
+        task = asyncio.ensure_future(compute())
+        self._inflight[key] = task
+        task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        return await asyncio.shield(task), True
+
+    def clear(self):
+        self._entries.clear()
+        self._bands.clear()
+
+    def stats(self) -> dict:
+        # misses count exact lookups, similar and coalesced hits are among them
+        lookups = self.hits + self.misses
+        served = self.hits + self.similar_hits + self.coalesced
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "similar_hits": self.similar_hits,
+            "coalesced": self.coalesced,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_ratio": served / lookups if lookups else 0.0,
+        }
+
+    def _lookup(self, key: str) -> Optional[Any]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        created, _, value = entry
+        if self.ttl_seconds > 0 and time.monotonic() - created > self.ttl_seconds:
+            self._remove(key)
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    def _remove(self, key: str):
+        entry = self._entries.pop(key, None)
+        if entry is None or entry[1] is None:
+            return
+        for band in _bands(entry[1]):
+            keys = self._bands.get(band)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._bands[band]
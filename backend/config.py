@@ -8,6 +8,17 @@ class Settings(BaseSettings):
     POSTGRES_PASSWORD: str
     POSTGRES_DB: str
     DATABASE_URL: str
+    # empty derives it from DATABASE_URL with the asyncpg/aiosqlite driver
+    ASYNC_DATABASE_URL: str = ""
+
+    # applied to the sync and the async engine each
+    DB_POOL_SIZE: int = 10
+    DB_MAX_OVERFLOW: int = 10
+    DB_POOL_TIMEOUT_S: float = 10.0
+    DB_POOL_RECYCLE_S: int = 1800
+    DB_POOL_PRE_PING: bool = True
+    # PostgreSQL only, 0 disables it
+    DB_STATEMENT_TIMEOUT_MS: int = 5000
 
     API_HOST: str = "0.0.0.0"
     API_PORT: int = 8000
@@ -16,6 +27,81 @@ class Settings(BaseSettings):
     LOG_LEVEL: str = "INFO"
 
     MIN_PREDICTION_CONFIDENCE: float = 0.6
+    BATCH_MAX_FILES: int = 100
+
+    # "yolo" runs the ultralytics .pt weights, "onnx" an export made with
+    # model/export.py on ONNX Runtime (point MODEL_WEIGHTS_PATH at the .onnx),
+    # "onnx-int8" its model/quantize.py INT8 variant
+    MODEL_BACKEND: str = "yolo"
+    MODEL_WEIGHTS_PATH: str = "model/cls_v0.0.pt"
+    # 0 reads the input resolution from the loaded model
+    MODEL_INPUT_SIZE: int = 0
+
+    # load the model in the background on startup, /api/health/ready turns
+    # 200 once done; false loads it on the first inference request
+    MODEL_WARMUP: bool = True
+    # 0 waits for the model indefinitely
+    MODEL_WARMUP_TIMEOUT_S: float = 300.0
+
+    # GET /metrics and per-stage timings, false makes the timers no-ops
+    METRICS_ENABLED: bool = True
+
+    # /api/health/ready reuses its last result for this long
+    HEALTH_CACHE_TTL_S: float = 2.0
+    HEALTH_DB_TIMEOUT_S: float = 1.0
+
+    INFERENCE_EXECUTOR: str = "thread"
+    INFERENCE_WORKERS: int = 1
+    INFERENCE_MAX_PENDING: int = 32
+    INFERENCE_MAX_BATCH_SIZE: int = 8
+    INFERENCE_MAX_WAIT_MS: float = 5.0
+
+    FOUND_ITEMS_PAGE_SIZE: int = 100
+    FOUND_ITEMS_PAGE_MAX: int = 500
+    # rows per server-side cursor fetch of /api/items/found/export
+    EXPORT_CHUNK_SIZE: int = 1000
+    # PostgreSQL only, replaces DB_STATEMENT_TIMEOUT_MS for exports, 0 is none
+    EXPORT_STATEMENT_TIMEOUT_MS: int = 0
+
+    # GET /api/items/found/live: messages queued per client, "drop" discards
+    # the oldest when a client falls behind, "disconnect" ends its stream
+    LIVE_QUEUE_SIZE: int = 100
+    LIVE_SLOW_CONSUMER: str = "drop"
+    LIVE_MAX_SUBSCRIBERS: int = 10000
+    LIVE_HEARTBEAT_S: float = 15.0
+
+    # "geohash" queries the indexed geohash column, "memory" keeps every
+    # located found item in an in-process grid loaded on startup
+    SPATIAL_INDEX: str = "geohash"
+    SPATIAL_GRID_CELL_DEG: float = 0.01
+    SPATIAL_QUERY_MAX_RESULTS: int = 1000
+
+    # routes are checked against found items this many vertices at a time
+    DANGER_ZONE_CHUNK_VERTICES: int = 256
+    DANGER_ZONE_MAX_VERTICES: int = 10000
+
+    TILE_GRID_SIZE: int = 8
+    TILE_MAX_ZOOM: int = 22
+    TILE_CACHE_SIZE: int = 4096
+    TILE_CACHE_TTL_S: float = 60.0
+
+    # 0 keeps item types until invalidated by crud.create_item_type
+    ITEM_TYPE_CACHE_TTL_S: float = 300.0
+
+    FOUND_ITEM_FLUSH_SIZE: int = 100
+    FOUND_ITEM_FLUSH_INTERVAL_S: float = 1.0
+    FOUND_ITEM_QUEUE_MAX: int = 10000
+
+    # a report of the same type within DEDUP_DISTANCE_M of a found item seen
+    # in the last DEDUP_WINDOW_S seconds adds a sighting to it, not a new item
+    DEDUP_ENABLED: bool = True
+    DEDUP_DISTANCE_M: float = 25.0
+    DEDUP_WINDOW_S: float = 900.0
+
+    PREDICTION_CACHE_SIZE: int = 1024
+    PREDICTION_CACHE_TTL_S: float = 600.0
+    PREDICTION_CACHE_PHASH: bool = False
+    PREDICTION_CACHE_PHASH_DISTANCE: int = 3
 
     class Config:
         env_file = ".env"
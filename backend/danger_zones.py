@@ -0,0 +1,112 @@
+import uuid
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from sqlalchemy.orm import Session
+
+from backend.config import get_settings
+from backend.db import crud
+from backend.db.item_types import item_type_registry
+from backend.utils.geo import BBox, bbox_around, path_distances_m
+
+settings = get_settings()
+
+
+def _chunk_bbox(lats: np.ndarray, lons: np.ndarray, margin_m: float) -> BBox:
+    # widen by the margin at the chunk's most poleward latitude, where a
+    # metre spans the most longitude
+    lat = float(lats[np.abs(lats).argmax()])
+    lo = bbox_around(lat, float(lons.min()), margin_m)
+    hi = bbox_around(lat, float(lons.max()), margin_m)
+    return BBox(
+        max(-90.0, float(lats.min()) - (lat - lo.min_lat)),
+        lo.min_lon,
+        min(90.0, float(lats.max()) + (hi.max_lat - lat)),
+        hi.max_lon,
+    )
+
+
+def find_hits(
+    db: Session,
+    path: Sequence[Tuple[float, float]],
+    type_id: Optional[uuid.UUID] = None,
+    chunk_vertices: int = 0,
+) -> List[dict]:
+    """Found items whose blast circle reaches a point or a polyline
+
+    `path` is a list of (lat, lon) vertices, a single vertex checks a point.
+    The route is cut into chunks of `chunk_vertices` vertices, each chunk's
+    bounding box widened by the largest explosion radius in play is sent
+    to the spatial index, so only items that could possibly be in range
+    are read. Distances from those candidates to the chunk's segments are
+    computed in one vectorized pass and an item is a hit when its nearest
+    distance to the route is within its type's `explosion_radius`.
+    Blocking and CPU-bound, meant to be run off the event loop.
+    """
+    radii = {
+        item_type.id: item_type.explosion_radius
+        for item_type in item_type_registry.all()
+    }
+    if type_id is not None:
+        radii = {type_id: radii[type_id]} if type_id in radii else {}
+    if not radii or not path:
+        return []
+    margin_m = max(radii.values())
+    chunk_vertices = max(2, chunk_vertices or settings.DANGER_ZONE_CHUNK_VERTICES)
+
+    path_lats = np.array([lat for lat, _ in path], dtype=np.float64)
+    path_lons = np.array([lon for _, lon in path], dtype=np.float64)
+
+    # item id -> (distance, segment, radius)
+    nearest: Dict[uuid.UUID, Tuple[float, int, float]] = {}
+    # consecutive chunks share their boundary vertex so no segment is lost
+    for start in range(0, max(1, path_lats.size - 1), chunk_vertices - 1):
+        stop = min(start + chunk_vertices, path_lats.size)
+        chunk_lats, chunk_lons = path_lats[start:stop], path_lons[start:stop]
+
+        bbox = _chunk_bbox(chunk_lats, chunk_lons, margin_m)
+        points = [
+            point
+            for point in crud.get_found_item_points_in_bbox(db, bbox, type_id)
+            if point.type_id in radii
+        ]
+        if not points:
+            continue
+
+        distances, segments = path_distances_m(
+            chunk_lats,
+            chunk_lons,
+            np.array([point.lat for point in points]),
+            np.array([point.lon for point in points]),
+        )
+        radius = np.array([radii[point.type_id] for point in points])
+        for i in np.flatnonzero(distances <= radius):
+            point = points[i]
+            previous = nearest.get(point.id)
+            if previous is None or distances[i] < previous[0]:
+                nearest[point.id] = (
+                    float(distances[i]),
+                    int(segments[i]) + start,
+                    float(radius[i]),
+                )
+
+    rows = crud.get_found_items_by_ids(db, list(nearest))
+    hits = []
+    for row in rows:
+        distance, segment, radius = nearest[row.id]
+        hits.append(
+            {
+                "id": row.id,
+                "lat": row.lat,
+                "lon": row.lon,
+                "type_id": row.type_id,
+                "created_at": row.created_at,
+                "sighting_count": row.sighting_count,
+                "last_seen_at": row.last_seen_at,
+                "explosion_radius": radius,
+                "distance_m": distance,
+                "segment": segment,
+            }
+        )
+    hits.sort(key=lambda hit: hit["distance_m"])
+    return hits
@@ -0,0 +1,71 @@
+import uuid
+from datetime import datetime
+from typing import List, Optional, Tuple
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from backend.metrics import DB_QUERY_SECONDS, timed
+from backend.spatial import found_item_index
+from backend.utils.geo import BBox, bbox_around
+
+from . import crud, tables
+
+
+@timed(DB_QUERY_SECONDS, operation="async.get_found_items")
+async def get_found_items(
+    db: AsyncSession,
+    limit: int,
+    after: Optional[Tuple[datetime, uuid.UUID]] = None,
+    type_id: Optional[uuid.UUID] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+):
+    stmt = crud.select_found_items_page(limit, after, type_id, since, until)
+    return (await db.execute(stmt)).scalars().all()
+
+
+@timed(DB_QUERY_SECONDS, operation="async.get_found_item")
+async def get_found_item(db: AsyncSession, item_id: uuid.UUID):
+    return await db.get(tables.FoundItem, item_id)
+
+
+async def get_found_items_by_ids(db: AsyncSession, ids: List[uuid.UUID]):
+    if not ids:
+        return []
+    stmt = select(tables.FoundItem).where(tables.FoundItem.id.in_(ids))
+    return crud.in_order_of((await db.execute(stmt)).scalars(), ids)
+
+
+@timed(DB_QUERY_SECONDS, operation="async.get_found_items_in_bbox")
+async def get_found_items_in_bbox(
+    db: AsyncSession,
+    bbox: BBox,
+    type_id: Optional[uuid.UUID] = None,
+    limit: int = 1000,
+):
+    if found_item_index.loaded:
+        points = found_item_index.within(bbox, type_id, limit)
+        return await get_found_items_by_ids(db, [point.id for point in points])
+    stmt = crud.select_found_items_in_bbox(bbox, type_id).limit(limit)
+    return (await db.execute(stmt)).scalars().all()
+
+
+@timed(DB_QUERY_SECONDS, operation="async.get_found_items_near")
+async def get_found_items_near(
+    db: AsyncSession,
+    lat: float,
+    lon: float,
+    radius_m: float,
+    type_id: Optional[uuid.UUID] = None,
+    limit: int = 1000,
+) -> List[Tuple[float, tables.FoundItem]]:
+    if found_item_index.loaded:
+        pairs = found_item_index.near(lat, lon, radius_m, type_id, limit)
+        rows = await get_found_items_by_ids(db, [point.id for _, point in pairs])
+        distances = {point.id: distance for distance, point in pairs}
+        return [(distances[row.id], row) for row in rows]
+
+    stmt = crud.select_found_items_in_bbox(bbox_around(lat, lon, radius_m), type_id)
+    rows = (await db.execute(stmt)).scalars()
+    return crud.nearest_first(rows, lat, lon, radius_m, limit)
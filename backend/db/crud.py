@@ -1,8 +1,25 @@
 import uuid
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
 
+from sqlalchemy import Select, bindparam, func, insert, or_, select, tuple_, update
 from sqlalchemy.orm import Session
 
+from backend.dedup import RecentItem
+from backend.events import FOUND_ITEMS_CREATED, event_hub
+from backend.metrics import DB_QUERY_SECONDS, timed
+from backend.spatial import Point, found_item_index
+from backend.utils.geo import (
+    BBox,
+    bbox_around,
+    geohash_cover,
+    geohash_encode,
+    geohash_or_none,
+    haversine_m,
+)
+
 from . import schemas, tables
+from .item_types import item_type_registry
 
 
 # ---- ItemType ----
@@ -11,6 +28,7 @@ def create_item_type(db: Session, obj: schemas.ItemTypeCreate):
     db.add(db_obj)
     db.commit()
     db.refresh(db_obj)
+    item_type_registry.invalidate()
     return db_obj
 
 
@@ -27,17 +45,289 @@ def get_item_type_by_id(db: Session, type_id: uuid.UUID):
 
 
 # ---- FoundItem ----
-def create_found_item(db: Session, obj: schemas.FoundItemCreate):
-    db_obj = tables.FoundItem(**obj.dict())
-    db.add(db_obj)
+@timed(DB_QUERY_SECONDS, operation="create_found_items")
+def create_found_items(
+    db: Session,
+    objs: List[schemas.FoundItemCreate],
+    ids: Optional[List[uuid.UUID]] = None,
+):
+    """Insert many found items with multi-row INSERTs and a single commit
+
+    Returns the ids of the new rows in the order of `objs`, taken from `ids`
+    when the caller already assigned them.
+    """
+    if ids is None:
+        ids = [uuid.uuid4() for _ in objs]
+    rows = [
+        {"id": item_id, "geohash": geohash_or_none(obj.lat, obj.lon), **obj.dict()}
+        for item_id, obj in zip(ids, objs)
+    ]
+    # rows without created_at are left to the server default, an INSERT
+    # must list the same columns for every row so they go in separately
+    dated = [row for row in rows if row["created_at"] is not None]
+    undated = [
+        {k: v for k, v in row.items() if k != "created_at"}
+        for row in rows
+        if row["created_at"] is None
+    ]
+    for batch in (dated, undated):
+        if batch:
+            db.execute(insert(tables.FoundItem), batch)
     db.commit()
-    db.refresh(db_obj)
-    return db_obj
+    event_hub.publish(FOUND_ITEMS_CREATED, rows)
+    return [row["id"] for row in rows]
+
+
+@timed(DB_QUERY_SECONDS, operation="add_sightings")
+def add_sightings(db: Session, sightings: Dict[uuid.UUID, Tuple[int, datetime]]):
+    """Add `count` sightings last seen at `seen_at` to each found item id
+
+    One executemany UPDATE and a single commit, returns the number of rows
+    updated; ids not in the table are skipped.
+    """
+    if not sightings:
+        return 0
+    found_items = tables.FoundItem.__table__
+    stmt = (
+        update(found_items)
+        .where(found_items.c.id == bindparam("item_id"))
+        .values(
+            sighting_count=found_items.c.sighting_count + bindparam("count"),
+            last_seen_at=bindparam("seen_at"),
+        )
+    )
+    result = db.execute(
+        stmt,
+        [
+            {"item_id": item_id, "count": count, "seen_at": seen_at}
+            for item_id, (count, seen_at) in sightings.items()
+        ],
+    )
+    db.commit()
+    return result.rowcount
+
+
+@timed(DB_QUERY_SECONDS, operation="get_recent_found_items")
+def get_recent_found_items(db: Session, since: datetime) -> List[RecentItem]:
+    """Located found items last seen at or after `since`, for deduplication"""
+    FoundItem = tables.FoundItem
+    last_seen = func.coalesce(FoundItem.last_seen_at, FoundItem.created_at)
+    stmt = select(
+        FoundItem.id, FoundItem.type_id, FoundItem.lat, FoundItem.lon, last_seen
+    ).where(
+        # a startup-only scan, not worth an index on the expression
+        last_seen >= since,
+        FoundItem.lat.is_not(None),
+        FoundItem.lon.is_not(None),
+    )
+    return [RecentItem(*row) for row in db.execute(stmt)]
+
+
+def select_found_items_page(
+    limit: int,
+    after: Optional[Tuple[datetime, uuid.UUID]] = None,
+    type_id: Optional[uuid.UUID] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+) -> Select:
+    FoundItem = tables.FoundItem
+    stmt = select(FoundItem)
+    if type_id is not None:
+        stmt = stmt.where(FoundItem.type_id == type_id)
+    if since is not None:
+        stmt = stmt.where(FoundItem.created_at >= since)
+    if until is not None:
+        stmt = stmt.where(FoundItem.created_at < until)
+    if after is not None:
+        stmt = stmt.where(tuple_(FoundItem.created_at, FoundItem.id) < tuple_(*after))
+    return stmt.order_by(FoundItem.created_at.desc(), FoundItem.id.desc()).limit(limit)
+
+
+def select_found_items_export(
+    type_id: Optional[uuid.UUID] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+) -> Select:
+    """Flat rows with the item type joined in, oldest first"""
+    FoundItem, ItemType = tables.FoundItem, tables.ItemType
+    stmt = select(
+        FoundItem.id,
+        FoundItem.created_at,
+        FoundItem.lat,
+        FoundItem.lon,
+        FoundItem.geohash,
+        FoundItem.type_id,
+        ItemType.title.label("type_title"),
+        ItemType.explosion_radius,
+        FoundItem.sighting_count,
+        FoundItem.last_seen_at,
+    ).join(ItemType, FoundItem.type_id == ItemType.id)
+    if type_id is not None:
+        stmt = stmt.where(FoundItem.type_id == type_id)
+    if since is not None:
+        stmt = stmt.where(FoundItem.created_at >= since)
+    if until is not None:
+        stmt = stmt.where(FoundItem.created_at < until)
+    return stmt.order_by(FoundItem.created_at, FoundItem.id)
+
+
+def select_found_items_in_bbox(
+    bbox: BBox, type_id: Optional[uuid.UUID] = None, *columns
+) -> Select:
+    # the geohash prefixes select a handful of index ranges covering the box,
+    # the lat/lon bounds trim the parts of those cells outside it
+    FoundItem = tables.FoundItem
+    stmt = select(*(columns or (FoundItem,))).where(
+        or_(*(FoundItem.geohash.like(f"{cell}%") for cell in geohash_cover(bbox))),
+        FoundItem.lat.between(bbox.min_lat, bbox.max_lat),
+        FoundItem.lon.between(bbox.min_lon, bbox.max_lon),
+    )
+    if type_id is not None:
+        stmt = stmt.where(FoundItem.type_id == type_id)
+    return stmt
+
+
+def in_order_of(rows, ids: List[uuid.UUID]) -> list:
+    by_id = {row.id: row for row in rows}
+    return [by_id[item_id] for item_id in ids if item_id in by_id]
 
 
-def get_found_items(db: Session):
-    return db.query(tables.FoundItem).all()
+def nearest_first(
+    rows, lat: float, lon: float, radius_m: float, limit: int
+) -> List[Tuple[float, tables.FoundItem]]:
+    found = []
+    for row in rows:
+        distance = haversine_m(lat, lon, row.lat, row.lon)
+        if distance <= radius_m:
+            found.append((distance, row))
+    found.sort(key=lambda pair: pair[0])
+    return found[:limit]
+
+
+@timed(DB_QUERY_SECONDS, operation="get_found_items")
+def get_found_items(
+    db: Session,
+    limit: int,
+    after: Optional[Tuple[datetime, uuid.UUID]] = None,
+    type_id: Optional[uuid.UUID] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+):
+    """One page of found items, newest first
+
+    Pages are addressed by keyset: `after` is the `(created_at, id)` of the
+    last row of the previous page, so every page is a bounded index range
+    scan no matter how deep it is.
+    """
+    stmt = select_found_items_page(limit, after, type_id, since, until)
+    return db.execute(stmt).scalars().all()
 
 
 def get_found_item(db: Session, item_id: uuid.UUID):
-    return db.query(tables.FoundItem).filter(tables.FoundItem.id == item_id).first()
+    return db.get(tables.FoundItem, item_id)
+
+
+def get_found_items_by_ids(db: Session, ids: List[uuid.UUID]):
+    """Rows for `ids`, in the order of `ids`"""
+    if not ids:
+        return []
+    stmt = select(tables.FoundItem).where(tables.FoundItem.id.in_(ids))
+    return in_order_of(db.execute(stmt).scalars(), ids)
+
+
+@timed(DB_QUERY_SECONDS, operation="get_found_item_points")
+def get_found_item_points(db: Session) -> List[Point]:
+    """Every located found item, for loading the in-memory grid index"""
+    FoundItem = tables.FoundItem
+    rows = (
+        db.query(FoundItem.id, FoundItem.lat, FoundItem.lon, FoundItem.type_id)
+        .filter(FoundItem.lat.isnot(None), FoundItem.lon.isnot(None))
+        .all()
+    )
+    return [Point(*row) for row in rows]
+
+
+@timed(DB_QUERY_SECONDS, operation="get_found_items_in_bbox")
+def get_found_items_in_bbox(
+    db: Session, bbox: BBox, type_id: Optional[uuid.UUID] = None, limit: int = 1000
+):
+    if found_item_index.loaded:
+        points = found_item_index.within(bbox, type_id, limit)
+        return get_found_items_by_ids(db, [point.id for point in points])
+    stmt = select_found_items_in_bbox(bbox, type_id).limit(limit)
+    return db.execute(stmt).scalars().all()
+
+
+@timed(DB_QUERY_SECONDS, operation="get_found_item_points_in_bbox")
+def get_found_item_points_in_bbox(
+    db: Session, bbox: BBox, type_id: Optional[uuid.UUID] = None
+) -> List[Point]:
+    """Locations of the found items inside `bbox`, without loading full rows"""
+    if found_item_index.loaded:
+        return found_item_index.within(bbox, type_id)
+    FoundItem = tables.FoundItem
+    stmt = select_found_items_in_bbox(
+        bbox, type_id, FoundItem.id, FoundItem.lat, FoundItem.lon, FoundItem.type_id
+    )
+    return [Point(*row) for row in db.execute(stmt)]
+
+
+@timed(DB_QUERY_SECONDS, operation="get_found_item_clusters")
+def get_found_item_clusters(
+    db: Session, bbox: BBox, precision: int
+) -> List[Tuple[str, uuid.UUID, int, float, float]]:
+    """Found items inside `bbox` grouped by geohash cell and type
+
+    Returns `(cell, type_id, count, mean_lat, mean_lon)` per group, `cell`
+    being the `precision` characters long geohash prefix. The grouping runs
+    in the database, only the aggregates are transferred.
+    """
+    if found_item_index.loaded:
+        groups: Dict[Tuple[str, uuid.UUID], List[float]] = {}
+        for point in found_item_index.within(bbox):
+            cell = geohash_encode(point.lat, point.lon, precision)
+            group = groups.setdefault((cell, point.type_id), [0, 0.0, 0.0])
+            group[0] += 1
+            group[1] += point.lat
+            group[2] += point.lon
+        return [
+            (cell, type_id, count, lat_sum / count, lon_sum / count)
+            for (cell, type_id), (count, lat_sum, lon_sum) in groups.items()
+        ]
+
+    FoundItem = tables.FoundItem
+    cell = func.substr(FoundItem.geohash, 1, precision)
+    stmt = select_found_items_in_bbox(
+        bbox,
+        None,
+        cell,
+        FoundItem.type_id,
+        func.count(),
+        func.avg(FoundItem.lat),
+        func.avg(FoundItem.lon),
+    ).group_by(cell, FoundItem.type_id)
+    return [tuple(row) for row in db.execute(stmt)]
+
+
+@timed(DB_QUERY_SECONDS, operation="get_found_items_near")
+def get_found_items_near(
+    db: Session,
+    lat: float,
+    lon: float,
+    radius_m: float,
+    type_id: Optional[uuid.UUID] = None,
+    limit: int = 1000,
+) -> List[Tuple[float, tables.FoundItem]]:
+    """Found items within `radius_m` metres of (lat, lon) as (distance, item)
+
+    Nearest first. Served by the in-memory grid when it is loaded, by the
+    geohash index otherwise.
+    """
+    if found_item_index.loaded:
+        pairs = found_item_index.near(lat, lon, radius_m, type_id, limit)
+        rows = get_found_items_by_ids(db, [point.id for _, point in pairs])
+        distances = {point.id: distance for distance, point in pairs}
+        return [(distances[row.id], row) for row in rows]
+
+    stmt = select_found_items_in_bbox(bbox_around(lat, lon, radius_m), type_id)
+    return nearest_first(db.execute(stmt).scalars(), lat, lon, radius_m, limit)
@@ -0,0 +1,153 @@
+import asyncio
+import logging
+import threading
+import time
+import uuid
+from typing import Callable, Dict, List, Optional
+
+from sqlalchemy.orm import Session
+
+from backend.config import get_settings
+
+from . import schemas, tables
+from .database import SessionLocal
+
+logger = logging.getLogger("item_types")
+
+LOAD_RETRY_S = 1.0
+LOAD_RETRY_MAX_S = 60.0
+
+
+class ItemTypeRegistry:
+    """In-memory copy of the item_type table
+
+    The table holds a handful of seeded rows that change almost never, so
+    lookups by title or id are answered from memory. The registry is warmed
+    on startup and goes stale after `invalidate` (called by
+    `crud.create_item_type`) and, with `ttl_seconds` > 0, once the copy is
+    older than that, which also picks up rows added by other processes.
+
+    A stale copy keeps being served while a background thread reloads it,
+    so a lookup never waits on the database once a copy exists. Only the
+    very first load blocks, async callers run it off the event loop with
+    `ensure_loaded`. After a failed load no other is tried for a delay
+    doubling from LOAD_RETRY_S up to LOAD_RETRY_MAX_S.
+    """
+
+    def __init__(self, session_factory: Callable[[], Session], ttl_seconds: float = 0):
+        self.session_factory = session_factory
+        self.ttl_seconds = ttl_seconds
+
+        self._by_title: Dict[str, schemas.ItemType] = {}
+        self._by_id: Dict[uuid.UUID, schemas.ItemType] = {}
+        self._loaded_at: Optional[float] = None
+        self._invalidated = False
+        self._refreshing = False
+        self._failures = 0
+        self._retry_at = 0.0
+        self._lock = threading.Lock()
+
+        self.loads = 0
+        self.failed_loads = 0
+
+    @property
+    def loaded(self) -> bool:
+        return self._loaded_at is not None
+
+    @property
+    def fresh(self) -> bool:
+        if self._loaded_at is None or self._invalidated:
+            return False
+        if self.ttl_seconds <= 0:
+            return True
+        return time.monotonic() - self._loaded_at < self.ttl_seconds
+
+    def load(self):
+        try:
+            db = self.session_factory()
+            try:
+                rows = db.query(tables.ItemType).all()
+            finally:
+                db.close()
+        except Exception:
+            with self._lock:
+                self._failures += 1
+                self.failed_loads += 1
+                delay = min(LOAD_RETRY_S * 2 ** (self._failures - 1), LOAD_RETRY_MAX_S)
+                self._retry_at = time.monotonic() + delay
+            raise
+
+        item_types = [
+            schemas.ItemType(
+                id=row.id, title=row.title, explosion_radius=row.explosion_radius
+            )
+            for row in rows
+        ]
+        with self._lock:
+            self._by_title = {item_type.title: item_type for item_type in item_types}
+            self._by_id = {item_type.id: item_type for item_type in item_types}
+            self._loaded_at = time.monotonic()
+            self._invalidated = False
+            self._failures = 0
+            self._retry_at = 0.0
+            self.loads += 1
+        logger.info(f"Loaded {len(item_types)} item types")
+
+    def invalidate(self):
+        with self._lock:
+            self._invalidated = True
+
+    async def ensure_loaded(self):
+        """Run the first load, if still to do, off the event loop"""
+        if not self.loaded:
+            await asyncio.to_thread(self._ensure_fresh)
+
+    def all(self) -> List[schemas.ItemType]:
+        self._ensure_fresh()
+        return list(self._by_id.values())
+
+    def get_by_title(self, title: str) -> Optional[schemas.ItemType]:
+        self._ensure_fresh()
+        return self._by_title.get(title)
+
+    def get_by_id(self, type_id: uuid.UUID) -> Optional[schemas.ItemType]:
+        self._ensure_fresh()
+        return self._by_id.get(type_id)
+
+    def _ensure_fresh(self):
+        if self.fresh:
+            return
+        if self.loaded:
+            self._refresh_in_background()
+            return
+        wait = self._retry_at - time.monotonic()
+        if wait > 0:
+            raise RuntimeError(
+                f"Item types could not be loaded, next attempt in {wait:.0f} s"
+            )
+        self.load()
+
+    def _refresh_in_background(self):
+        with self._lock:
+            if self._refreshing or time.monotonic() < self._retry_at:
+                return
+            self._refreshing = True
+        threading.Thread(
+            target=self._refresh, name="item-type-refresh", daemon=True
+        ).start()
+
+    def _refresh(self):
+        try:
+            self.load()
+        except Exception as e:
+            logger.warning(
+                f"Failed to reload item types, serving the last copy: {str(e)}"
+            )
+        finally:
+            with self._lock:
+                self._refreshing = False
+
+
+item_type_registry = ItemTypeRegistry(
+    SessionLocal, ttl_seconds=get_settings().ITEM_TYPE_CACHE_TTL_S
+)
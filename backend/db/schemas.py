@@ -1,8 +1,8 @@
 import uuid
 from datetime import datetime
-from typing import Optional
+from typing import Dict, List, Optional
 
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 
 
 class ItemTypeBase(BaseModel):
@@ -34,11 +34,53 @@ class FoundItemCreate(FoundItemBase):
 class FoundItem(FoundItemBase):
     id: uuid.UUID
     created_at: datetime
+    sighting_count: int = 1
+    last_seen_at: Optional[datetime] = None
 
     class Config:
         orm_mode = True
 
 
+class FoundItemNear(FoundItem):
+    distance_m: float
+
+
+class Coordinate(BaseModel):
+    lat: float = Field(..., ge=-90, le=90)
+    lon: float = Field(..., ge=-180, le=180)
+
+
+class DangerZoneQuery(BaseModel):
+    path: List[Coordinate]
+    type_id: Optional[uuid.UUID] = None
+
+
+class DangerZoneHit(FoundItem):
+    explosion_radius: float
+    distance_m: float
+    segment: int
+
+
+class TileCluster(BaseModel):
+    lat: float
+    lon: float
+    count: int
+    counts: Dict[str, int]
+
+
+class Tile(BaseModel):
+    z: int
+    x: int
+    y: int
+    total: int
+    clusters: List[TileCluster]
+
+
+class FoundItemPage(BaseModel):
+    items: List[FoundItem]
+    next_cursor: Optional[str] = None
+
+
 # API Response schemas for documentation
 class DetectionResult(BaseModel):
     """Response model for image detection endpoint"""
@@ -59,3 +101,22 @@ class HealthCheckResponse(BaseModel):
 
     class Config:
         json_schema_extra = {"example": {"status": "healthy"}}
+
+
+class ReadinessResponse(BaseModel):
+    """Response model for readiness check endpoint"""
+
+    status: str
+    model: str
+    # "ok" or why the dependency is not ready, per check
+    checks: Dict[str, str] = {}
+    detail: Optional[str] = None
+
+    class Config:
+        json_schema_extra = {
+            "example": {
+                "status": "ready",
+                "model": "ready",
+                "checks": {"model": "ok", "inference_queue": "ok", "database": "ok"},
+            }
+        }
@@ -1,7 +1,7 @@
 import uuid
 
 import sqlalchemy as sa
-from sqlalchemy import Column, Float, ForeignKey, String
+from sqlalchemy import Column, Float, ForeignKey, Integer, String
 from sqlalchemy.dialects.postgresql import UUID
 
 from .database import Base
@@ -35,3 +35,21 @@ class FoundItem(Base):
     lon = Column(Float, nullable=True)
     type_id = Column(UUID(as_uuid=True), ForeignKey("item_type.id"), nullable=False)
     created_at = Column(sa.DateTime(), nullable=False, server_default=sa.func.now())
+    # full precision geohash of (lat, lon), a prefix match is a cell lookup
+    geohash = Column(String(12), nullable=True)
+    # reports merged into this item, see backend/dedup.py
+    sighting_count = Column(Integer, nullable=False, default=1, server_default="1")
+    # time of the latest merged report, null while there is only the first
+    last_seen_at = Column(sa.DateTime(), nullable=True)
+
+    __table_args__ = (
+        # keyset pagination, newest first, optionally within one type
+        sa.Index("ix_found_items_created_at_id", "created_at", "id"),
+        sa.Index("ix_found_items_type_id_created_at_id", "type_id", "created_at", "id"),
+        # pattern ops let LIKE 'prefix%' use the index under any collation
+        sa.Index(
+            "ix_found_items_geohash",
+            "geohash",
+            postgresql_ops={"geohash": "varchar_pattern_ops"},
+        ),
+    )
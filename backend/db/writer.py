@@ -0,0 +1,370 @@
+import itertools
+import logging
+import threading
+import time
+import uuid
+from datetime import datetime, timezone
+from typing import Callable, Dict, List, Optional, Tuple
+
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.exc import TimeoutError as PoolTimeout
+from sqlalchemy.orm import Session
+
+from backend.config import get_settings
+from backend.dedup import recent_detections
+from backend.utils.geo import valid_coordinates
+
+from . import crud, schemas
+from .database import SessionLocal
+
+logger = logging.getLogger("found_item_writer")
+
+# worth retrying later with the same rows: lost connections, lock timeouts,
+# an exhausted connection pool
+TRANSIENT_ERRORS = (OperationalError, PoolTimeout)
+
+
+class WriterFull(Exception):
+    """Raised when the write-behind queue holds its maximum number of rows"""
+
+
+class FoundItemWriter:
+    """Write-behind persistence for found items
+
+    `enqueue` assigns the row id and timestamp and returns immediately, so
+    the caller never waits on a database commit. A background thread
+    flushes the buffer with multi-row INSERTs of at most `flush_size` rows
+    once that many are queued or `flush_interval` seconds have passed. A
+    flush failing on a transient error keeps its rows at the head of the
+    queue for the next cycle, rows the database rejects are dropped (see
+    `flush`). `stop` flushes whatever is left before returning.
+
+    `enqueue_sighting` counts a repeated report of an item, queued or
+    already saved. Sightings are summed per item and applied after the
+    inserts of the same flush with one UPDATE per item.
+    """
+
+    def __init__(
+        self,
+        session_factory: Callable[[], Session],
+        flush_size: int = 100,
+        flush_interval: float = 1.0,
+        max_queue: int = 10000,
+    ):
+        self.session_factory = session_factory
+        self.flush_size = max(1, flush_size)
+        self.flush_interval = flush_interval
+        self.max_queue = max(self.flush_size, max_queue)
+
+        self._queue: List[Tuple[uuid.UUID, schemas.FoundItemCreate]] = []
+        # item id -> (sightings to add, latest sighting)
+        self._sightings: Dict[uuid.UUID, Tuple[int, datetime]] = {}
+        self._cond = threading.Condition()
+        self._thread: Optional[threading.Thread] = None
+        self._stopping = False
+
+        self.flushed = 0
+        self.sightings = 0
+        self.flushes = 0
+        self.failed_flushes = 0
+        self.dropped = 0
+        self.dropped_sightings = 0
+        self.last_flush_ms = 0.0
+        self.max_flush_ms = 0.0
+        self._total_flush_ms = 0.0
+
+    @property
+    def queue_depth(self) -> int:
+        return len(self._queue) + len(self._sightings)
+
+    def start(self):
+        with self._cond:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._stopping = False
+            self._thread = threading.Thread(
+                target=self._run, name="found-item-writer", daemon=True
+            )
+            self._thread.start()
+
+    def stop(self, timeout: float = 10.0):
+        with self._cond:
+            if self._thread is None:
+                return
+            self._stopping = True
+            self._cond.notify()
+        self._thread.join(timeout)
+        self._thread = None
+        if self._queue:
+            logger.error(f"Shut down with {len(self._queue)} found items unsaved")
+        if self._sightings:
+            logger.error(
+                f"Shut down with sightings of {len(self._sightings)} items unsaved"
+            )
+
+    def enqueue(
+        self, obj: schemas.FoundItemCreate, item_id: Optional[uuid.UUID] = None
+    ) -> uuid.UUID:
+        return self.enqueue_many([obj], None if item_id is None else [item_id])[0]
+
+    def enqueue_many(
+        self,
+        objs: List[schemas.FoundItemCreate],
+        ids: Optional[List[uuid.UUID]] = None,
+    ) -> List[uuid.UUID]:
+        """Queue found items, returns their ids, taken from `ids` when given"""
+        if ids is None:
+            ids = [uuid.uuid4() for _ in objs]
+        now = datetime.now(timezone.utc).replace(tzinfo=None)
+        rows = [
+            (
+                item_id,
+                obj if obj.created_at else obj.copy(update={"created_at": now}),
+            )
+            for item_id, obj in zip(ids, objs)
+        ]
+        with self._cond:
+            if len(self._queue) + len(rows) > self.max_queue:
+                raise WriterFull(
+                    f"Found item queue is full ({len(self._queue)}/{self.max_queue})"
+                )
+            self._queue.extend(rows)
+            if len(self._queue) >= self.flush_size:
+                self._cond.notify()
+        return [item_id for item_id, _ in rows]
+
+    def enqueue_sighting(self, item_id: uuid.UUID, seen_at: Optional[datetime] = None):
+        """Count one more report of the found item `item_id`"""
+        if seen_at is None:
+            seen_at = datetime.now(timezone.utc).replace(tzinfo=None)
+        with self._cond:
+            self._add_sightings({item_id: (1, seen_at)})
+            if len(self._sightings) >= self.flush_size:
+                self._cond.notify()
+
+    def _add_sightings(self, sightings: Dict[uuid.UUID, Tuple[int, datetime]]):
+        for item_id, (count, seen_at) in sightings.items():
+            queued = self._sightings.get(item_id)
+            if queued is not None:
+                count, seen_at = queued[0] + count, max(queued[1], seen_at)
+            self._sightings[item_id] = (count, seen_at)
+
+    def flush(self) -> int:
+        """Write up to `flush_size` queued rows, returns the number saved
+
+        A transient error, e.g. a lost connection, puts the rows back at the
+        head of the queue for the next cycle. Any other error would fail
+        every retry, so the batch is split in halves until the rows the
+        database rejects are found, those are logged and dropped and the
+        others inserted. A dropped item is forgotten by the dedup step, and
+        its sightings are dropped with it.
+        """
+        with self._cond:
+            batch = self._queue[: self.flush_size]
+            del self._queue[: self.flush_size]
+            sightings = dict(itertools.islice(self._sightings.items(), self.flush_size))
+            for item_id in sightings:
+                del self._sightings[item_id]
+        if not batch and not sightings:
+            return 0
+
+        started = time.perf_counter()
+        db = self.session_factory()
+        try:
+            saved, dropped = self._insert(db, batch)
+        except Exception:
+            with self._cond:
+                self._add_sightings(sightings)
+            self.failed_flushes += 1
+            db.close()
+            raise
+        if dropped:
+            self._drop_sightings(dropped, sightings)
+        try:
+            # after the inserts, a sighting may be of an item saved just now
+            crud.add_sightings(db, sightings)
+        except TRANSIENT_ERRORS:
+            db.rollback()
+            with self._cond:
+                self._add_sightings(sightings)
+            self.failed_flushes += 1
+            raise
+        except Exception as e:
+            db.rollback()
+            self.dropped_sightings += sum(count for count, _ in sightings.values())
+            logger.error(
+                f"Dropped sightings of {len(sightings)} found items rejected "
+                f"by the database: {str(e)}"
+            )
+        finally:
+            db.close()
+
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        self.flushes += 1
+        self.flushed += saved
+        self.sightings += sum(count for count, _ in sightings.values())
+        self.last_flush_ms = elapsed_ms
+        self.max_flush_ms = max(self.max_flush_ms, elapsed_ms)
+        self._total_flush_ms += elapsed_ms
+        logger.debug(
+            f"Flushed {saved} found items and sightings of "
+            f"{len(sightings)} in {elapsed_ms:.1f} ms"
+        )
+        return saved
+
+    def _insert(
+        self, db: Session, batch: List[Tuple[uuid.UUID, schemas.FoundItemCreate]]
+    ) -> Tuple[int, List[uuid.UUID]]:
+        """Insert `batch` around the rows the database rejects
+
+        Returns the number of rows saved and the ids of those dropped. On a
+        transient error the rows not inserted yet are queued again before
+        it is raised.
+        """
+        saved, dropped = 0, []
+        pending = [batch] if batch else []
+        while pending:
+            rows = pending.pop()
+            try:
+                crud.create_found_items(
+                    db,
+                    [obj for _, obj in rows],
+                    ids=[item_id for item_id, _ in rows],
+                )
+                saved += len(rows)
+            except TRANSIENT_ERRORS:
+                db.rollback()
+                with self._cond:
+                    self._queue[:0] = [
+                        row for part in (rows, *reversed(pending)) for row in part
+                    ]
+                raise
+            except Exception as e:
+                db.rollback()
+                if len(rows) > 1:
+                    middle = len(rows) // 2
+                    pending += [rows[middle:], rows[:middle]]
+                    continue
+                item_id, obj = rows[0]
+                self.dropped += 1
+                dropped.append(item_id)
+                logger.error(
+                    f"Dropped found item {item_id} ({obj.type_id} at "
+                    f"{obj.lat}, {obj.lon}) rejected by the database: {str(e)}"
+                )
+        return saved, dropped
+
+    def _drop_sightings(
+        self,
+        item_ids: List[uuid.UUID],
+        sightings: Dict[uuid.UUID, Tuple[int, datetime]],
+    ):
+        """Forget found items that were dropped, with their sightings
+
+        Later reports nearby would otherwise be merged into an item that
+        was never saved, and their sightings update no row.
+        """
+        lost = 0
+        with self._cond:
+            for item_id in item_ids:
+                recent_detections.remove(item_id)
+                for pending in (sightings, self._sightings):
+                    count, _ = pending.pop(item_id, (0, None))
+                    lost += count
+        if lost:
+            self.dropped_sightings += lost
+            logger.error(f"Dropped {lost} sightings of dropped found items")
+
+    def stats(self) -> dict:
+        return {
+            "queue_depth": self.queue_depth,
+            "max_queue": self.max_queue,
+            "flushed": self.flushed,
+            "sightings": self.sightings,
+            "flushes": self.flushes,
+            "failed_flushes": self.failed_flushes,
+            "dropped": self.dropped,
+            "dropped_sightings": self.dropped_sightings,
+            "last_flush_ms": self.last_flush_ms,
+            "avg_flush_ms": (
+                self._total_flush_ms / self.flushes if self.flushes else 0.0
+            ),
+            "max_flush_ms": self.max_flush_ms,
+        }
+
+    def _run(self):
+        while True:
+            with self._cond:
+                if not self._stopping and self.queue_depth < self.flush_size:
+                    self._cond.wait(self.flush_interval)
+                stopping = self._stopping
+            try:
+                self.flush()
+            except Exception as e:
+                logger.warning(f"Failed to flush found items, will retry: {str(e)}")
+                if stopping:
+                    return
+                time.sleep(self.flush_interval)
+                continue
+            # stopping drains the queue one flush_size batch at a time
+            if stopping and not self.queue_depth:
+                return
+
+
+settings = get_settings()
+found_item_writer = FoundItemWriter(
+    SessionLocal,
+    flush_size=settings.FOUND_ITEM_FLUSH_SIZE,
+    flush_interval=settings.FOUND_ITEM_FLUSH_INTERVAL_S,
+    max_queue=settings.FOUND_ITEM_QUEUE_MAX,
+)
+
+
+def queue_found_items(
+    found_items: List[schemas.FoundItemCreate], seen_at: Optional[datetime] = None
+) -> Tuple[int, int]:
+    """Queue found items for saving, merging repeated reports of recent ones
+
+    A report of an item type near a recent found item of that type counts
+    as a sighting of it (see backend/dedup.py), the others are queued as
+    new found items. New items are queued first, a sighting may be of one
+    of them, and only then the sightings, so on WriterFull nothing was
+    queued. Returns (new items, sightings).
+
+    Raises ValueError, before anything is queued, when a found item has
+    coordinates that are not finite or out of range.
+    """
+    for found_item in found_items:
+        if (
+            found_item.lat is not None
+            and found_item.lon is not None
+            and not valid_coordinates(found_item.lat, found_item.lon)
+        ):
+            raise ValueError(
+                f"Invalid coordinates ({found_item.lat}, {found_item.lon})"
+            )
+    if seen_at is None:
+        seen_at = datetime.now(timezone.utc).replace(tzinfo=None)
+    new_items, new_ids, merged_into = [], [], []
+    for found_item in found_items:
+        item_id = uuid.uuid4()
+        match = None
+        if found_item.lat is not None and found_item.lon is not None:
+            match = recent_detections.claim(
+                item_id, found_item.type_id, found_item.lat, found_item.lon, seen_at
+            )
+        if match is None:
+            new_items.append(found_item.copy(update={"created_at": seen_at}))
+            new_ids.append(item_id)
+        else:
+            merged_into.append(match)
+    if new_items:
+        try:
+            found_item_writer.enqueue_many(new_items, new_ids)
+        except WriterFull:
+            for item_id in new_ids:
+                recent_detections.remove(item_id)
+            raise
+    for item_id in merged_into:
+        found_item_writer.enqueue_sighting(item_id, seen_at)
+    return len(new_items), len(merged_into)
@@ -0,0 +1,204 @@
+import math
+import threading
+import uuid
+from collections import deque
+from datetime import datetime, timezone
+from typing import Deque, Dict, Iterable, NamedTuple, Optional, Tuple
+
+from backend.config import get_settings
+from backend.utils.geo import bbox_around, haversine_m, valid_coordinates
+
+METERS_PER_DEG_LAT = 111320.0
+
+
+class RecentItem(NamedTuple):
+    id: uuid.UUID
+    type_id: uuid.UUID
+    lat: float
+    lon: float
+    # naive UTC, like found_items.created_at
+    last_seen: datetime
+
+
+class _Entry:
+    __slots__ = ("id", "type_id", "lat", "lon", "cell", "last_seen")
+
+    def __init__(self, item_id, type_id, lat, lon, cell, last_seen):
+        self.id = item_id
+        self.type_id = type_id
+        self.lat = lat
+        self.lon = lon
+        self.cell = cell
+        self.last_seen = last_seen
+
+
+def _timestamp(moment: Optional[datetime]) -> float:
+    if moment is None:
+        return datetime.now(timezone.utc).timestamp()
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=timezone.utc)
+    return moment.timestamp()
+
+
+class RecentDetections:
+    """Found items reported lately, to merge repeated reports of one object
+
+    Several people photographing the same shell in the same field would
+    otherwise each add a found item. A report of the same type within
+    `distance_m` of an item last seen at most `window_s` seconds earlier is
+    counted as another sighting of that item instead.
+
+    Items are bucketed per type in grid cells about `distance_m` on a side,
+    columns widening with latitude so a cell stays roughly square, which
+    makes a lookup scan the 3 x 3 cells around the report whatever the
+    number of items held. Items leave in the order they were last seen
+    through a deque of expiry times, each entry is pushed and popped once,
+    so expiry is amortized O(1) per report as well.
+    """
+
+    def __init__(
+        self, distance_m: float = 25.0, window_s: float = 900.0, enabled: bool = True
+    ):
+        self.enabled = enabled
+        self.distance_m = distance_m
+        self.window_s = window_s
+        self.cell_deg = distance_m / METERS_PER_DEG_LAT
+
+        self._cells: Dict[Tuple[uuid.UUID, int, int], Dict[uuid.UUID, _Entry]] = {}
+        self._items: Dict[uuid.UUID, _Entry] = {}
+        # (last_seen, item_id), an item bumped since has a newer entry behind
+        self._expiry: Deque[Tuple[float, uuid.UUID]] = deque()
+        self._lock = threading.Lock()
+
+        self.merged = 0
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def _col_deg(self, row: int) -> float:
+        # the row's edge nearest the equator, where degrees of lon are widest
+        lat = min(abs(row), abs(row + 1)) * self.cell_deg
+        return self.cell_deg / max(math.cos(math.radians(min(lat, 89.0))), 0.01)
+
+    def _cell(self, type_id: uuid.UUID, lat: float, lon: float):
+        row = math.floor(lat / self.cell_deg)
+        return type_id, row, math.floor(lon / self._col_deg(row))
+
+    def _neighbour_cells(self, type_id: uuid.UUID, lat: float, lon: float):
+        bbox = bbox_around(lat, lon, self.distance_m)
+        for row in range(
+            math.floor(bbox.min_lat / self.cell_deg),
+            math.floor(bbox.max_lat / self.cell_deg) + 1,
+        ):
+            col_deg = self._col_deg(row)
+            for col in range(
+                math.floor(bbox.min_lon / col_deg),
+                math.floor(bbox.max_lon / col_deg) + 1,
+            ):
+                yield type_id, row, col
+
+    def load(self, items: Iterable[RecentItem], now: Optional[datetime] = None):
+        """Replace the contents with `items`, oldest sighting first"""
+        with self._lock:
+            self._cells.clear()
+            self._items.clear()
+            self._expiry.clear()
+            for item in sorted(items, key=lambda item: item.last_seen):
+                if not valid_coordinates(item.lat, item.lon):
+                    continue
+                self._add(
+                    item.id,
+                    item.type_id,
+                    item.lat,
+                    item.lon,
+                    _timestamp(item.last_seen),
+                )
+            self._expire(_timestamp(now))
+
+    def claim(
+        self,
+        item_id: uuid.UUID,
+        type_id: uuid.UUID,
+        lat: float,
+        lon: float,
+        seen_at: Optional[datetime] = None,
+    ) -> Optional[uuid.UUID]:
+        """Match a report against the recent items, or remember it as `item_id`
+
+        Returns the id of the nearest matching item, whose last sighting
+        moves to `seen_at`, or None when the report is a new item, which is
+        then held under `item_id` for the following reports to match.
+        Always None when disabled. Raises ValueError for a point that is not
+        finite or out of range, whose neighbourhood would span the globe.
+        """
+        if not self.enabled:
+            return None
+        if not valid_coordinates(lat, lon):
+            raise ValueError(f"Invalid coordinates ({lat}, {lon})")
+        seen = _timestamp(seen_at)
+        with self._lock:
+            self._expire(seen)
+            match = self._nearest(type_id, lat, lon)
+            if match is None:
+                self._add(item_id, type_id, lat, lon, seen)
+                return None
+            if seen > match.last_seen:
+                match.last_seen = seen
+                self._expiry.append((seen, match.id))
+            self.merged += 1
+            return match.id
+
+    def remove(self, item_id: uuid.UUID):
+        """Forget an item, e.g. one that could not be queued for saving"""
+        with self._lock:
+            entry = self._items.pop(item_id, None)
+            if entry is not None:
+                self._discard(entry)
+
+    def stats(self) -> dict:
+        return {"items": len(self._items), "merged": self.merged}
+
+    def _nearest(self, type_id: uuid.UUID, lat: float, lon: float):
+        best, best_distance = None, self.distance_m
+        for cell in self._neighbour_cells(type_id, lat, lon):
+            for entry in self._cells.get(cell, {}).values():
+                distance = haversine_m(lat, lon, entry.lat, entry.lon)
+                if distance <= best_distance:
+                    best, best_distance = entry, distance
+        return best
+
+    def _add(self, item_id, type_id, lat, lon, seen: float):
+        previous = self._items.get(item_id)
+        if previous is not None:
+            self._discard(previous)
+        cell = self._cell(type_id, lat, lon)
+        entry = _Entry(item_id, type_id, lat, lon, cell, seen)
+        self._items[item_id] = entry
+        self._cells.setdefault(cell, {})[item_id] = entry
+        self._expiry.append((seen, item_id))
+
+    def _discard(self, entry: _Entry):
+        bucket = self._cells.get(entry.cell)
+        if bucket is not None:
+            bucket.pop(entry.id, None)
+            if not bucket:
+                del self._cells[entry.cell]
+
+    def _expire(self, now: float):
+        cutoff = now - self.window_s
+        while self._expiry and self._expiry[0][0] < cutoff:
+            seen, item_id = self._expiry.popleft()
+            entry = self._items.get(item_id)
+            # a stale entry of an item bumped or removed since
+            if entry is None or entry.last_seen != seen:
+                continue
+            del self._items[item_id]
+            self._discard(entry)
+
+
+settings = get_settings()
+recent_detections = RecentDetections(
+    distance_m=settings.DEDUP_DISTANCE_M,
+    window_s=settings.DEDUP_WINDOW_S,
+    enabled=settings.DEDUP_ENABLED,
+)
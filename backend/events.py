@@ -0,0 +1,44 @@
+import logging
+import threading
+from typing import Any, Callable, Dict, List
+
+logger = logging.getLogger("events")
+
+# payload: list of dicts with the inserted found_items columns
+FOUND_ITEMS_CREATED = "found_items.created"
+
+
+class EventHub:
+    """In-process publish/subscribe for data changes
+
+    `publish` calls every subscriber of the topic synchronously in the
+    publishing thread, which is usually a request or the found item writer,
+    so subscribers must be quick and must not block. A failing subscriber
+    is logged and does not affect the others or the publisher.
+    """
+
+    def __init__(self):
+        self._subscribers: Dict[str, List[Callable[[Any], None]]] = {}
+        self._lock = threading.Lock()
+
+    def subscribe(self, topic: str, callback: Callable[[Any], None]):
+        with self._lock:
+            self._subscribers.setdefault(topic, []).append(callback)
+
+    def unsubscribe(self, topic: str, callback: Callable[[Any], None]):
+        with self._lock:
+            callbacks = self._subscribers.get(topic, [])
+            if callback in callbacks:
+                callbacks.remove(callback)
+
+    def publish(self, topic: str, payload: Any):
+        with self._lock:
+            callbacks = list(self._subscribers.get(topic, ()))
+        for callback in callbacks:
+            try:
+                callback(payload)
+            except Exception as e:
+                logger.warning(f"Subscriber of {topic} failed: {str(e)}")
+
+
+event_hub = EventHub()
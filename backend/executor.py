@@ -0,0 +1,260 @@
+import asyncio
+import logging
+import multiprocessing
+import threading
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from typing import Any, Callable, Optional
+
+from backend.metrics import (
+    INFERENCE_BATCH_SECONDS,
+    count_rejected,
+    observe_batch_size,
+    timed,
+)
+from backend.workers import ModelLoadFailed, WorkerPool
+from model.modelFactory import MODEL_TYPES, ModelFactory
+
+logger = logging.getLogger("inference_executor")
+
+EXECUTOR_KINDS = ("thread", "process", "shm")
+EXECUTOR_STATES = ("cold", "loading", "ready", "failed")
+
+# every pool worker (thread or process) owns its own model copy, ultralytics
+# predictors are not safe to share between concurrently running threads
+_worker = threading.local()
+
+
+def _init_worker(weights_path: str, backend: str):
+    _worker.model = ModelFactory.create(backend, weights_path=weights_path)
+
+
+def _predict_batch(images):
+    return _worker.model.predict_batch(images)
+
+
+def _input_size():
+    return _worker.model.input_size
+
+
+class InferenceUnavailable(Exception):
+    """Raised when a request cannot be admitted for inference right now"""
+
+    retry_after = 1
+
+
+class InferenceSaturated(InferenceUnavailable):
+    """Raised when the executor already holds its maximum number of requests"""
+
+
+class ModelLoading(InferenceUnavailable):
+    """Raised while the workers are still loading the model"""
+
+    retry_after = 5
+
+
+class InferenceExecutor:
+    """Run model inference off the event loop with bounded admission
+
+    `kind` selects a thread pool, a process pool, or a `WorkerPool` of
+    processes that receive frames through shared memory; either way each
+    worker loads its own copy of the model once on start. Requests enter
+    through `admit()`, which fails immediately with `InferenceSaturated` once
+    `max_pending` requests are in flight, so callers can answer 503 instead
+    of queueing without bound. `warm_up` loads the model in every worker
+    ahead of the first request, `admit()` raises `ModelLoading` meanwhile;
+    without it workers load on first use.
+    """
+
+    def __init__(
+        self,
+        weights_path: str,
+        kind: str = "thread",
+        backend: str = "yolo",
+        workers: int = 1,
+        max_pending: int = 32,
+        load_timeout: Optional[float] = None,
+    ):
+        if kind not in EXECUTOR_KINDS:
+            raise ValueError(
+                f"Unknown inference executor '{kind}', expected one of {EXECUTOR_KINDS}"
+            )
+        if backend not in MODEL_TYPES:
+            raise ValueError(
+                f"Unknown model backend '{backend}', expected one of {MODEL_TYPES}"
+            )
+        self.weights_path = weights_path
+        self.kind = kind
+        self.backend = backend
+        self.workers = max(1, workers)
+        self.max_pending = max(1, max_pending)
+        self.load_timeout = load_timeout
+
+        self._pool: Optional[Executor] = None
+        self._workers: Optional[WorkerPool] = (
+            WorkerPool(weights_path, self.workers, backend) if kind == "shm" else None
+        )
+        self._lock = threading.Lock()
+        self.pending = 0
+        self.rejected = 0
+
+        # cold -> loading -> ready | failed, only `warm_up` leaves cold and
+        # a warm-up that timed out still goes failed -> ready
+        self.state = "cold"
+        self.load_seconds: Optional[float] = None
+        self.load_error: Optional[str] = None
+        self._loading: Optional[asyncio.Future] = None
+
+    @property
+    def saturated(self) -> bool:
+        return self.pending >= self.max_pending
+
+    def _get_pool(self) -> Executor:
+        with self._lock:
+            if self._pool is None:
+                if self.kind == "process":
+                    self._pool = ProcessPoolExecutor(
+                        max_workers=self.workers,
+                        mp_context=multiprocessing.get_context("spawn"),
+                        initializer=_init_worker,
+                        initargs=(self.weights_path, self.backend),
+                    )
+                else:
+                    self._pool = ThreadPoolExecutor(
+                        max_workers=self.workers,
+                        thread_name_prefix="inference",
+                        initializer=_init_worker,
+                        initargs=(self.weights_path, self.backend),
+                    )
+                logger.info(
+                    f"Started {self.kind} inference pool with {self.workers} worker(s)"
+                )
+            return self._pool
+
+    @asynccontextmanager
+    async def admit(self):
+        if self.state == "loading":
+            self.rejected += 1
+            count_rejected()
+            raise ModelLoading("Model is still loading")
+        if self.saturated:
+            self.rejected += 1
+            count_rejected()
+            raise InferenceSaturated(
+                f"Inference queue is full ({self.pending}/{self.max_pending})"
+            )
+        self.pending += 1
+        try:
+            yield
+        finally:
+            self.pending -= 1
+
+    async def run(self, fn: Callable[..., Any], *args) -> Any:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._get_pool(), fn, *args)
+
+    async def predict_batch(self, images):
+        observe_batch_size(len(images))
+        with timed(INFERENCE_BATCH_SECONDS, executor=self.kind):
+            if self._workers is not None:
+                try:
+                    return await self._workers.predict_batch(images)
+                except ModelLoadFailed as e:
+                    self._failed(e)
+                    raise
+            return await self.run(_predict_batch, images)
+
+    async def get_input_size(self) -> int:
+        """Model input size, raises ModelLoading after `load_timeout` seconds"""
+        try:
+            if self._workers is not None:
+                return await self._workers.get_input_size(self.load_timeout)
+            return await asyncio.wait_for(self.run(_input_size), self.load_timeout)
+        except ModelLoadFailed as e:
+            self._failed(e)
+            raise
+        except asyncio.TimeoutError as e:
+            raise ModelLoading(
+                f"Model did not load within {self.load_timeout} s"
+            ) from e
+
+    async def warm_up(self, timeout: Optional[float] = None) -> int:
+        """Load the model in every worker now rather than on first use
+
+        Returns the model input size. On a timeout the state is "failed"
+        but the workers go on loading, and the state becomes "ready" once
+        they are done.
+        """
+        self.state = "loading"
+        started = time.perf_counter()
+        self._loading = asyncio.ensure_future(self._load())
+        try:
+            size = await asyncio.wait_for(asyncio.shield(self._loading), timeout)
+        except BaseException as e:
+            self.state = "failed"
+            self.load_error = str(e) or type(e).__name__
+            if isinstance(e, asyncio.TimeoutError):
+                self.load_error = f"Model did not load within {timeout} s"
+                self._loading.add_done_callback(
+                    lambda loading: self._loaded_late(loading, started)
+                )
+            else:
+                self._loading.cancel()
+            raise
+        self._loaded(started)
+        return size
+
+    async def _load(self) -> int:
+        if self._workers is not None:
+            return await self._workers.wait_ready()
+        # one call per worker, each starts a worker running the initializer
+        sizes = await asyncio.gather(
+            *(self.run(_input_size) for _ in range(self.workers))
+        )
+        return sizes[0]
+
+    def _loaded(self, started: float):
+        self.state = "ready"
+        self.load_error = None
+        self.load_seconds = time.perf_counter() - started
+        logger.info(f"Model loaded in {self.load_seconds:.1f} s")
+
+    def _failed(self, error: Exception):
+        """The workers cannot load the model, readiness reports why"""
+        self.state = "failed"
+        self.load_error = str(error) or type(error).__name__
+
+    def _loaded_late(self, loading: asyncio.Future, started: float):
+        if loading.cancelled():
+            return
+        error = loading.exception()
+        if error is not None:
+            self.load_error = str(error) or type(error).__name__
+            logger.error(
+                f"Model failed to load after warm-up timed out: {self.load_error}"
+            )
+            return
+        self._loaded(started)
+
+    def shutdown(self, wait: bool = True):
+        if self._loading is not None:
+            self._loading.cancel()
+        if self._workers is not None:
+            self._workers.stop()
+        with self._lock:
+            if self._pool is not None:
+                self._pool.shutdown(wait=wait, cancel_futures=True)
+                self._pool = None
+
+    def stats(self) -> dict:
+        return {
+            "kind": self.kind,
+            "state": self.state,
+            "load_seconds": self.load_seconds,
+            "workers": self.workers,
+            "pending": self.pending,
+            "max_pending": self.max_pending,
+            "rejected": self.rejected,
+            **(self._workers.stats() if self._workers is not None else {}),
+        }
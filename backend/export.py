@@ -0,0 +1,191 @@
+import csv
+import io
+import json
+import logging
+import uuid
+from datetime import datetime
+from typing import AsyncIterator, Optional, Sequence
+
+from sqlalchemy import text
+
+from backend.config import get_settings
+from backend.db import crud
+from backend.db.database import async_engine
+
+settings = get_settings()
+logger = logging.getLogger("export")
+
+EXPORT_COLUMNS = (
+    "id",
+    "created_at",
+    "lat",
+    "lon",
+    "geohash",
+    "type_id",
+    "type_title",
+    "explosion_radius",
+    "sighting_count",
+    "last_seen_at",
+)
+
+
+def _plain(value):
+    if isinstance(value, uuid.UUID):
+        return str(value)
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return value
+
+
+class NDJSONEncoder:
+    media_type = "application/x-ndjson"
+    extension = "ndjson"
+
+    def header(self) -> bytes:
+        return b""
+
+    def encode(self, rows: Sequence) -> bytes:
+        lines = (
+            json.dumps(dict(zip(EXPORT_COLUMNS, map(_plain, row)))) for row in rows
+        )
+        return ("\n".join(lines) + "\n").encode()
+
+    def footer(self) -> bytes:
+        return b""
+
+
+class CSVEncoder:
+    media_type = "text/csv"
+    extension = "csv"
+
+    def _write(self, rows) -> bytes:
+        buf = io.StringIO()
+        csv.writer(buf).writerows(rows)
+        return buf.getvalue().encode()
+
+    def header(self) -> bytes:
+        return self._write([EXPORT_COLUMNS])
+
+    def encode(self, rows: Sequence) -> bytes:
+        return self._write([map(_plain, row) for row in rows])
+
+    def footer(self) -> bytes:
+        return b""
+
+
+class _ChunkSink(io.RawIOBase):
+    """Write target handing out what was written since the last drain"""
+
+    def __init__(self):
+        super().__init__()
+        self._parts = []
+        self._position = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        self._parts.append(bytes(data))
+        self._position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._position
+
+    def drain(self) -> bytes:
+        data, self._parts = b"".join(self._parts), []
+        return data
+
+
+class ArrowEncoder:
+    """Arrow IPC stream, one record batch per chunk of rows"""
+
+    media_type = "application/vnd.apache.arrow.stream"
+    extension = "arrows"
+
+    def __init__(self):
+        import pyarrow as pa
+
+        self.pa = pa
+        self.schema = pa.schema(
+            [
+                ("id", pa.string()),
+                ("created_at", pa.timestamp("us")),
+                ("lat", pa.float64()),
+                ("lon", pa.float64()),
+                ("geohash", pa.string()),
+                ("type_id", pa.string()),
+                ("type_title", pa.string()),
+                ("explosion_radius", pa.float64()),
+                ("sighting_count", pa.int64()),
+                ("last_seen_at", pa.timestamp("us")),
+            ]
+        )
+        self._sink = _ChunkSink()
+        self._writer = pa.ipc.new_stream(self._sink, self.schema)
+
+    def header(self) -> bytes:
+        return self._sink.drain()
+
+    def encode(self, rows: Sequence) -> bytes:
+        arrays = []
+        for field, values in zip(self.schema, zip(*rows)):
+            if field.name in ("id", "type_id"):
+                values = [str(v) for v in values]
+            arrays.append(self.pa.array(values, type=field.type))
+        self._writer.write_batch(
+            self.pa.RecordBatch.from_arrays(arrays, schema=self.schema)
+        )
+        return self._sink.drain()
+
+    def footer(self) -> bytes:
+        self._writer.close()
+        return self._sink.drain()
+
+
+EXPORT_FORMATS = {
+    "ndjson": NDJSONEncoder,
+    "csv": CSVEncoder,
+    "arrow": ArrowEncoder,
+}
+
+
+def create_encoder(fmt: str):
+    """Encoder for an export format, ValueError if it cannot be served"""
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(
+            f"Unknown export format '{fmt}', expected one of {tuple(EXPORT_FORMATS)}"
+        )
+    try:
+        return EXPORT_FORMATS[fmt]()
+    except ImportError:
+        raise ValueError("Arrow export needs pyarrow installed on the server")
+
+
+async def stream_found_items(
+    encoder,
+    type_id: Optional[uuid.UUID] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    chunk_size: int = 1000,
+) -> AsyncIterator[bytes]:
+    """Encoded found items, read from a server-side cursor chunk by chunk
+
+    At most one chunk of rows is held at a time whatever the table size.
+    """
+    stmt = crud.select_found_items_export(type_id, since, until).execution_options(
+        yield_per=chunk_size
+    )
+    exported = 0
+    async with async_engine.connect() as conn:
+        if conn.dialect.name == "postgresql":
+            # DB_STATEMENT_TIMEOUT_MS guards API queries, not a full export
+            timeout = int(settings.EXPORT_STATEMENT_TIMEOUT_MS)
+            await conn.execute(text(f"SET LOCAL statement_timeout = {timeout}"))
+        result = await conn.stream(stmt)
+        yield encoder.header()
+        async for rows in result.partitions(chunk_size):
+            exported += len(rows)
+            yield encoder.encode(rows)
+        yield encoder.footer()
+    logger.info(f"Exported {exported} found items")
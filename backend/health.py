@@ -0,0 +1,103 @@
+import asyncio
+import logging
+import time
+from typing import Optional, Tuple
+
+from sqlalchemy import text
+
+from backend import service
+from backend.config import get_settings
+from backend.db.database import async_engine, pool_stats
+
+settings = get_settings()
+logger = logging.getLogger("health")
+
+OK = "ok"
+
+
+class ReadinessProbe:
+    """Whether this instance should get traffic, recomputed at most every TTL
+
+    Checks the model is loaded, the inference queue has room and the
+    database answers a ping without the pool being exhausted. Probes
+    arriving within `ttl_seconds` of the last check share its result, and
+    concurrent probes share one check, so a tight probe interval on many
+    replicas never turns into load on the model or the database.
+    """
+
+    def __init__(self, ttl_seconds: float = 2.0, db_timeout_s: float = 1.0):
+        self.ttl_seconds = ttl_seconds
+        self.db_timeout_s = db_timeout_s
+        self._result: Optional[Tuple[bool, dict]] = None
+        self._checked_at = 0.0
+        self._lock: Optional[asyncio.Lock] = None
+
+    def _fresh(self) -> bool:
+        return (
+            self._result is not None
+            and time.monotonic() - self._checked_at < self.ttl_seconds
+        )
+
+    async def check(self) -> Tuple[bool, dict]:
+        """(ready, response body)"""
+        if self._fresh():
+            return self._result
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        async with self._lock:
+            if not self._fresh():
+                self._result = await self._check()
+                self._checked_at = time.monotonic()
+            return self._result
+
+    def invalidate(self):
+        self._result = None
+
+    async def _check(self) -> Tuple[bool, dict]:
+        checks = {
+            "model": self._check_model(),
+            "inference_queue": self._check_inference_queue(),
+            "database": await self._check_database(),
+        }
+        ready = all(result == OK for result in checks.values())
+        body = {
+            "status": "ready" if ready else "not_ready",
+            "model": service.executor.state,
+            "checks": checks,
+        }
+        if service.executor.load_error:
+            body["detail"] = service.executor.load_error
+        return ready, body
+
+    def _check_model(self) -> str:
+        return OK if service.model_ready() else service.executor.state
+
+    def _check_inference_queue(self) -> str:
+        executor = service.executor
+        if executor.saturated:
+            return f"saturated ({executor.pending}/{executor.max_pending})"
+        return OK
+
+    async def _check_database(self) -> str:
+        pool = pool_stats()["async"]
+        # a ping would only queue behind the requests holding every connection
+        if pool["checked_out"] >= pool["size"] + settings.DB_MAX_OVERFLOW:
+            return "pool exhausted"
+        try:
+            await asyncio.wait_for(self._ping(), self.db_timeout_s)
+        except asyncio.TimeoutError:
+            return f"no answer within {self.db_timeout_s:g} s"
+        except Exception as e:
+            logger.warning(f"Database ping failed: {str(e)}")
+            return "unreachable"
+        return OK
+
+    async def _ping(self):
+        async with async_engine.connect() as conn:
+            await conn.execute(text("SELECT 1"))
+
+
+readiness_probe = ReadinessProbe(
+    ttl_seconds=settings.HEALTH_CACHE_TTL_S,
+    db_timeout_s=settings.HEALTH_DB_TIMEOUT_S,
+)
@@ -0,0 +1,317 @@
+import asyncio
+import json
+import logging
+import math
+import signal
+import uuid
+from collections import deque
+from datetime import datetime
+from typing import AsyncIterator, Deque, Dict, FrozenSet, List, Optional, Set, Tuple
+
+from backend.config import get_settings
+from backend.events import FOUND_ITEMS_CREATED, event_hub
+from backend.utils.geo import BBox
+
+settings = get_settings()
+logger = logging.getLogger("live")
+
+SLOW_CONSUMER_POLICIES = ("drop", "disconnect")
+
+# subscribers are indexed by the 1 degree cells their bounding box overlaps,
+# a box over more cells than this is checked against every item instead
+SUBSCRIBER_CELL_DEG = 1.0
+SUBSCRIBER_MAX_CELLS = 64
+
+
+class TooManySubscribers(Exception):
+    """Raised when LIVE_MAX_SUBSCRIBERS streams are already open"""
+
+
+def _event(name: str, data: str, event_id: Optional[str] = None) -> bytes:
+    lines = [f"event: {name}"]
+    if event_id is not None:
+        lines.append(f"id: {event_id}")
+    lines.append(f"data: {data}")
+    return ("\n".join(lines) + "\n\n").encode()
+
+
+class _Item:
+    """One found item as matched and sent, encoded once for every subscriber"""
+
+    __slots__ = ("lat", "lon", "type_id", "message")
+
+    def __init__(self, row: dict):
+        self.lat = row["lat"]
+        self.lon = row["lon"]
+        self.type_id = row["type_id"]
+        created_at = row.get("created_at")
+        payload = {
+            "id": str(row["id"]),
+            "lat": self.lat,
+            "lon": self.lon,
+            "type_id": str(self.type_id),
+            "created_at": (
+                created_at.isoformat() if isinstance(created_at, datetime) else None
+            ),
+            "sighting_count": 1,
+        }
+        self.message = _event("found_item", json.dumps(payload), payload["id"])
+
+
+class Subscription:
+    """The queue of one connected client
+
+    Filled by the feed on the event loop, drained by the client's response
+    stream. An idle subscription is a deque and an Event, no task or timer
+    of its own besides the stream waiting on it.
+    """
+
+    def __init__(
+        self,
+        bbox: Optional[BBox] = None,
+        type_ids: Optional[FrozenSet[uuid.UUID]] = None,
+        max_queue: int = 100,
+    ):
+        self.bbox = bbox
+        self.type_ids = type_ids
+        self.max_queue = max(1, max_queue)
+        self.dropped = 0
+        self.closed = False
+        self.cells: List[Tuple[int, int]] = []
+
+        self._queue: Deque[bytes] = deque()
+        self._ready = asyncio.Event()
+        # items dropped since the client was last told about it
+        self._unreported_drops = 0
+
+    def matches(self, item: _Item) -> bool:
+        if self.type_ids is not None and item.type_id not in self.type_ids:
+            return False
+        if self.bbox is not None:
+            if item.lat is None or item.lon is None:
+                return False
+            return self.bbox.contains(item.lat, item.lon)
+        return True
+
+    def offer(self, message: bytes) -> bool:
+        """Queue a message, False when the queue is full"""
+        if len(self._queue) >= self.max_queue:
+            return False
+        self._queue.append(message)
+        self._ready.set()
+        return True
+
+    def drop_oldest(self, message: bytes):
+        self._queue.popleft()
+        self._queue.append(message)
+        self.dropped += 1
+        self._unreported_drops += 1
+        self._ready.set()
+
+    def close(self):
+        self.closed = True
+        self._ready.set()
+
+    async def messages(self, heartbeat_s: float) -> AsyncIterator[bytes]:
+        """Queued messages as they arrive, a comment line after idle periods"""
+        while True:
+            if not self._queue and not self.closed:
+                self._ready.clear()
+                try:
+                    await asyncio.wait_for(self._ready.wait(), heartbeat_s)
+                except asyncio.TimeoutError:
+                    # keeps proxies from closing the idle connection
+                    yield b": keep-alive\n\n"
+                    continue
+            if self._unreported_drops:
+                # the client missed items and should backfill from the REST API
+                dropped, self._unreported_drops = self._unreported_drops, 0
+                yield _event("dropped", json.dumps({"count": dropped}))
+            while self._queue:
+                yield self._queue.popleft()
+            if self.closed:
+                return
+
+
+class LiveFeed:
+    """Fan-out of newly saved found items to Server-Sent Events subscribers
+
+    Found items are published on the event hub by whichever thread saved
+    them, usually the write-behind writer. Each published batch is handed
+    to the event loop with one `call_soon_threadsafe`, encoded once, and
+    appended to the queue of every subscriber whose bounding box and types
+    it matches, so the saving thread never waits on a client. Subscribers
+    are looked up by the cell of each item, so an item only costs the
+    subscribers watching its area plus those watching everywhere, not one
+    check per connected client.
+
+    Queues are bounded at `max_queue` messages. When a client does not
+    keep up, the "drop" policy discards its oldest queued items and sends
+    a `dropped` event with their count, "disconnect" ends its stream.
+    """
+
+    def __init__(
+        self,
+        max_queue: int = 100,
+        max_subscribers: int = 10000,
+        slow_consumer: str = "drop",
+    ):
+        if slow_consumer not in SLOW_CONSUMER_POLICIES:
+            raise ValueError(
+                f"Unknown slow consumer policy '{slow_consumer}', "
+                f"expected one of {SLOW_CONSUMER_POLICIES}"
+            )
+        self.max_queue = max_queue
+        self.max_subscribers = max_subscribers
+        self.slow_consumer = slow_consumer
+
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._subscribers: Set[Subscription] = set()
+        self._by_cell: Dict[Tuple[int, int], Set[Subscription]] = {}
+        # no bounding box, or one too large to index
+        self._everywhere: Set[Subscription] = set()
+
+        self.published = 0
+        self.dropped = 0
+        self.disconnected = 0
+
+    def __len__(self) -> int:
+        return len(self._subscribers)
+
+    def start(self, loop: asyncio.AbstractEventLoop):
+        self._loop = loop
+        event_hub.subscribe(FOUND_ITEMS_CREATED, self._on_found_items_created)
+        self._stop_on_exit_signals()
+
+    def _stop_on_exit_signals(self):
+        """End the streams as soon as the server is told to exit
+
+        uvicorn lets open responses finish before it runs the lifespan
+        shutdown, which would wait forever on a live stream, so `stop` runs
+        from the exit signal handlers ahead of the server's own.
+        """
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            previous = signal.getsignal(sig)
+            if not callable(previous):
+                continue
+
+            def handler(signum, frame, previous=previous):
+                loop = self._loop
+                if loop is not None:
+                    loop.call_soon_threadsafe(self.stop)
+                previous(signum, frame)
+
+            try:
+                signal.signal(sig, handler)
+            except ValueError:
+                # not the main thread, e.g. under a test client
+                return
+
+    def stop(self):
+        event_hub.unsubscribe(FOUND_ITEMS_CREATED, self._on_found_items_created)
+        self._loop = None
+        for subscription in list(self._subscribers):
+            subscription.close()
+        self._subscribers.clear()
+        self._by_cell.clear()
+        self._everywhere.clear()
+
+    def subscribe(
+        self,
+        bbox: Optional[BBox] = None,
+        type_ids: Optional[List[uuid.UUID]] = None,
+    ) -> Subscription:
+        if len(self._subscribers) >= self.max_subscribers:
+            raise TooManySubscribers(
+                f"Too many live subscribers ({len(self._subscribers)})"
+            )
+        subscription = Subscription(
+            bbox, frozenset(type_ids) if type_ids else None, self.max_queue
+        )
+        self._subscribers.add(subscription)
+        subscription.cells = _cells(bbox) if bbox is not None else []
+        if subscription.cells:
+            for cell in subscription.cells:
+                self._by_cell.setdefault(cell, set()).add(subscription)
+        else:
+            self._everywhere.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        self._subscribers.discard(subscription)
+        self._everywhere.discard(subscription)
+        for cell in subscription.cells:
+            watching = self._by_cell.get(cell)
+            if watching is not None:
+                watching.discard(subscription)
+                if not watching:
+                    del self._by_cell[cell]
+
+    def stats(self) -> dict:
+        return {
+            "subscribers": len(self._subscribers),
+            "published": self.published,
+            "dropped": self.dropped,
+            "disconnected": self.disconnected,
+        }
+
+    def _on_found_items_created(self, rows: List[dict]):
+        loop = self._loop
+        if loop is None or not self._subscribers:
+            return
+        try:
+            loop.call_soon_threadsafe(self._fan_out, rows)
+        except RuntimeError:
+            # the loop closed during shutdown
+            pass
+
+    def _fan_out(self, rows: List[dict]):
+        items = [_Item(row) for row in rows]
+        self.published += len(items)
+        for item in items:
+            watching = self._everywhere
+            if item.lat is not None and item.lon is not None:
+                in_cell = self._by_cell.get(_cell(item.lat, item.lon))
+                if in_cell:
+                    watching = watching | in_cell
+            for subscription in list(watching):
+                if not subscription.matches(item) or subscription.offer(item.message):
+                    continue
+                if self.slow_consumer == "drop":
+                    subscription.drop_oldest(item.message)
+                    self.dropped += 1
+                    continue
+                logger.info(
+                    f"Disconnecting a live subscriber {subscription.max_queue} "
+                    "messages behind"
+                )
+                subscription.close()
+                self.unsubscribe(subscription)
+                self.disconnected += 1
+
+
+def _cell(lat: float, lon: float) -> Tuple[int, int]:
+    return (
+        math.floor(lat / SUBSCRIBER_CELL_DEG),
+        math.floor(lon / SUBSCRIBER_CELL_DEG),
+    )
+
+
+def _cells(bbox: BBox) -> List[Tuple[int, int]]:
+    """Cells overlapping `bbox`, none when there are too many to index"""
+    min_row, min_col = _cell(bbox.min_lat, bbox.min_lon)
+    max_row, max_col = _cell(bbox.max_lat, bbox.max_lon)
+    if (max_row - min_row + 1) * (max_col - min_col + 1) > SUBSCRIBER_MAX_CELLS:
+        return []
+    return [
+        (row, col)
+        for row in range(min_row, max_row + 1)
+        for col in range(min_col, max_col + 1)
+    ]
+
+
+live_feed = LiveFeed(
+    max_queue=settings.LIVE_QUEUE_SIZE,
+    max_subscribers=settings.LIVE_MAX_SUBSCRIBERS,
+    slow_consumer=settings.LIVE_SLOW_CONSUMER,
+)
@@ -0,0 +1,357 @@
+import asyncio
+import bisect
+import functools
+import threading
+import time
+from typing import Callable, Dict, List, Sequence, Tuple
+
+from backend.config import get_settings
+
+settings = get_settings()
+
+# seconds, from a cache hit to a slow batch on a busy CPU
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5)
+
+# lower bounds of the confidence buckets predictions are counted in
+CONFIDENCE_BUCKETS = (0.0, 0.2, 0.4, 0.6, 0.8)
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+class Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: dict) -> Tuple[str, ...]:
+        if len(labels) != len(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def _labels(self, key: Tuple[str, ...], extra: Sequence[Tuple[str, str]] = ()):
+        pairs = list(zip(self.labelnames, key)) + list(extra)
+        if not pairs:
+            return ""
+        return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in pairs) + "}"
+
+    def samples(self) -> List[str]:
+        raise NotImplementedError
+
+    def render(self) -> List[str]:
+        return [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} {self.kind}",
+            *self.samples(),
+        ]
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1.0, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            values = list(self._values.items())
+        return [f"{self.name}{self._labels(k)} {_format_value(v)}" for k, v in values]
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def set(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = float(value)
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, *args, buckets: Sequence[float] = DEFAULT_BUCKETS, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.buckets = tuple(sorted(buckets)) + (float("inf"),)
+        # per label set: observation count per bucket (not cumulative), sum
+        self._values: Dict[Tuple[str, ...], Tuple[List[int], List[float]]] = {}
+
+    def observe(self, value: float, **labels):
+        self._observe(self._key(labels), value)
+
+    def _observe(self, key: Tuple[str, ...], value: float):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            counts, total = self._values.setdefault(
+                key, ([0] * len(self.buckets), [0.0])
+            )
+            counts[index] += 1
+            total[0] += value
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            values = [(k, list(c), t[0]) for k, (c, t) in self._values.items()]
+        lines = []
+        for key, counts, total in values:
+            cumulative = 0
+            for bound, count in zip(self.buckets, counts):
+                cumulative += count
+                labels = self._labels(key, [("le", _format_value(bound))])
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            lines.append(f"{self.name}_sum{self._labels(key)} {_format_value(total)}")
+            lines.append(f"{self.name}_count{self._labels(key)} {cumulative}")
+        return lines
+
+
+class Registry:
+    """Metrics rendered by GET /metrics in the Prometheus text format"""
+
+    def __init__(self, enabled: bool = True):
+        self.enabled = enabled
+        self._metrics: List[Metric] = []
+
+    def register(self, metric: Metric) -> Metric:
+        self._metrics.append(metric)
+        return metric
+
+    def counter(self, name, documentation, labelnames=()) -> Counter:
+        return self.register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name, documentation, labelnames=()) -> Gauge:
+        return self.register(Gauge(name, documentation, labelnames))
+
+    def histogram(
+        self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS
+    ) -> Histogram:
+        return self.register(
+            Histogram(name, documentation, labelnames, buckets=buckets)
+        )
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+class _Timer:
+    def __init__(self, histogram: Histogram, labels: dict):
+        self.histogram = histogram
+        # resolved once, not on every observation
+        self.key = histogram._key(labels)
+        self.started = 0.0
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.histogram._observe(self.key, time.perf_counter() - self.started)
+        return False
+
+    def __call__(self, fn: Callable) -> Callable:
+        histogram, key = self.histogram, self.key
+        if asyncio.iscoroutinefunction(fn):
+
+            @functools.wraps(fn)
+            async def async_wrapper(*args, **kwargs):
+                started = time.perf_counter()
+                try:
+                    return await fn(*args, **kwargs)
+                finally:
+                    histogram._observe(key, time.perf_counter() - started)
+
+            return async_wrapper
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                histogram._observe(key, time.perf_counter() - started)
+
+        return wrapper
+
+
+class _NoopTimer:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+    def __call__(self, fn: Callable) -> Callable:
+        return fn
+
+
+_NOOP_TIMER = _NoopTimer()
+
+
+def timed(histogram: Histogram, **labels):
+    """Observe the duration of a block or of every call of a function
+
+    with timed(UPLOAD_STAGE_SECONDS, stage="decode"): ...
+    @timed(DB_QUERY_SECONDS, operation="create_found_items")
+
+    Works on sync and async functions. With metrics disabled it returns a
+    shared no-op: blocks are not timed and decorators return the function
+    unwrapped.
+    """
+    if not registry.enabled:
+        return _NOOP_TIMER
+    return _Timer(histogram, labels)
+
+
+def confidence_bucket(confidence: float) -> str:
+    """Label of the CONFIDENCE_BUCKETS range `confidence` falls in"""
+    lower = max(b for b in CONFIDENCE_BUCKETS if b <= max(confidence, 0.0))
+    index = CONFIDENCE_BUCKETS.index(lower)
+    upper = CONFIDENCE_BUCKETS[index + 1] if index + 1 < len(CONFIDENCE_BUCKETS) else 1
+    return f"{lower:g}-{upper:g}"
+
+
+def observe_prediction(top_name: str, top_conf: float):
+    if registry.enabled:
+        PREDICTIONS.inc(**{"class": top_name}, confidence=confidence_bucket(top_conf))
+
+
+def observe_batch_size(size: int):
+    if registry.enabled:
+        INFERENCE_BATCH_SIZE.observe(size)
+
+
+def count_rejected():
+    if registry.enabled:
+        INFERENCE_REJECTED.inc()
+
+
+class RequestMetricsMiddleware:
+    """Count and time HTTP requests per route template and status code
+
+    Plain ASGI rather than BaseHTTPMiddleware, so responses, streaming ones
+    included, pass through untouched.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = {"code": 500}
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+            await send(message)
+
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            route = scope.get("route")
+            # the template, not the raw path, keeps ids out of the labels
+            path = getattr(route, "path", None) or "unmatched"
+            HTTP_REQUEST_SECONDS.observe(
+                time.perf_counter() - started, method=scope["method"], path=path
+            )
+            HTTP_REQUESTS.inc(
+                method=scope["method"], path=path, status=str(status["code"])
+            )
+
+
+registry = Registry(enabled=settings.METRICS_ENABLED)
+
+HTTP_REQUESTS = registry.counter(
+    "vanguard_http_requests_total",
+    "HTTP requests by route and response status",
+    ["method", "path", "status"],
+)
+HTTP_REQUEST_SECONDS = registry.histogram(
+    "vanguard_http_request_seconds",
+    "HTTP request duration by route",
+    ["method", "path"],
+)
+UPLOAD_STAGE_SECONDS = registry.histogram(
+    "vanguard_upload_stage_seconds",
+    "Time spent in each stage of POST /api/image",
+    ["stage"],
+)
+PREDICTIONS = registry.counter(
+    "vanguard_predictions_total",
+    "Fresh predictions by top class and confidence bucket",
+    ["class", "confidence"],
+)
+INFERENCE_BATCH_SECONDS = registry.histogram(
+    "vanguard_inference_batch_seconds",
+    "Duration of one model forward pass over a batch, IPC included",
+    ["executor"],
+)
+INFERENCE_BATCH_SIZE = registry.histogram(
+    "vanguard_inference_batch_size",
+    "Images per model forward pass",
+    buckets=(1, 2, 4, 8, 16, 32, 64),
+)
+DB_QUERY_SECONDS = registry.histogram(
+    "vanguard_db_query_seconds",
+    "Duration of database operations",
+    ["operation"],
+)
+
+# sampled from the components' stats() on every scrape
+INFERENCE_PENDING = registry.gauge(
+    "vanguard_inference_pending", "Uploads admitted to inference and not done yet"
+)
+INFERENCE_MAX_PENDING = registry.gauge(
+    "vanguard_inference_max_pending", "Admitted uploads above which 503 is returned"
+)
+INFERENCE_REJECTED = registry.counter(
+    "vanguard_inference_rejected_total", "Uploads rejected with 503"
+)
+MODEL_STATE = registry.gauge(
+    "vanguard_model_state", "1 for the current model state, 0 otherwise", ["state"]
+)
+SCHEDULER_QUEUE_DEPTH = registry.gauge(
+    "vanguard_scheduler_queue_depth", "Images waiting to be batched"
+)
+WRITER_QUEUE_DEPTH = registry.gauge(
+    "vanguard_writer_queue_depth", "Found items waiting to be written"
+)
+LIVE = registry.gauge(
+    "vanguard_live",
+    "Live stream subscribers and items published, dropped and disconnected",
+    ["stat"],
+)
+DEDUP = registry.gauge(
+    "vanguard_dedup",
+    "Recent found items held for merging and reports merged since startup",
+    ["stat"],
+)
+PREDICTION_CACHE = registry.gauge(
+    "vanguard_prediction_cache", "Prediction cache counters since startup", ["stat"]
+)
+DB_POOL = registry.gauge(
+    "vanguard_db_pool",
+    "Connection pool state and checkout counters",
+    ["engine", "stat"],
+)
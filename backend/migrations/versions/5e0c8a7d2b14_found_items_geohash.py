@@ -0,0 +1,60 @@
+"""found_items geohash column
+
+Revision ID: 5e0c8a7d2b14
+Revises: d719c431c1e9
+Create Date: 2026-10-18 19:52:06.114203
+
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+from backend.utils.geo import geohash_encode
+
+# revision identifiers, used by Alembic.
+revision: str = "5e0c8a7d2b14"
+down_revision: Union[str, None] = "d719c431c1e9"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+BACKFILL_BATCH = 5000
+
+
+def upgrade():
+    op.add_column("found_items", sa.Column("geohash", sa.String(12), nullable=True))
+
+    # -----------------------------
+    # Backfill geohash for located rows
+    # -----------------------------
+    conn = op.get_bind()
+    select = sa.text(
+        "SELECT id, lat, lon FROM found_items"
+        " WHERE geohash IS NULL AND lat IS NOT NULL AND lon IS NOT NULL"
+        " LIMIT :limit"
+    )
+    update = sa.text("UPDATE found_items SET geohash = :geohash WHERE id = :id")
+    while True:
+        rows = conn.execute(select, {"limit": BACKFILL_BATCH}).fetchall()
+        if not rows:
+            break
+        conn.execute(
+            update,
+            [
+                {"id": row.id, "geohash": geohash_encode(row.lat, row.lon)}
+                for row in rows
+            ],
+        )
+
+    op.create_index(
+        "ix_found_items_geohash",
+        "found_items",
+        ["geohash"],
+        postgresql_ops={"geohash": "varchar_pattern_ops"},
+    )
+
+
+def downgrade():
+    op.drop_index("ix_found_items_geohash", table_name="found_items")
+    op.drop_column("found_items", "geohash")
@@ -0,0 +1,33 @@
+"""found_items sighting count
+
+Revision ID: 8b3f1e6a9c27
+Revises: 5e0c8a7d2b14
+Create Date: 2026-10-18 21:14:37.502816
+
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "8b3f1e6a9c27"
+down_revision: Union[str, None] = "5e0c8a7d2b14"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade():
+    op.add_column(
+        "found_items",
+        sa.Column("sighting_count", sa.Integer(), nullable=False, server_default="1"),
+    )
+    op.add_column(
+        "found_items", sa.Column("last_seen_at", sa.DateTime(), nullable=True)
+    )
+
+
+def downgrade():
+    op.drop_column("found_items", "last_seen_at")
+    op.drop_column("found_items", "sighting_count")
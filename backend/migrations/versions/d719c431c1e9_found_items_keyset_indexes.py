@@ -0,0 +1,36 @@
+"""found_items keyset pagination indexes
+
+Revision ID: d719c431c1e9
+Revises: 231b03fab310
+Create Date: 2026-10-18 10:12:41.508316
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "d719c431c1e9"
+down_revision: Union[str, None] = "231b03fab310"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade():
+    # -----------------------------
+    # Indexes backing (created_at, id) keyset pagination
+    # -----------------------------
+    op.create_index(
+        "ix_found_items_created_at_id", "found_items", ["created_at", "id"]
+    )
+    op.create_index(
+        "ix_found_items_type_id_created_at_id",
+        "found_items",
+        ["type_id", "created_at", "id"],
+    )
+
+
+def downgrade():
+    op.drop_index("ix_found_items_type_id_created_at_id", table_name="found_items")
+    op.drop_index("ix_found_items_created_at_id", table_name="found_items")
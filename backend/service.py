@@ -1,7 +1,86 @@
-from model.yoloModel import YOLOModel
+import logging
+import threading
 
-model = YOLOModel("model/cls_v0.0.pt")
+from backend.batching import BatchScheduler
+from backend.cache import PredictionCache
+from backend.config import get_settings
+from backend.executor import InferenceExecutor
+from model.baseModel import BaseModel
+from model.modelFactory import ModelFactory
+
+settings = get_settings()
+logger = logging.getLogger("service")
+
+_model = None
+_model_lock = threading.Lock()
+
+
+def get_model() -> BaseModel:
+    global _model
+    with _model_lock:
+        if _model is None:
+            _model = ModelFactory.create(
+                settings.MODEL_BACKEND, weights_path=settings.MODEL_WEIGHTS_PATH
+            )
+        return _model
 
 
 def predict(image):
-    return model.predict(image)
+    return get_model().predict(image)
+
+
+def predict_batch(images):
+    return get_model().predict_batch(images)
+
+
+_input_size = settings.MODEL_INPUT_SIZE or None
+
+
+async def get_input_size() -> int:
+    """Model input resolution, asked from an inference worker once"""
+    global _input_size
+    if _input_size is None:
+        _input_size = await executor.get_input_size()
+    return _input_size
+
+
+async def warm_up():
+    """Load the model in the background, the API serves health probes meanwhile"""
+    global _input_size
+    try:
+        size = await executor.warm_up(settings.MODEL_WARMUP_TIMEOUT_S or None)
+    except Exception as e:
+        logger.error(f"Model warm-up failed: {executor.load_error or str(e)}")
+        return
+    if _input_size is None:
+        _input_size = size
+
+
+def model_ready() -> bool:
+    if settings.MODEL_WARMUP:
+        return executor.state == "ready"
+    # without warm-up workers load on first use, a cold model can take traffic
+    return executor.state != "failed"
+
+
+executor = InferenceExecutor(
+    settings.MODEL_WEIGHTS_PATH,
+    kind=settings.INFERENCE_EXECUTOR,
+    backend=settings.MODEL_BACKEND,
+    workers=settings.INFERENCE_WORKERS,
+    max_pending=settings.INFERENCE_MAX_PENDING,
+    load_timeout=settings.MODEL_WARMUP_TIMEOUT_S or None,
+)
+
+scheduler = BatchScheduler(
+    executor.predict_batch,
+    max_batch_size=settings.INFERENCE_MAX_BATCH_SIZE,
+    max_wait_ms=settings.INFERENCE_MAX_WAIT_MS,
+    max_concurrent_batches=executor.workers,
+)
+
+prediction_cache = PredictionCache(
+    max_entries=settings.PREDICTION_CACHE_SIZE,
+    ttl_seconds=settings.PREDICTION_CACHE_TTL_S,
+    max_distance=settings.PREDICTION_CACHE_PHASH_DISTANCE,
+)
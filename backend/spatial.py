@@ -0,0 +1,150 @@
+import math
+import threading
+import uuid
+from typing import Dict, Iterable, List, NamedTuple, Optional, Set, Tuple
+
+from backend.config import get_settings
+from backend.events import FOUND_ITEMS_CREATED, event_hub
+from backend.utils.geo import BBox, bbox_around, haversine_m
+
+
+class Point(NamedTuple):
+    id: uuid.UUID
+    lat: float
+    lon: float
+    type_id: uuid.UUID
+
+
+class GridIndex:
+    """In-memory uniform lat/lon grid of found item locations
+
+    Each point lands in one `cell_deg` x `cell_deg` bucket, a radius or bbox
+    query only looks at the buckets overlapping the query box. It answers
+    the same questions as the geohash column without a database, which is
+    what SPATIAL_INDEX=memory uses (tests, SQLite, single-node setups). The
+    index only accepts points once `load` has run, so it never serves a
+    partial copy of the table.
+    """
+
+    def __init__(self, cell_deg: float = 0.01):
+        self.cell_deg = cell_deg
+
+        self._cells: Dict[Tuple[int, int], Set[uuid.UUID]] = {}
+        self._points: Dict[uuid.UUID, Point] = {}
+        self._lock = threading.Lock()
+        self.loaded = False
+
+    def __len__(self) -> int:
+        return len(self._points)
+
+    def _cell(self, lat: float, lon: float) -> Tuple[int, int]:
+        return math.floor(lat / self.cell_deg), math.floor(lon / self.cell_deg)
+
+    def load(self, points: Iterable[Point]):
+        with self._lock:
+            self._cells.clear()
+            self._points.clear()
+            for point in points:
+                self._add(point)
+            self.loaded = True
+
+    def add(self, point: Point):
+        self.add_many([point])
+
+    def add_many(self, points: Iterable[Point]):
+        if not self.loaded:
+            return
+        with self._lock:
+            for point in points:
+                self._add(point)
+
+    def remove(self, item_id: uuid.UUID):
+        with self._lock:
+            point = self._points.pop(item_id, None)
+            if point is None:
+                return
+            cell = self._cell(point.lat, point.lon)
+            ids = self._cells.get(cell)
+            if ids is not None:
+                ids.discard(item_id)
+                if not ids:
+                    del self._cells[cell]
+
+    def within(
+        self,
+        bbox: BBox,
+        type_id: Optional[uuid.UUID] = None,
+        limit: Optional[int] = None,
+    ) -> List[Point]:
+        found = []
+        with self._lock:
+            for cell in self._overlapping_cells(bbox):
+                for item_id in self._cells.get(cell, ()):
+                    point = self._points[item_id]
+                    if type_id is not None and point.type_id != type_id:
+                        continue
+                    if bbox.contains(point.lat, point.lon):
+                        found.append(point)
+                        if limit is not None and len(found) >= limit:
+                            return found
+        return found
+
+    def near(
+        self,
+        lat: float,
+        lon: float,
+        radius_m: float,
+        type_id: Optional[uuid.UUID] = None,
+        limit: Optional[int] = None,
+    ) -> List[Tuple[float, Point]]:
+        """Points within `radius_m` of (lat, lon) as (distance, point), nearest first"""
+        found = []
+        for point in self.within(bbox_around(lat, lon, radius_m), type_id):
+            distance = haversine_m(lat, lon, point.lat, point.lon)
+            if distance <= radius_m:
+                found.append((distance, point))
+        found.sort(key=lambda pair: pair[0])
+        if limit is not None:
+            found = found[:limit]
+        return found
+
+    def _overlapping_cells(self, bbox: BBox):
+        rows = range(
+            math.floor(bbox.min_lat / self.cell_deg),
+            math.floor(bbox.max_lat / self.cell_deg) + 1,
+        )
+        cols = range(
+            math.floor(bbox.min_lon / self.cell_deg),
+            math.floor(bbox.max_lon / self.cell_deg) + 1,
+        )
+        # a box much larger than the populated area is cheaper to answer by
+        # walking the occupied cells than by probing every empty one
+        if len(rows) * len(cols) > len(self._cells):
+            return [
+                (row, col) for row, col in self._cells if row in rows and col in cols
+            ]
+        return [(row, col) for row in rows for col in cols]
+
+    def _add(self, point: Point):
+        previous = self._points.get(point.id)
+        if previous is not None:
+            self._cells.get(self._cell(previous.lat, previous.lon), set()).discard(
+                point.id
+            )
+        self._points[point.id] = point
+        self._cells.setdefault(self._cell(point.lat, point.lon), set()).add(point.id)
+
+
+settings = get_settings()
+found_item_index = GridIndex(cell_deg=settings.SPATIAL_GRID_CELL_DEG)
+
+
+def _on_found_items_created(rows: List[dict]):
+    found_item_index.add_many(
+        Point(row["id"], row["lat"], row["lon"], row["type_id"])
+        for row in rows
+        if row["lat"] is not None and row["lon"] is not None
+    )
+
+
+event_hub.subscribe(FOUND_ITEMS_CREATED, _on_found_items_created)
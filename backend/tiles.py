@@ -0,0 +1,193 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy.orm import Session
+
+from backend.config import get_settings
+from backend.db import crud
+from backend.events import FOUND_ITEMS_CREATED, event_hub
+from backend.utils.geo import (
+    GEOHASH_PRECISION,
+    geohash_cell_size,
+    tile_bbox,
+    tiles_containing,
+)
+
+TileKey = Tuple[int, int, int]
+
+
+def cluster_precision(z: int, grid_size: int) -> int:
+    """Coarsest geohash precision with `grid_size` or more cells across a tile"""
+    target = 360.0 / 2**z / grid_size
+    for precision in range(1, GEOHASH_PRECISION + 1):
+        if geohash_cell_size(precision)[1] <= target:
+            return precision
+    return GEOHASH_PRECISION
+
+
+def build_tile(db: Session, z: int, x: int, y: int, grid_size: int = 8) -> dict:
+    """Clusters of the found items inside one map tile
+
+    Items are grouped by geohash cell, with cells about 1/`grid_size` of the
+    tile wide, so a tile holds at most a few dozen clusters whatever the
+    number of items. Each cluster is placed at the mean position of its
+    items and carries its item count per type.
+    """
+    precision = cluster_precision(z, grid_size)
+    clusters: Dict[str, dict] = {}
+    for cell, type_id, count, lat, lon in crud.get_found_item_clusters(
+        db, tile_bbox(z, x, y), precision
+    ):
+        cluster = clusters.setdefault(
+            cell, {"count": 0, "lat": 0.0, "lon": 0.0, "counts": {}}
+        )
+        # running sums, divided into means below
+        cluster["count"] += count
+        cluster["lat"] += lat * count
+        cluster["lon"] += lon * count
+        cluster["counts"][str(type_id)] = count
+
+    for cluster in clusters.values():
+        cluster["lat"] /= cluster["count"]
+        cluster["lon"] /= cluster["count"]
+    return {
+        "z": z,
+        "x": x,
+        "y": y,
+        "total": sum(cluster["count"] for cluster in clusters.values()),
+        "clusters": sorted(clusters.values(), key=lambda c: -c["count"]),
+    }
+
+
+class TileCache:
+    """LRU/TTL cache of built map tiles, invalidated point by point
+
+    An inserted found item only changes the one tile holding it at each
+    zoom level, so `invalidate_point` drops exactly those and every other
+    cached tile stays warm. A tile being built while one of its points
+    arrives is not stored, its result may predate the insert.
+    `ttl_seconds` bounds how stale a tile can get from inserts made by other
+    processes, which this cache never hears about.
+    """
+
+    def __init__(self, max_entries: int = 4096, ttl_seconds: float = 60.0):
+        self.max_entries = max(0, max_entries)
+        self.ttl_seconds = ttl_seconds
+
+        self._entries: "OrderedDict[TileKey, Tuple[float, dict]]" = OrderedDict()
+        self._zooms: Dict[int, int] = {}
+        self._building: Dict[TileKey, int] = {}
+        self._stale = set()
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def get(self, key: TileKey) -> Optional[dict]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and (
+                self.ttl_seconds <= 0 or time.monotonic() - entry[0] <= self.ttl_seconds
+            ):
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            if entry is not None:
+                self._remove(key)
+            self.misses += 1
+            return None
+
+    def begin(self, key: TileKey):
+        """Mark `key` as being built, must be paired with `finish`"""
+        with self._lock:
+            self._building[key] = self._building.get(key, 0) + 1
+            self._zooms[key[0]] = self._zooms.get(key[0], 0) + 1
+
+    def finish(self, key: TileKey, tile: Optional[dict]):
+        """Store a built tile, unless it was invalidated while being built"""
+        with self._lock:
+            self._building[key] -= 1
+            self._zoom_done(key[0])
+            stale = key in self._stale
+            if not self._building[key]:
+                del self._building[key]
+                self._stale.discard(key)
+            if tile is None or stale or not self.max_entries:
+                return
+            self._remove(key)
+            self._entries[key] = (time.monotonic(), tile)
+            self._zooms[key[0]] = self._zooms.get(key[0], 0) + 1
+            while len(self._entries) > self.max_entries:
+                self._remove(next(iter(self._entries)))
+
+    def invalidate_point(self, lat: float, lon: float):
+        with self._lock:
+            for z in list(self._zooms):
+                for x, y in tiles_containing(lat, lon, z):
+                    key = (z, x, y)
+                    if key in self._entries:
+                        self._remove(key)
+                        self.invalidations += 1
+                    if key in self._building:
+                        self._stale.add(key)
+
+    def clear(self):
+        with self._lock:
+            for key in list(self._entries):
+                self._remove(key)
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "invalidations": self.invalidations,
+            "hit_ratio": self.hits / lookups if lookups else 0.0,
+        }
+
+    def _remove(self, key: TileKey):
+        if self._entries.pop(key, None) is not None:
+            self._zoom_done(key[0])
+
+    def _zoom_done(self, z: int):
+        self._zooms[z] -= 1
+        if not self._zooms[z]:
+            del self._zooms[z]
+
+
+settings = get_settings()
+tile_cache = TileCache(
+    max_entries=settings.TILE_CACHE_SIZE, ttl_seconds=settings.TILE_CACHE_TTL_S
+)
+
+
+def get_tile(db: Session, z: int, x: int, y: int) -> Tuple[dict, bool]:
+    """Cached or freshly built tile, and whether it came from the cache
+
+    Blocking, meant to be run off the event loop.
+    """
+    key = (z, x, y)
+    tile = tile_cache.get(key)
+    if tile is not None:
+        return tile, True
+    tile_cache.begin(key)
+    tile = None
+    try:
+        tile = build_tile(db, z, x, y, settings.TILE_GRID_SIZE)
+    finally:
+        tile_cache.finish(key, tile)
+    return tile, False
+
+
+def _on_found_items_created(rows: List[dict]):
+    for row in rows:
+        if row["lat"] is not None and row["lon"] is not None:
+            tile_cache.invalidate_point(row["lat"], row["lon"])
+
+
+event_hub.subscribe(FOUND_ITEMS_CREATED, _on_found_items_created)
@@ -0,0 +1,239 @@
+import math
+from typing import List, NamedTuple, Optional, Tuple
+
+import numpy as np
+
+EARTH_RADIUS_M = 6371008.8
+
+GEOHASH_ALPHABET = "0123456789bcdefghjkmnpqrstuvwxyz"
+GEOHASH_PRECISION = 12
+
+
+class BBox(NamedTuple):
+    min_lat: float
+    min_lon: float
+    max_lat: float
+    max_lon: float
+
+    def contains(self, lat: float, lon: float) -> bool:
+        return (
+            self.min_lat <= lat <= self.max_lat and self.min_lon <= lon <= self.max_lon
+        )
+
+
+def valid_coordinates(lat: float, lon: float) -> bool:
+    """Whether a point is finite and within -90..90 lat, -180..180 lon"""
+    return (
+        math.isfinite(lat)
+        and math.isfinite(lon)
+        and -90 <= lat <= 90
+        and -180 <= lon <= 180
+    )
+
+
+def haversine_m(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    """Great-circle distance between two points in metres"""
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    dphi = phi2 - phi1
+    dlmb = math.radians(lon2 - lon1)
+    a = (
+        math.sin(dphi / 2) ** 2
+        + math.cos(phi1) * math.cos(phi2) * math.sin(dlmb / 2) ** 2
+    )
+    return 2 * EARTH_RADIUS_M * math.asin(min(1.0, math.sqrt(a)))
+
+
+def bbox_around(lat: float, lon: float, radius_m: float) -> BBox:
+    """Smallest lat/lon box holding the circle of `radius_m` around a point
+
+    Clamped to the valid coordinate range, circles crossing a pole or the
+    antimeridian get a box that is cut at the edge of the map.
+    """
+    dlat = math.degrees(radius_m / EARTH_RADIUS_M)
+    cos_lat = math.cos(math.radians(lat))
+    dlon = (
+        180.0 if cos_lat < 1e-9 else math.degrees(radius_m / (EARTH_RADIUS_M * cos_lat))
+    )
+    return BBox(
+        max(-90.0, lat - dlat),
+        max(-180.0, lon - dlon),
+        min(90.0, lat + dlat),
+        min(180.0, lon + dlon),
+    )
+
+
+def geohash_encode(lat: float, lon: float, precision: int = GEOHASH_PRECISION) -> str:
+    lat_lo, lat_hi = -90.0, 90.0
+    lon_lo, lon_hi = -180.0, 180.0
+    chars = []
+    bits, value, even = 0, 0, True
+    while len(chars) < precision:
+        # bits alternate starting with longitude
+        if even:
+            mid = (lon_lo + lon_hi) / 2
+            if lon >= mid:
+                value = (value << 1) | 1
+                lon_lo = mid
+            else:
+                value <<= 1
+                lon_hi = mid
+        else:
+            mid = (lat_lo + lat_hi) / 2
+            if lat >= mid:
+                value = (value << 1) | 1
+                lat_lo = mid
+            else:
+                value <<= 1
+                lat_hi = mid
+        even = not even
+        bits += 1
+        if bits == 5:
+            chars.append(GEOHASH_ALPHABET[value])
+            bits, value = 0, 0
+    return "".join(chars)
+
+
+def geohash_or_none(lat: Optional[float], lon: Optional[float]) -> Optional[str]:
+    if lat is None or lon is None:
+        return None
+    return geohash_encode(lat, lon)
+
+
+def geohash_cell_size(precision: int):
+    """(height, width) in degrees of a geohash cell"""
+    lon_bits = (5 * precision + 1) // 2
+    lat_bits = 5 * precision // 2
+    return 180.0 / 2**lat_bits, 360.0 / 2**lon_bits
+
+
+def _cell_range(lo: float, hi: float, origin: float, size: float) -> range:
+    first = int((lo - origin) // size)
+    last = int((min(hi, -origin - 1e-12) - origin) // size)
+    return range(first, last + 1)
+
+
+def geohash_cover(bbox: BBox, max_cells: int = 16) -> List[str]:
+    """Geohash prefixes whose cells together cover `bbox`
+
+    Uses the finest precision at which the box needs at most `max_cells`
+    cells, so every prefix maps to one tight B-tree range scan.
+    """
+    for precision in range(GEOHASH_PRECISION, 0, -1):
+        height, width = geohash_cell_size(precision)
+        rows = _cell_range(bbox.min_lat, bbox.max_lat, -90.0, height)
+        cols = _cell_range(bbox.min_lon, bbox.max_lon, -180.0, width)
+        if len(rows) * len(cols) <= max_cells or precision == 1:
+            return sorted(
+                {
+                    geohash_encode(
+                        -90.0 + (row + 0.5) * height,
+                        -180.0 + (col + 0.5) * width,
+                        precision,
+                    )
+                    for row in rows
+                    for col in cols
+                }
+            )
+    return []
+
+
+def tile_bbox(z: int, x: int, y: int) -> BBox:
+    """Lat/lon bounds of a Web Mercator (slippy map) tile"""
+    n = 2**z
+
+    def lat(row: int) -> float:
+        return math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * row / n))))
+
+    return BBox(lat(y + 1), x / n * 360.0 - 180.0, lat(y), (x + 1) / n * 360.0 - 180.0)
+
+
+def tile_containing(lat: float, lon: float, z: int) -> Tuple[int, int]:
+    """(x, y) of the Web Mercator tile at zoom `z` holding the point"""
+    n = 2**z
+    lat = max(-85.05112878, min(85.05112878, lat))
+    x = int((lon + 180.0) / 360.0 * n)
+    y = int((1 - math.asinh(math.tan(math.radians(lat))) / math.pi) / 2 * n)
+    return min(max(x, 0), n - 1), min(max(y, 0), n - 1)
+
+
+def tiles_containing(lat: float, lon: float, z: int) -> List[Tuple[int, int]]:
+    """(x, y) of every tile at zoom `z` whose bounds, edges included, hold the point
+
+    A point on a tile edge or corner also lies in the tiles next to it, and
+    is returned by their bounding box queries as well.
+    """
+    n = 2**z
+    x, y = tile_containing(lat, lon, z)
+    tiles = [(x, y)]
+    for dx in (-1, 0, 1):
+        for dy in (-1, 0, 1):
+            nx, ny = x + dx, y + dy
+            if (dx or dy) and 0 <= nx < n and 0 <= ny < n:
+                if tile_bbox(z, nx, ny).contains(lat, lon):
+                    tiles.append((nx, ny))
+    return tiles
+
+
+def haversine_m_np(lat1, lon1, lat2, lon2) -> np.ndarray:
+    """Vectorized `haversine_m`, arguments in degrees broadcast against each other"""
+    phi1, phi2 = np.radians(lat1), np.radians(lat2)
+    dphi = phi2 - phi1
+    dlmb = np.radians(np.subtract(lon2, lon1))
+    a = np.sin(dphi / 2) ** 2 + np.cos(phi1) * np.cos(phi2) * np.sin(dlmb / 2) ** 2
+    return 2 * EARTH_RADIUS_M * np.arcsin(np.sqrt(np.minimum(1.0, a)))
+
+
+def path_distances_m(
+    path_lats: np.ndarray,
+    path_lons: np.ndarray,
+    lats: np.ndarray,
+    lons: np.ndarray,
+    block_size: int = 1 << 20,
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Distance from every point to the nearest part of a polyline
+
+    Returns `(distance_m, segment)` arrays aligned with `lats`, `segment`
+    being the index of the closest segment (0 for a single-vertex path).
+    Each segment is flattened into a local equirectangular plane only to
+    find the closest position along it, the distance to that position is
+    then exact haversine. Segments are processed in blocks so that at most
+    `block_size` segment/point pairs are held in memory at once.
+    """
+    lats = np.asarray(lats, dtype=np.float64)
+    lons = np.asarray(lons, dtype=np.float64)
+    path_lats = np.asarray(path_lats, dtype=np.float64)
+    path_lons = np.asarray(path_lons, dtype=np.float64)
+
+    best = np.full(lats.shape, np.inf)
+    best_segment = np.zeros(lats.shape, dtype=np.int64)
+    if lats.size == 0:
+        return best, best_segment
+    if path_lats.size == 1:
+        return haversine_m_np(path_lats[0], path_lons[0], lats, lons), best_segment
+
+    step = max(1, block_size // lats.size)
+    for start in range(0, path_lats.size - 1, step):
+        stop = min(start + step, path_lats.size - 1)
+        # (segments, 1) against (points,) broadcasts to (segments, points)
+        lat0 = path_lats[start:stop, None]
+        lon0 = path_lons[start:stop, None]
+        lat1 = path_lats[start + 1 : stop + 1, None]
+        lon1 = path_lons[start + 1 : stop + 1, None]
+
+        kx = np.cos(np.radians((lat0 + lat1) / 2))
+        dx, dy = (lon1 - lon0) * kx, lat1 - lat0
+        length2 = dx * dx + dy * dy
+        t = ((lons - lon0) * kx * dx + (lats - lat0) * dy) / np.where(
+            length2 > 0, length2, 1.0
+        )
+        t = np.clip(t, 0.0, 1.0)
+        distance = haversine_m_np(
+            lats, lons, lat0 + t * (lat1 - lat0), lon0 + t * (lon1 - lon0)
+        )
+
+        nearest = distance.argmin(axis=0)
+        nearest_distance = distance[nearest, np.arange(lats.size)]
+        closer = nearest_distance < best
+        best[closer] = nearest_distance[closer]
+        best_segment[closer] = nearest[closer] + start
+    return best, best_segment
@@ -2,19 +2,26 @@ import random
 from typing import Optional, Tuple
 
 from PIL import Image
-from PIL.ExifTags import GPSTAGS, TAGS
+from PIL.ExifTags import GPSTAGS, IFD, TAGS
 
 
 def get_exif_data(image: Image.Image) -> dict:
-    """Extract EXIF data from image"""
+    """Extract EXIF data from image
+
+    Reads only the metadata parsed from the file header, no pixel data
+    """
     exif_data = {}
     try:
-        info = image._getexif()
-        if info:
-            for tag, value in info.items():
-                decoded = TAGS.get(tag, tag)
-                exif_data[decoded] = value
-    except AttributeError:
+        info = image.getexif()
+        for tag, value in info.items():
+            decoded = TAGS.get(tag, tag)
+            exif_data[decoded] = value
+        gps_info = info.get_ifd(IFD.GPSInfo)
+        if gps_info:
+            exif_data["GPSInfo"] = gps_info
+        else:
+            exif_data.pop("GPSInfo", None)
+    except (AttributeError, OSError, SyntaxError, ValueError):
         pass
     return exif_data
 
@@ -0,0 +1,62 @@
+import io
+from typing import Optional, Tuple
+
+from PIL import Image
+
+from backend.utils.gps import extract_gps_coordinates
+
+HEIF_BRANDS = {b"heic", b"heix", b"hevc", b"hevx", b"heim", b"heis", b"mif1", b"msf1"}
+
+# enough leading bytes to recognise every supported format
+SNIFF_BYTES = 16
+
+
+def sniff_format(head: bytes) -> Optional[str]:
+    """Identify the image format from the file's magic bytes"""
+    if head.startswith(b"\xff\xd8\xff"):
+        return "jpeg"
+    if head.startswith(b"\x89PNG\r\n\x1a\n"):
+        return "png"
+    if head[:6] in (b"GIF87a", b"GIF89a"):
+        return "gif"
+    if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        return "webp"
+    if head[4:8] == b"ftyp" and head[8:12] in HEIF_BRANDS:
+        return "heif"
+    return None
+
+
+def decode_image(
+    content: bytes, target_size: Optional[int] = None
+) -> Tuple[Image.Image, Optional[Tuple[float, float]]]:
+    """Decode uploaded bytes into an RGB image and its EXIF GPS coordinates
+
+    `Image.open` only parses the header, so GPS is read from the EXIF block
+    before any pixel data is touched. With `target_size`, JPEGs are decoded
+    in draft mode: the decoder's DCT scaling picks the smallest 1/2, 1/4 or
+    1/8 scale that keeps both sides at least `target_size`, so a 12 MP photo
+    for a small classifier input never exists at full resolution. Pixels
+    are then decoded exactly once, straight into RGB when the source is not
+    RGB already.
+    Blocking and CPU-bound, meant to be run off the event loop.
+    """
+    img = Image.open(io.BytesIO(content))
+    gps_coords = extract_gps_coordinates(img)
+    if target_size and img.format == "JPEG":
+        img.draft("RGB", (target_size, target_size))
+    if img.mode != "RGB":
+        return img.convert("RGB"), gps_coords
+    img.load()
+    return img, gps_coords
+
+
+def dhash(image: Image.Image, size: int = 8) -> int:
+    """64-bit difference hash, stable across re-encoding and resizing"""
+    small = image.convert("L").resize((size + 1, size), Image.Resampling.BILINEAR)
+    pixels = small.tobytes()
+    bits = 0
+    for row in range(size):
+        offset = row * (size + 1)
+        for col in range(size):
+            bits = (bits << 1) | (pixels[offset + col] < pixels[offset + col + 1])
+    return bits
@@ -0,0 +1,389 @@
+import asyncio
+import itertools
+import logging
+import multiprocessing
+import queue
+import threading
+import time
+from multiprocessing import shared_memory
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from PIL import Image
+
+logger = logging.getLogger("inference_workers")
+
+# (offset, shape) of every frame inside the shared memory block of a job
+FrameLayout = List[Tuple[int, Tuple[int, ...]]]
+
+# delay before restarting a crashed worker, doubled for every crash in a row
+# before it loads the model again
+RESTART_BACKOFF_S = 1.0
+RESTART_BACKOFF_MAX_S = 60.0
+
+
+class ModelLoadFailed(RuntimeError):
+    """Raised once a worker reported that the model cannot be loaded"""
+
+
+def _worker_main(index: int, weights_path: str, backend: str, jobs, results):
+    """Entry point of a model worker process
+
+    Loads the model once, then serves jobs until it receives `None`. Frames
+    are read straight from the shared memory block named in the job, only
+    the block name and the frame layout travel through the queue. A model
+    that fails to load is reported instead of "ready" before exiting.
+    """
+    from model.modelFactory import ModelFactory
+
+    try:
+        model = ModelFactory.create(backend, weights_path=weights_path)
+    except Exception as e:
+        results.put(("load_failed", index, f"{type(e).__name__}: {e}", 0.0))
+        return
+    results.put(("ready", index, model.input_size, 0.0))
+
+    while True:
+        job = jobs.get()
+        if job is None:
+            break
+        job_id, shm_name, layout = job
+
+        started = time.perf_counter()
+        try:
+            # spawned workers share the parent's resource tracker, the parent
+            # owns the block and unlinks it once the result is back
+            shm = shared_memory.SharedMemory(name=shm_name)
+            try:
+                images = [
+                    Image.fromarray(
+                        np.ndarray(shape, dtype=np.uint8, buffer=shm.buf, offset=offset)
+                    )
+                    for offset, shape in layout
+                ]
+                payload = model.predict_batch(images)
+                del images
+            finally:
+                shm.close()
+            status = "ok"
+        except Exception as e:
+            status, payload = "error", f"{type(e).__name__}: {e}"
+        results.put((status, index, (job_id, payload), time.perf_counter() - started))
+
+
+def _release_block(shared: asyncio.Future):
+    if not shared.cancelled() and shared.exception() is None:
+        shm, _ = shared.result()
+        shm.close()
+        shm.unlink()
+
+
+class _Worker:
+    def __init__(self, index: int):
+        self.index = index
+        self.process: Optional[multiprocessing.Process] = None
+        self.jobs = None
+        self.ready = False
+        # crashes in a row before loading the model, and when to respawn
+        self.crashes = 0
+        self.restart_at: Optional[float] = None
+        self.outstanding: Dict[int, int] = {}  # job id -> number of images
+        self.completed_jobs = 0
+        self.completed_images = 0
+        self.busy_seconds = 0.0
+        self.started_at = time.monotonic()
+
+
+class WorkerPool:
+    """Pool of model processes fed with decoded RGB frames via shared memory
+
+    Every worker process loads the weights once. A batch is copied into one
+    `multiprocessing.shared_memory` block and dispatched to the worker with
+    the fewest images outstanding, so frames are never pickled. A collector
+    thread resolves the awaiting futures, records per-worker busy time and
+    restarts workers that died, failing the jobs they were holding. Workers
+    crashing again before loading the model are restarted with a growing
+    delay; once one reports that the model cannot be loaded at all, e.g. a
+    bad weights path, none is restarted and `load_error` holds the reason.
+    """
+
+    def __init__(self, weights_path: str, workers: int = 1, backend: str = "yolo"):
+        self.weights_path = weights_path
+        self.backend = backend
+        self.size = max(1, workers)
+
+        self._ctx = multiprocessing.get_context("spawn")
+        self._results = None
+        self._workers: List[_Worker] = []
+        self._futures: Dict[int, Tuple[asyncio.AbstractEventLoop, asyncio.Future]] = {}
+        self._blocks: Dict[int, shared_memory.SharedMemory] = {}
+        self._job_ids = itertools.count()
+        self._lock = threading.Lock()
+        self._collector: Optional[threading.Thread] = None
+        self._stopping = threading.Event()
+        self._started_at = time.monotonic()
+        self._ready = threading.Event()
+        self.input_size: Optional[int] = None
+        self.load_error: Optional[str] = None
+
+    @property
+    def running(self) -> bool:
+        return self._collector is not None and self._collector.is_alive()
+
+    def start(self):
+        with self._lock:
+            if self.running:
+                return
+            self._stopping.clear()
+            self._ready.clear()
+            self.load_error = None
+            self._started_at = time.monotonic()
+            self._results = self._ctx.Queue()
+            self._workers = [_Worker(i) for i in range(self.size)]
+            for worker in self._workers:
+                self._spawn(worker)
+            self._collector = threading.Thread(
+                target=self._collect, name="inference-collector", daemon=True
+            )
+            self._collector.start()
+        logger.info(f"Started {self.size} shared-memory inference worker(s)")
+
+    def stop(self, timeout: float = 5.0):
+        with self._lock:
+            if self._collector is None:
+                return
+            self._stopping.set()
+            for worker in self._workers:
+                worker.jobs.put(None)
+        for worker in self._workers:
+            worker.process.join(timeout)
+            if worker.process.is_alive():
+                worker.process.terminate()
+        self._collector.join(timeout)
+        self._collector = None
+
+        with self._lock:
+            for job_id in list(self._futures):
+                self._finish(job_id, RuntimeError("Inference workers stopped"))
+
+    async def predict_batch(self, images: List[Image.Image]):
+        # spawning workers, converting and copying frames take milliseconds
+        # per image, none of it runs on the event loop
+        loop = asyncio.get_running_loop()
+        shared = loop.run_in_executor(None, self._share_frames, images)
+        try:
+            shm, layout = await asyncio.shield(shared)
+        except asyncio.CancelledError:
+            # the copy finishes regardless, its block is released once it does
+            shared.add_done_callback(_release_block)
+            raise
+
+        future = loop.create_future()
+        with self._lock:
+            # a dead worker waiting to be restarted would never see its jobs
+            running = [w for w in self._workers if w.restart_at is None]
+            if self.load_error is not None or not running:
+                shm.close()
+                shm.unlink()
+                if self.load_error is not None:
+                    raise ModelLoadFailed(self.load_error)
+                raise RuntimeError("No inference worker is running")
+            job_id = next(self._job_ids)
+            worker = min(
+                running, key=lambda w: (sum(w.outstanding.values()), not w.ready)
+            )
+            worker.outstanding[job_id] = len(layout)
+            self._futures[job_id] = (loop, future)
+            self._blocks[job_id] = shm
+            worker.jobs.put((job_id, shm.name, layout))
+        return await future
+
+    async def wait_ready(self, timeout: Optional[float] = None) -> int:
+        """Start the pool and wait until every worker has loaded the model"""
+        if not self.running:
+            await asyncio.to_thread(self.start)
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while not all(w.ready for w in self._workers):
+            if self.load_error is not None:
+                raise ModelLoadFailed(self.load_error)
+            if deadline is not None and time.monotonic() > deadline:
+                raise TimeoutError("Inference workers did not finish loading the model")
+            await asyncio.sleep(0.05)
+        return self.input_size
+
+    async def get_input_size(self, timeout: Optional[float] = None) -> int:
+        """Model input resolution, reported by the first worker to load"""
+        if not self.running:
+            await asyncio.to_thread(self.start)
+        # also set when the model failed to load
+        if not await asyncio.to_thread(self._ready.wait, timeout):
+            raise TimeoutError("No inference worker finished loading the model")
+        if self.load_error is not None:
+            raise ModelLoadFailed(self.load_error)
+        return self.input_size
+
+    def stats(self) -> dict:
+        now = time.monotonic()
+        with self._lock:
+            workers = [
+                {
+                    "index": w.index,
+                    "pid": w.process.pid if w.process else None,
+                    "alive": bool(w.process and w.process.is_alive()),
+                    "ready": w.ready,
+                    "outstanding_images": sum(w.outstanding.values()),
+                    "completed_images": w.completed_images,
+                    "utilization": w.busy_seconds / max(now - w.started_at, 1e-9),
+                }
+                for w in self._workers
+            ]
+        completed = sum(w["completed_images"] for w in workers)
+        return {
+            "workers": workers,
+            "completed_images": completed,
+            "images_per_second": completed / max(now - self._started_at, 1e-9),
+        }
+
+    def _share_frames(
+        self, images: List[Image.Image]
+    ) -> Tuple[shared_memory.SharedMemory, FrameLayout]:
+        """Start the pool if needed and copy `images` into a new shared block"""
+        if not self.running:
+            self.start()
+
+        frames = [np.asarray(image.convert("RGB"), dtype=np.uint8) for image in images]
+        layout: FrameLayout = []
+        offset = 0
+        for frame in frames:
+            layout.append((offset, frame.shape))
+            offset += frame.nbytes
+
+        shm = shared_memory.SharedMemory(create=True, size=max(offset, 1))
+        try:
+            for (start, shape), frame in zip(layout, frames):
+                np.ndarray(shape, dtype=np.uint8, buffer=shm.buf, offset=start)[...] = (
+                    frame
+                )
+        except BaseException:
+            shm.close()
+            shm.unlink()
+            raise
+        return shm, layout
+
+    def _spawn(self, worker: _Worker):
+        worker.jobs = self._ctx.Queue()
+        worker.ready = False
+        worker.started_at = time.monotonic()
+        worker.busy_seconds = 0.0
+        worker.process = self._ctx.Process(
+            target=_worker_main,
+            args=(
+                worker.index,
+                self.weights_path,
+                self.backend,
+                worker.jobs,
+                self._results,
+            ),
+            name=f"inference-worker-{worker.index}",
+            daemon=True,
+        )
+        worker.process.start()
+
+    def _collect(self):
+        next_check = time.monotonic() + 1.0
+        while not (self._stopping.is_set() and not self._futures):
+            # once a second, whether or not results keep coming
+            if time.monotonic() >= next_check:
+                next_check = time.monotonic() + 1.0
+                if not self._stopping.is_set():
+                    self._restart_dead_workers()
+                elif not any(w.process.is_alive() for w in self._workers):
+                    return
+            try:
+                status, index, payload, busy = self._results.get(timeout=1.0)
+            except queue.Empty:
+                continue
+
+            with self._lock:
+                worker = self._workers[index]
+                if status == "ready":
+                    worker.ready = True
+                    worker.crashes = 0
+                    self.input_size = payload
+                    self._ready.set()
+                    continue
+                if status == "load_failed":
+                    self._load_failed(worker, payload)
+                    continue
+                job_id, result = payload
+                images = worker.outstanding.pop(job_id, 0)
+                worker.busy_seconds += busy
+                worker.completed_jobs += 1
+                worker.completed_images += images
+                if status == "ok":
+                    self._finish(job_id, result=result)
+                else:
+                    self._finish(job_id, RuntimeError(result))
+
+    def _load_failed(self, worker: _Worker, error: str):
+        """Stop restarting workers, the model cannot be loaded, lock held"""
+        if self.load_error is None:
+            logger.error(f"Inference worker {worker.index} failed to load: {error}")
+        self.load_error = error
+        for job_id in list(self._futures):
+            self._finish(job_id, ModelLoadFailed(error))
+        for w in self._workers:
+            w.outstanding.clear()
+        # wakes get_input_size, which raises with load_error
+        self._ready.set()
+
+    def _restart_dead_workers(self):
+        now = time.monotonic()
+        with self._lock:
+            if self.load_error is not None:
+                return
+            for worker in self._workers:
+                if worker.restart_at is None:
+                    if worker.process.is_alive():
+                        continue
+                    delay = min(
+                        RESTART_BACKOFF_S * 2**worker.crashes, RESTART_BACKOFF_MAX_S
+                    )
+                    worker.crashes += 1
+                    worker.ready = False
+                    worker.restart_at = now + delay
+                    logger.error(
+                        f"Inference worker {worker.index} exited with code "
+                        f"{worker.process.exitcode}, restarting in {delay:.0f} s"
+                    )
+                    for job_id in list(worker.outstanding):
+                        self._finish(job_id, RuntimeError("Inference worker crashed"))
+                    worker.outstanding.clear()
+                if now >= worker.restart_at:
+                    worker.restart_at = None
+                    self._spawn(worker)
+
+    def _finish(self, job_id: int, error: Optional[Exception] = None, result=None):
+        """Release the job's shared memory and resolve its future, lock held"""
+        shm = self._blocks.pop(job_id, None)
+        if shm is not None:
+            shm.close()
+            shm.unlink()
+        entry = self._futures.pop(job_id, None)
+        if entry is None:
+            return
+        loop, future = entry
+
+        def resolve():
+            if future.done():
+                return
+            if error is not None:
+                future.set_exception(error)
+            else:
+                future.set_result(result)
+
+        try:
+            loop.call_soon_threadsafe(resolve)
+        except RuntimeError:
+            # the awaiting event loop is already closed
+            pass
@@ -0,0 +1 @@
+"performance benchmarks"
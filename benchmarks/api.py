@@ -0,0 +1,434 @@
+"""Benchmark suite for the upload path, from request bytes to saved item
+
+Micro stages time the pieces of POST /api/image in-process: `decode`
+(decode_image of a 12 MP photo), `read_upload` (type and size validation
+of an upload-sized one),
+`exif` (GPS extraction) and `predict` (one forward pass through the
+service's model). The `load` stage starts a real `uvicorn backend.app:app`
+against a throwaway SQLite database and reports throughput and latency
+percentiles of POST /api/image at each concurrency level.
+
+All images are synthetic. Results are written as JSON; `--compare` checks
+them against an earlier run and exits non-zero on a regression.
+
+python -m benchmarks.api --output results.json
+python -m benchmarks.api --stages load --concurrency 1 8 32 --requests 400
+python -m benchmarks.api --compare baseline.json --tolerance 0.25
+"""
+
+import argparse
+import asyncio
+import http.client
+import io
+import json
+import os
+import platform
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.request
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+from PIL import Image
+from PIL.ExifTags import IFD
+
+STAGES = ("decode", "read_upload", "exif", "predict", "load")
+
+# titles and radii of the item_type seed migration
+ITEM_TYPES = {
+    "aircraft-bombs": 100,
+    "fuzes": 5,
+    "grenades": 10,
+    "landmines": 8,
+    "mortars": 20,
+    "projectiles": 30,
+    "rockets": 40,
+    "submunitions": 6,
+}
+
+# latency keys compared by --compare, lower is better
+COMPARED_KEYS = ("p50_ms", "p95_ms")
+
+
+def synthetic_photo(
+    width: int, height: int, seed: int = 0, gps: bool = True, quality: int = 85
+) -> bytes:
+    """Photo-like JPEG with an EXIF GPS block, distinct for every seed"""
+    rng = np.random.default_rng(seed)
+    y, x = np.mgrid[0:height, 0:width].astype(np.float32)
+    shift = rng.uniform(0, 255, 3)
+    base = np.stack(
+        [x / width * 255 + shift[0], y / height * 255 + shift[1], (x + y) % 256],
+        axis=-1,
+    )
+    pixels = np.clip(base + rng.normal(0, 12, base.shape), 0, 255).astype(np.uint8)
+    exif = Image.Exif()
+    if gps:
+        lat, lon = rng.uniform(52.0, 53.0), rng.uniform(12.9, 13.9)
+        exif[IFD.GPSInfo] = {
+            1: "N",
+            2: (float(int(lat)), float(int(lat % 1 * 60)), (lat * 3600) % 60),
+            3: "E",
+            4: (float(int(lon)), float(int(lon % 1 * 60)), (lon * 3600) % 60),
+        }
+    buf = io.BytesIO()
+    Image.fromarray(pixels, "RGB").save(buf, "JPEG", quality=quality, exif=exif)
+    return buf.getvalue()
+
+
+def summarize(timings: List[float], wall_s: Optional[float] = None) -> dict:
+    """Latency percentiles in ms of per-call timings given in seconds"""
+    ordered = sorted(timings)
+
+    def pct(q):
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))] * 1000
+
+    summary = {
+        "count": len(ordered),
+        "mean_ms": statistics.mean(ordered) * 1000,
+        "p50_ms": pct(0.50),
+        "p90_ms": pct(0.90),
+        "p95_ms": pct(0.95),
+        "p99_ms": pct(0.99),
+        "max_ms": ordered[-1] * 1000,
+    }
+    summary["per_second"] = len(ordered) / (wall_s or sum(ordered))
+    return summary
+
+
+def _time(fn: Callable[[], object], repeat: int, warmup: int = 2) -> dict:
+    for _ in range(warmup):
+        fn()
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - started)
+    return summarize(timings)
+
+
+def bench_decode(content: bytes, target_size: int, repeat: int) -> dict:
+    from backend.utils.imaging import decode_image
+
+    return {
+        "full": _time(lambda: decode_image(content), repeat),
+        "draft": _time(lambda: decode_image(content, target_size), repeat),
+    }
+
+
+def bench_read_upload(content: bytes, repeat: int) -> dict:
+    from starlette.datastructures import Headers, UploadFile
+
+    from backend.api.image import read_upload
+
+    headers = Headers({"content-type": "image/jpeg"})
+
+    async def run():
+        timings = []
+        for _ in range(repeat + 2):
+            upload = UploadFile(io.BytesIO(content), size=len(content), headers=headers)
+            started = time.perf_counter()
+            await read_upload(upload)
+            timings.append(time.perf_counter() - started)
+        return summarize(timings[2:])
+
+    return asyncio.run(run())
+
+
+def bench_exif(content: bytes, repeat: int) -> dict:
+    from backend.utils.gps import extract_gps_coordinates
+
+    return _time(
+        lambda: extract_gps_coordinates(Image.open(io.BytesIO(content))), repeat
+    )
+
+
+def bench_predict(content: bytes, repeat: int, batch_sizes: List[int]) -> dict:
+    from backend import service
+    from backend.utils.imaging import decode_image
+
+    started = time.perf_counter()
+    model = service.get_model()
+    results = {"load_s": time.perf_counter() - started}
+    image, _ = decode_image(content, model.input_size)
+    for batch_size in batch_sizes:
+        images = [image] * batch_size
+        summary = _time(lambda: service.predict_batch(images), repeat)
+        summary["images_per_second"] = summary["per_second"] * batch_size
+        results[f"batch_{batch_size}"] = summary
+    return results
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _multipart(content: bytes, filename: str) -> tuple:
+    boundary = uuid.uuid4().hex
+    body = b"".join(
+        [
+            f"--{boundary}\r\n".encode(),
+            f'Content-Disposition: form-data; name="file"; filename="{filename}"\r\n'.encode(),
+            b"Content-Type: image/jpeg\r\n\r\n",
+            content,
+            f"\r\n--{boundary}--\r\n".encode(),
+        ]
+    )
+    return body, f"multipart/form-data; boundary={boundary}"
+
+
+class _Client:
+    """Keep-alive HTTP connection owned by one load-generating thread"""
+
+    def __init__(self, port: int):
+        self.port = port
+        self.conn = http.client.HTTPConnection("127.0.0.1", port, timeout=60)
+
+    def post(self, body: bytes, content_type: str) -> int:
+        try:
+            self.conn.request(
+                "POST", "/api/image", body, {"Content-Type": content_type}
+            )
+            response = self.conn.getresponse()
+            response.read()
+            return response.status
+        except (OSError, http.client.HTTPException):
+            self.conn.close()
+            self.conn = http.client.HTTPConnection("127.0.0.1", self.port, timeout=60)
+            return 0
+
+
+def _load_level(port: int, bodies: List[tuple], concurrency: int) -> dict:
+    clients: Dict[int, _Client] = {}
+
+    def send(body):
+        client = clients.setdefault(threading.get_ident(), _Client(port))
+        started = time.perf_counter()
+        status = client.post(*body)
+        return status, time.perf_counter() - started
+
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        # one request per connection first, so connects are not timed
+        list(pool.map(send, bodies[:concurrency]))
+        started = time.perf_counter()
+        outcomes = list(pool.map(send, bodies[concurrency:]))
+        wall_s = time.perf_counter() - started
+
+    statuses: Dict[str, int] = {}
+    for status, _ in outcomes:
+        statuses[str(status)] = statuses.get(str(status), 0) + 1
+    summary = summarize([t for status, t in outcomes if status == 200] or [0.0], wall_s)
+    summary["per_second"] = statuses.get("200", 0) / wall_s
+    summary["statuses"] = statuses
+    return summary
+
+
+def _seed_database(url: str):
+    from sqlalchemy import create_engine
+    from sqlalchemy.orm import Session
+
+    from backend.db import tables
+    from backend.db.database import Base
+
+    engine = create_engine(url)
+    Base.metadata.create_all(engine)
+    with Session(engine) as db:
+        if not db.query(tables.ItemType).count():
+            db.add_all(
+                tables.ItemType(title=title, explosion_radius=radius)
+                for title, radius in ITEM_TYPES.items()
+            )
+            db.commit()
+    engine.dispose()
+
+
+def bench_load(
+    requests: int,
+    concurrency: List[int],
+    width: int,
+    height: int,
+    unique: bool,
+    timeout: float,
+) -> dict:
+    port = _free_port()
+    base = f"http://127.0.0.1:{port}"
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "backend.app:app", "--port", str(port)],
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    try:
+        started = time.perf_counter()
+        while True:
+            try:
+                with urllib.request.urlopen(f"{base}/api/health/ready", timeout=1):
+                    break
+            except (urllib.error.URLError, OSError):
+                if proc.poll() is not None:
+                    raise RuntimeError("API process exited during startup")
+                if time.perf_counter() - started > timeout:
+                    raise RuntimeError("API did not become ready in time")
+                time.sleep(0.1)
+
+        results = {"ready_s": time.perf_counter() - started, "levels": {}}
+        seed = 0
+        for level in concurrency:
+            bodies = []
+            for _ in range(requests + level):
+                seed += 1
+                content = synthetic_photo(width, height, seed if unique else 0)
+                bodies.append(_multipart(content, f"{seed}.jpg"))
+            results["levels"][f"concurrency_{level}"] = _load_level(port, bodies, level)
+        with urllib.request.urlopen(f"{base}/api/stats", timeout=5) as response:
+            results["server_stats"] = json.load(response)
+        return results
+    finally:
+        proc.terminate()
+        proc.wait(10)
+
+
+def _git_revision() -> Optional[str]:
+    try:
+        out = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True
+        )
+        return out.stdout.strip() or None
+    except OSError:
+        return None
+
+
+def regressions(results: dict, baseline: dict, tolerance: float) -> List[str]:
+    """Latencies that got slower than `baseline` by more than `tolerance`"""
+    found = []
+
+    def walk(current, previous, path):
+        for key, value in current.items():
+            if key not in previous:
+                continue
+            if isinstance(value, dict):
+                walk(value, previous[key], f"{path}.{key}" if path else key)
+            elif key in COMPARED_KEYS and previous[key]:
+                change = value / previous[key] - 1
+                if change > tolerance:
+                    found.append(
+                        f"{path}.{key}: {previous[key]:.2f} -> {value:.2f} ms "
+                        f"(+{change:.0%})"
+                    )
+
+    walk(results["stages"], baseline.get("stages", {}), "")
+    return found
+
+
+def run(args) -> dict:
+    content = synthetic_photo(args.width, args.height)
+    # uploads above MAX_UPLOAD_BYTES are rejected, keep this one below it
+    upload = synthetic_photo(args.upload_width, args.upload_height)
+    stages = {}
+    for stage in args.stages:
+        if stage == "decode":
+            stages[stage] = bench_decode(content, args.target, args.repeat)
+        elif stage == "read_upload":
+            stages[stage] = bench_read_upload(upload, args.repeat)
+        elif stage == "exif":
+            stages[stage] = bench_exif(content, args.repeat)
+        elif stage == "predict":
+            stages[stage] = bench_predict(content, args.repeat, args.batch_sizes)
+        elif stage == "load":
+            stages[stage] = bench_load(
+                args.requests,
+                args.concurrency,
+                args.upload_width,
+                args.upload_height,
+                not args.same_image,
+                args.timeout,
+            )
+    return {
+        "meta": {
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "revision": _git_revision(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "database": os.environ["DATABASE_URL"],
+            "model_backend": os.environ.get("MODEL_BACKEND", "yolo"),
+            "inference_executor": os.environ.get("INFERENCE_EXECUTOR", "thread"),
+            "image": {
+                "width": args.width,
+                "height": args.height,
+                "bytes": len(content),
+            },
+            "upload": {
+                "width": args.upload_width,
+                "height": args.upload_height,
+                "bytes": len(upload),
+            },
+        },
+        "stages": stages,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--stages", nargs="+", choices=STAGES, default=list(STAGES))
+    parser.add_argument("--repeat", type=int, default=30)
+    parser.add_argument("--width", type=int, default=4000)
+    parser.add_argument("--height", type=int, default=3000)
+    parser.add_argument(
+        "--target", type=int, default=64, help="model input size for draft decoding"
+    )
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 8])
+    parser.add_argument("--requests", type=int, default=200, help="per level")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 32])
+    parser.add_argument("--upload-width", type=int, default=1600)
+    parser.add_argument("--upload-height", type=int, default=1200)
+    parser.add_argument(
+        "--same-image",
+        action="store_true",
+        help="send one image repeatedly, measuring the prediction cache",
+    )
+    parser.add_argument("--timeout", type=float, default=300.0)
+    parser.add_argument("--output", help="write JSON results to this file")
+    parser.add_argument("--compare", help="JSON results of an earlier run")
+    parser.add_argument(
+        "--tolerance", type=float, default=0.2, help="allowed slowdown, 0.2 is 20%%"
+    )
+    args = parser.parse_args()
+
+    # the settings are read on import, default to a throwaway SQLite database
+    # so the suite runs without PostgreSQL; set DATABASE_URL to use another
+    workdir = tempfile.mkdtemp(prefix="vanguard-bench-")
+    os.environ.setdefault("DATABASE_URL", f"sqlite:///{workdir}/bench.db")
+    for name in ("POSTGRES_USER", "POSTGRES_PASSWORD", "POSTGRES_DB"):
+        os.environ.setdefault(name, "bench")
+    if "load" in args.stages:
+        _seed_database(os.environ["DATABASE_URL"])
+
+    results = run(args)
+    text = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text)
+    print(text)
+
+    if args.compare:
+        with open(args.compare) as f:
+            found = regressions(results, json.load(f), args.tolerance)
+        for line in found:
+            print(f"REGRESSION {line}", file=sys.stderr)
+        if found:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+"""Decode time and peak RSS per upload, full decode vs JPEG draft mode
+
+Each mode runs in a fresh process so its peak resident set size is not
+hidden by the other mode's allocations.
+
+python -m benchmarks.decode --width 4000 --height 3000 --target 64
+"""
+
+import argparse
+import io
+import json
+import multiprocessing
+import resource
+import statistics
+import sys
+import time
+
+import numpy as np
+from PIL import Image
+
+from backend.utils.imaging import decode_image
+
+
+def synthetic_jpeg(width: int, height: int, quality: int = 90) -> bytes:
+    """Photo-like JPEG: smooth gradients plus sensor-style noise"""
+    rng = np.random.default_rng(0)
+    y, x = np.mgrid[0:height, 0:width].astype(np.float32)
+    base = np.stack(
+        [x / width * 255, y / height * 255, (x + y) / (width + height) * 255], axis=-1
+    )
+    pixels = np.clip(base + rng.normal(0, 12, base.shape), 0, 255).astype(np.uint8)
+    buf = io.BytesIO()
+    Image.fromarray(pixels, "RGB").save(buf, "JPEG", quality=quality)
+    return buf.getvalue()
+
+
+def peak_rss_bytes() -> int:
+    """High-water mark of this process's resident set size"""
+    try:
+        # VmHWM belongs to the current address space, unlike ru_maxrss which
+        # Linux carries over from the parent across fork and exec
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is reported in bytes on macOS and in kilobytes elsewhere
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def _run_mode(content: bytes, target_size, repeat: int, out):
+    baseline = peak_rss_bytes()
+    timings = []
+    size = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        img, _ = decode_image(content, target_size)
+        timings.append(time.perf_counter() - started)
+        size = img.size
+        del img
+    out.put(
+        {
+            "decoded_size": list(size),
+            "mean_ms": statistics.mean(timings) * 1000,
+            "p50_ms": statistics.median(timings) * 1000,
+            "min_ms": min(timings) * 1000,
+            "peak_rss_delta_mb": (peak_rss_bytes() - baseline) / 2**20,
+        }
+    )
+
+
+def run(width: int, height: int, target: int, repeat: int) -> dict:
+    content = synthetic_jpeg(width, height)
+    ctx = multiprocessing.get_context("spawn")
+    results = {
+        "image": {"width": width, "height": height, "bytes": len(content)},
+        "target_size": target,
+    }
+    for mode, target_size in (("full", None), ("draft", target)):
+        out = ctx.Queue()
+        proc = ctx.Process(target=_run_mode, args=(content, target_size, repeat, out))
+        proc.start()
+        results[mode] = out.get()
+        proc.join()
+    results["speedup"] = results["full"]["mean_ms"] / results["draft"]["mean_ms"]
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--width", type=int, default=4000)
+    parser.add_argument("--height", type=int, default=3000)
+    parser.add_argument(
+        "--target", type=int, default=64, help="model input size (YOLOModel imgsz)"
+    )
+    parser.add_argument("--repeat", type=int, default=10)
+    parser.add_argument("--output", help="write JSON results to this file")
+    args = parser.parse_args()
+
+    results = run(args.width, args.height, args.target, args.repeat)
+    text = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text)
+    print(text)
+
+
+if __name__ == "__main__":
+    main()
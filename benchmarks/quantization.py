@@ -0,0 +1,174 @@
+"""Accuracy, latency and memory of the FP32 and INT8 model backends
+
+Every backend runs in a fresh process on the same images; top-1 agreement
+is measured against the FP32 ultralytics model (`yolo`), overall and for
+the predictions confident enough to be saved as found items.
+
+python -m model.export --weights model/cls_v0.0.pt
+python -m model.quantize --model model/cls_v0.0.onnx --calibration photos/
+python -m benchmarks.quantization --images photos/
+"""
+
+import argparse
+import json
+import multiprocessing
+import queue
+import statistics
+import time
+from typing import List, Optional
+
+from benchmarks.decode import peak_rss_bytes
+
+
+def current_rss_bytes() -> int:
+    """Resident set size right now, peak_rss_bytes() is a high-water mark"""
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return peak_rss_bytes()
+
+
+def _percentile(values: List[float], q: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+def _run_backend(backend, weights_path, images, count, batch_sizes, repeat, out):
+    from model.export import load_images
+    from model.modelFactory import ModelFactory
+
+    frames = load_images(images, count)
+    baseline = current_rss_bytes()
+    started = time.perf_counter()
+    model = ModelFactory.create(backend, weights_path=weights_path)
+    load_s = time.perf_counter() - started
+    model.predict_batch(frames[:1])
+    loaded_rss = current_rss_bytes()
+
+    latency = {}
+    for batch_size in batch_sizes:
+        timings = []
+        for _ in range(repeat):
+            for i in range(0, len(frames), batch_size):
+                chunk = frames[i : i + batch_size]
+                started = time.perf_counter()
+                model.predict_batch(chunk)
+                timings.append((time.perf_counter() - started) / len(chunk))
+        latency[f"batch_{batch_size}"] = {
+            "mean_ms": statistics.mean(timings) * 1000,
+            "p50_ms": statistics.median(timings) * 1000,
+            "p95_ms": _percentile(timings, 0.95) * 1000,
+        }
+
+    predictions = model.predict_batch(frames)
+    out.put(
+        {
+            "weights": weights_path,
+            "load_s": load_s,
+            "rss_model_mb": (loaded_rss - baseline) / 2**20,
+            "peak_rss_mb": peak_rss_bytes() / 2**20,
+            "latency": latency,
+            "predictions": [(p.top_name, p.top_conf) for p in predictions],
+        }
+    )
+
+
+def _collect(proc, out) -> dict:
+    """Result of a backend process, or the reason it has none
+
+    A backend failing to load, e.g. weights not exported yet or a missing
+    package, ends its process without a result instead of blocking here.
+    """
+    while True:
+        try:
+            return out.get(timeout=1.0)
+        except queue.Empty:
+            if proc.is_alive():
+                continue
+        try:
+            # put just before exiting, not yet through the queue's pipe
+            return out.get(timeout=1.0)
+        except queue.Empty:
+            return {"error": f"backend process exited with code {proc.exitcode}"}
+
+
+def run(
+    backends: List[tuple],
+    images: Optional[str],
+    count: int,
+    batch_sizes: List[int],
+    repeat: int,
+    min_confidence: float,
+) -> dict:
+    ctx = multiprocessing.get_context("spawn")
+    results = {}
+    for backend, weights_path in backends:
+        out = ctx.Queue()
+        proc = ctx.Process(
+            target=_run_backend,
+            args=(backend, weights_path, images, count, batch_sizes, repeat, out),
+        )
+        proc.start()
+        results[backend] = _collect(proc, out)
+        proc.join()
+
+    reference = results["yolo"].get("predictions", [])
+    confident = [i for i, (_, conf) in enumerate(reference) if conf >= min_confidence]
+    for result in results.values():
+        predictions = result.pop("predictions", None)
+        if predictions is None or not reference:
+            continue
+        matches = [p[0] == r[0] for p, r in zip(predictions, reference)]
+        result["top1_agreement"] = sum(matches) / len(matches)
+        result["top1_agreement_confident"] = (
+            sum(matches[i] for i in confident) / len(confident) if confident else None
+        )
+    return {
+        "images": images or "synthetic",
+        "count": len(reference),
+        "confident": len(confident),
+        "min_confidence": min_confidence,
+        "backends": results,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--weights", default="model/cls_v0.0.pt")
+    parser.add_argument("--onnx", default="model/cls_v0.0.onnx")
+    parser.add_argument("--int8", default="model/cls_v0.0.int8.onnx")
+    parser.add_argument("--images", help="folder of test images, synthetic if omitted")
+    parser.add_argument("--count", type=int, default=200)
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 8])
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument(
+        "--min-confidence",
+        type=float,
+        default=0.6,
+        help="MIN_PREDICTION_CONFIDENCE the service saves found items at",
+    )
+    parser.add_argument("--output", help="write JSON results to this file")
+    args = parser.parse_args()
+
+    backends = [("yolo", args.weights), ("onnx", args.onnx), ("onnx-int8", args.int8)]
+    results = run(
+        backends,
+        args.images,
+        args.count,
+        args.batch_sizes,
+        args.repeat,
+        args.min_confidence,
+    )
+    text = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text)
+    print(text)
+
+
+if __name__ == "__main__":
+    main()
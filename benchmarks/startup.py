@@ -0,0 +1,103 @@
+"""Time from process start until the API answers health and readiness probes
+
+Each run starts a fresh `uvicorn backend.app:app` process and polls
+/api/health (liveness) and /api/health/ready (model loaded). The import
+time of `backend.app` is measured separately in a fresh interpreter.
+
+python -m benchmarks.startup --runs 3
+"""
+
+import argparse
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _status(url: str) -> int:
+    try:
+        with urllib.request.urlopen(url, timeout=1) as response:
+            return response.status
+    except urllib.error.HTTPError as e:
+        return e.code
+    except OSError:
+        return 0
+
+
+def import_seconds() -> float:
+    code = "import time; t = time.perf_counter(); import backend.app; "
+    code += "print(time.perf_counter() - t)"
+    out = subprocess.run(
+        [sys.executable, "-c", code], capture_output=True, text=True, check=True
+    )
+    return float(out.stdout.strip().splitlines()[-1])
+
+
+def startup_run(timeout: float) -> dict:
+    port = _free_port()
+    base = f"http://127.0.0.1:{port}/api/health"
+    started = time.perf_counter()
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "backend.app:app", "--port", str(port)],
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    result = {"live_s": None, "ready_s": None}
+    try:
+        while time.perf_counter() - started < timeout:
+            if result["live_s"] is None and _status(base) == 200:
+                result["live_s"] = time.perf_counter() - started
+            if result["live_s"] is not None and _status(f"{base}/ready") == 200:
+                result["ready_s"] = time.perf_counter() - started
+                break
+            time.sleep(0.02)
+    finally:
+        proc.terminate()
+        proc.wait(10)
+    return result
+
+
+def run(runs: int, timeout: float) -> dict:
+    results = [startup_run(timeout) for _ in range(runs)]
+
+    def median(key):
+        values = [r[key] for r in results if r[key] is not None]
+        return statistics.median(values) if values else None
+
+    return {
+        "import_s": import_seconds(),
+        "live_s": median("live_s"),
+        "ready_s": median("ready_s"),
+        "model_warmup": os.environ.get("MODEL_WARMUP", "true"),
+        "runs": results,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--timeout", type=float, default=300.0)
+    parser.add_argument("--output", help="write JSON results to this file")
+    args = parser.parse_args()
+
+    results = run(args.runs, args.timeout)
+    text = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text)
+    print(text)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,79 +1,335 @@
+import argparse
+import queue
+import threading
 import tkinter as tk
-from tkinter import Button, Label, filedialog
+from collections import OrderedDict
+from tkinter import Button, Label, Listbox, Scrollbar, filedialog, ttk
 
-from PIL import Image, ImageTk
+from PIL import ImageTk
 
-from backend.service import predict
+from backend.utils.imaging import decode_image
+from model.main import find_images
+from model.modelFactory import MODEL_TYPES, ModelFactory
 
+THUMBNAIL_SIZE = (600, 400)
+THUMBNAIL_CACHE_SIZE = 64
+# images classified together while scanning a folder
+SCAN_BATCH_SIZE = 8
+# how often the Tk thread picks up results of the worker, in ms
+POLL_MS = 50
 
-# Placeholder for your model inference method
-def model_inference(image_path):
-    return predict(image_path)
+
+def load_image(path):
+    """Decode a photo once, at about display size, for showing and classifying
+
+    JPEGs are decoded in draft mode, the model resizes to its own input.
+    """
+    with open(path, "rb") as f:
+        image, _ = decode_image(f.read(), max(THUMBNAIL_SIZE))
+    image.thumbnail(THUMBNAIL_SIZE)
+    return image
+
+
+class ThumbnailCache:
+    """Decoded display-size images by path, least recently used evicted
+
+    Filled by the worker thread and read by the Tk thread, so selecting an
+    image already opened or scanned shows it without reading the file.
+    """
+
+    def __init__(self, max_entries=THUMBNAIL_CACHE_SIZE):
+        self.max_entries = max_entries
+        self._images = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, path):
+        with self._lock:
+            image = self._images.get(path)
+            if image is not None:
+                self._images.move_to_end(path)
+            return image
+
+    def put(self, path, image):
+        with self._lock:
+            self._images[path] = image
+            self._images.move_to_end(path)
+            while len(self._images) > self.max_entries:
+                self._images.popitem(last=False)
+
+    def load(self, path):
+        image = self.get(path)
+        if image is None:
+            image = load_image(path)
+            self.put(path, image)
+        return image
+
+
+class RecognitionWorker:
+    """Loads the model and runs every job off the Tk thread
+
+    The model loads on a thread of its own, so images open meanwhile. Jobs
+    run one at a time in submission order. Their outcomes are put on
+    `results` as (kind, payload) tuples for the Tk thread to pick up, Tk
+    widgets are never touched from here.
+    """
+
+    def __init__(self, thumbnails, backend="yolo", weights_path="model/cls_v0.0.pt"):
+        self.thumbnails = thumbnails
+        self.backend = backend
+        self.weights_path = weights_path
+        self.model = None
+        self.results = queue.Queue()
+        self.cancel_scan = threading.Event()
+        self._jobs = queue.Queue()
+        self._thread = threading.Thread(
+            target=self._run, name="recognition", daemon=True
+        )
+        self._loader = threading.Thread(
+            target=self._load_model, name="model-load", daemon=True
+        )
+
+    def start(self):
+        self._thread.start()
+        self._loader.start()
+
+    def submit(self, job, *args):
+        self._jobs.put((job, args))
+
+    def _run(self):
+        while True:
+            job, args = self._jobs.get()
+            try:
+                job(*args)
+            except Exception as e:
+                self.results.put(("error", str(e)))
+
+    def _load_model(self):
+        # recognition and scans are only offered once this reports back
+        try:
+            self.model = ModelFactory.create(
+                self.backend, weights_path=self.weights_path
+            )
+        except Exception as e:
+            self.results.put(("error", f"Failed to load model: {e}"))
+            return
+        self.results.put(("model_ready", None))
+
+    def open_image(self, path):
+        self.results.put(("image", (path, self.thumbnails.load(path))))
+
+    def recognize(self, path):
+        prediction = self.model.predict_batch([self.thumbnails.load(path)])[0]
+        self.results.put(("prediction", (path, prediction)))
+
+    def scan_folder(self, folder):
+        self.cancel_scan.clear()
+        paths = list(find_images([folder]))
+        self.results.put(("scan_started", len(paths)))
+        done = 0
+        for start in range(0, len(paths), SCAN_BATCH_SIZE):
+            if self.cancel_scan.is_set():
+                break
+            batch, images = [], []
+            for path in paths[start : start + SCAN_BATCH_SIZE]:
+                try:
+                    images.append(self.thumbnails.load(path))
+                    batch.append(path)
+                except Exception as e:
+                    self.results.put(("scan_failed", (path, str(e))))
+            predictions = self.model.predict_batch(images) if images else []
+            done += len(paths[start : start + SCAN_BATCH_SIZE])
+            self.results.put(("scan_batch", (list(zip(batch, predictions)), done)))
+        self.results.put(("scan_finished", done))
 
 
 class OrdnanceApp:
-    def __init__(self, root):
+    def __init__(self, root, backend="yolo", weights_path="model/cls_v0.0.pt"):
         self.root = root
         self.root.title("Ordnance Recognition Demo")
         self.root.geometry("800x600")  # Make window bigger: 800x600 pixels
 
         self.image_path = None  # Store path of the loaded image
+        self.model_ready = False
+        self.scanning = False
+        self.scanned_paths = []  # Listbox rows to image paths
+
+        self.thumbnails = ThumbnailCache()
+        self.worker = RecognitionWorker(self.thumbnails, backend, weights_path)
+
+        buttons = tk.Frame(root)
+        buttons.pack(pady=10)
 
         # Button to upload image
         self.upload_btn = Button(
-            root, text="Upload Projectile Photo", command=self.upload_image
+            buttons, text="Upload Projectile Photo", command=self.upload_image
         )
-        self.upload_btn.pack(pady=10)
-
-        # Label to show the image
-        self.image_label = Label(root)
-        self.image_label.pack(pady=10)
+        self.upload_btn.pack(side=tk.LEFT, padx=5)
 
         # Button to run recognition on loaded image
         self.recognize_btn = Button(
-            root,
+            buttons,
             text="Run Recognition",
             command=self.run_recognition,
             state=tk.DISABLED,
         )
-        self.recognize_btn.pack(pady=10)
+        self.recognize_btn.pack(side=tk.LEFT, padx=5)
+
+        # Buttons to classify every image of a folder
+        self.scan_btn = Button(
+            buttons, text="Scan Folder", command=self.scan_folder, state=tk.DISABLED
+        )
+        self.scan_btn.pack(side=tk.LEFT, padx=5)
+        self.cancel_btn = Button(
+            buttons, text="Cancel Scan", command=self.cancel_scan, state=tk.DISABLED
+        )
+        self.cancel_btn.pack(side=tk.LEFT, padx=5)
+
+        # Model loading, scan progress and errors
+        self.status_label = Label(root, text="Loading model...")
+        self.status_label.pack()
+        self.progress = ttk.Progressbar(root, mode="determinate", length=600)
+        self.progress.pack(pady=5)
+
+        # Label to show the image
+        self.image_label = Label(root)
+        self.image_label.pack(pady=10)
 
         # Label for displaying model result
         self.result_label = Label(root, text="", justify="left")
-        self.result_label.pack(pady=10)
+        self.result_label.pack(pady=5)
+
+        # Results of the folder scan, selecting one shows its image
+        results = tk.Frame(root)
+        results.pack(fill=tk.BOTH, expand=True, padx=10, pady=5)
+        scrollbar = Scrollbar(results)
+        scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        self.results_list = Listbox(results, height=6, yscrollcommand=scrollbar.set)
+        self.results_list.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        scrollbar.config(command=self.results_list.yview)
+        self.results_list.bind("<<ListboxSelect>>", self.show_scanned_image)
+
+        self.worker.start()
+        self.root.after(POLL_MS, self.poll_results)
 
     def upload_image(self):
         # Open file dialog to select image
         file_path = filedialog.askopenfilename(
-            filetypes=[("Image files", "*.jpg *.jpeg *.png *.bmp *.gif")]
+            filetypes=[("Image files", "*.jpg *.jpeg *.png *.bmp *.gif *.webp")]
         )
         if not file_path:
             return
 
-        self.image_path = file_path
-
-        # Load and display image
-        img = Image.open(file_path)
-        img.thumbnail((600, 400))  # Resize larger for display in bigger window
-        img_tk = ImageTk.PhotoImage(img)
-        self.image_label.configure(image=img_tk)
-        self.image_label.image = img_tk  # Keep reference to avoid garbage collection
-
-        # Clear previous result and enable recognition button
+        # Clear previous result, the image shows once decoded
         self.result_label.configure(text="")
-        self.recognize_btn.config(state=tk.NORMAL)
+        self.select_image(file_path)
 
     def run_recognition(self):
         if self.image_path:
-            result = model_inference(self.image_path)
-            confidence_scores = result[0].probs.top1conf
-            result_text = f"Result: {result[0].names[result[0].probs.top1]} {float(confidence_scores):.2f}"
-            self.result_label.configure(text=result_text)
+            self.result_label.configure(text="Recognizing...")
+            self.recognize_btn.config(state=tk.DISABLED)
+            self.worker.submit(self.worker.recognize, self.image_path)
         else:
             self.result_label.configure(text="Please upload an image first.")
 
+    def scan_folder(self):
+        folder = filedialog.askdirectory()
+        if not folder:
+            return
+        self.scanning = True
+        self.scanned_paths = []
+        self.results_list.delete(0, tk.END)
+        self.worker.submit(self.worker.scan_folder, folder)
+        self.update_buttons()
+
+    def cancel_scan(self):
+        self.worker.cancel_scan.set()
+        self.cancel_btn.config(state=tk.DISABLED)
+
+    def show_scanned_image(self, event=None):
+        selection = self.results_list.curselection()
+        if selection:
+            self.result_label.configure(text=self.results_list.get(selection[0]))
+            self.select_image(self.scanned_paths[selection[0]])
+
+    def select_image(self, path):
+        self.image_path = path
+        image = self.thumbnails.get(path)
+        if image is not None:
+            self.show_image(image)
+        else:
+            # behind a running scan the worker only gets to it afterwards
+            self.image_label.configure(image="")
+            self.worker.submit(self.worker.open_image, path)
+        self.update_buttons()
+
+    def show_image(self, image):
+        img_tk = ImageTk.PhotoImage(image)
+        self.image_label.configure(image=img_tk)
+        self.image_label.image = img_tk  # Keep reference to avoid garbage collection
+
+    def update_buttons(self):
+        idle = self.model_ready and not self.scanning
+        self.recognize_btn.config(
+            state=tk.NORMAL if idle and self.image_path else tk.DISABLED
+        )
+        self.scan_btn.config(state=tk.NORMAL if idle else tk.DISABLED)
+        self.cancel_btn.config(state=tk.NORMAL if self.scanning else tk.DISABLED)
+
+    def poll_results(self):
+        """Apply what the worker finished since the last poll, on the Tk thread"""
+        try:
+            while True:
+                kind, payload = self.worker.results.get_nowait()
+                self.handle_result(kind, payload)
+        except queue.Empty:
+            pass
+        self.root.after(POLL_MS, self.poll_results)
+
+    def handle_result(self, kind, payload):
+        if kind == "model_ready":
+            self.model_ready = True
+            self.status_label.configure(text="Model loaded")
+        elif kind == "image":
+            path, image = payload
+            if path == self.image_path:
+                self.show_image(image)
+        elif kind == "prediction":
+            path, prediction = payload
+            if path == self.image_path:
+                self.result_label.configure(
+                    text=f"Result: {prediction.top_name} {prediction.top_conf:.2f}"
+                )
+        elif kind == "scan_started":
+            self.progress.configure(maximum=max(payload, 1), value=0)
+            self.status_label.configure(text=f"Scanning {payload} images...")
+        elif kind == "scan_batch":
+            predictions, done = payload
+            for path, prediction in predictions:
+                self.scanned_paths.append(path)
+                self.results_list.insert(
+                    tk.END,
+                    f"{prediction.top_name} {prediction.top_conf:.2f}  {path}",
+                )
+            self.progress.configure(value=done)
+        elif kind == "scan_failed":
+            path, error = payload
+            self.scanned_paths.append(path)
+            self.results_list.insert(tk.END, f"unreadable  {path}")
+        elif kind == "scan_finished":
+            self.scanning = False
+            self.status_label.configure(text=f"Scanned {payload} images")
+        elif kind == "error":
+            self.scanning = False
+            self.status_label.configure(text=f"Error: {payload}")
+        self.update_buttons()
+
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Ordnance recognition demo")
+    parser.add_argument("--backend", default="yolo", choices=MODEL_TYPES)
+    parser.add_argument("--weights", default="model/cls_v0.0.pt")
+    args = parser.parse_args()
+
     root = tk.Tk()
-    app = OrdnanceApp(root)
+    app = OrdnanceApp(root, args.backend, args.weights)
     root.mainloop()
@@ -1,8 +1,17 @@
 from abc import ABC, abstractmethod
-from typing import Any
+from typing import Any, List, NamedTuple
+
+
+class Prediction(NamedTuple):
+    top_name: str
+    top_conf: float
 
 
 class BaseModel(ABC):
     @abstractmethod
     def predict(self, image: Any) -> Any:
         pass
+
+    @abstractmethod
+    def predict_batch(self, images: List[Any]) -> List[Prediction]:
+        pass
@@ -0,0 +1,153 @@
+"""Export the classifier to ONNX and check the export against ultralytics
+
+python -m model.export --weights model/cls_v0.0.pt
+python -m model.export --weights model/cls_v0.0.pt --verify model/cls_v0.0.onnx --images photos/
+python -m model.export --check
+"""
+
+import argparse
+import importlib.util
+import json
+import shutil
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import List, Optional
+
+import numpy as np
+from PIL import Image
+
+IMAGE_SUFFIXES = {".jpg", ".jpeg", ".png", ".bmp", ".webp"}
+
+
+def export_onnx(
+    weights: str,
+    output: Optional[str] = None,
+    imgsz: Optional[int] = None,
+    dynamic: bool = True,
+) -> str:
+    """Write an ONNX copy of `weights`, next to it unless `output` is given"""
+    from ultralytics import YOLO
+
+    model = YOLO(weights)
+    kwargs = {"imgsz": imgsz} if imgsz else {}
+    exported = model.export(format="onnx", dynamic=dynamic, simplify=True, **kwargs)
+    if output and Path(output).resolve() != Path(exported).resolve():
+        shutil.move(exported, output)
+        exported = output
+    return str(exported)
+
+
+def load_images(folder: Optional[str], count: int, seed: int = 0) -> List[Image.Image]:
+    """Images from `folder`, or `count` synthetic ones of mixed sizes"""
+    if folder:
+        paths = sorted(
+            p for p in Path(folder).rglob("*") if p.suffix.lower() in IMAGE_SUFFIXES
+        )
+        return [Image.open(p).convert("RGB") for p in paths[:count]]
+    rng = np.random.default_rng(seed)
+    images = []
+    for _ in range(count):
+        height, width = rng.integers(48, 640, size=2)
+        y, x = np.mgrid[0:height, 0:width]
+        base = np.stack([x * 255 / width, y * 255 / height, (x + y) % 256], axis=-1)
+        noise = rng.normal(0, 20, base.shape)
+        images.append(
+            Image.fromarray(np.clip(base + noise, 0, 255).astype(np.uint8), "RGB")
+        )
+    return images
+
+
+def verify(weights: str, onnx_path: str, images: List[Image.Image]) -> dict:
+    """Compare class probabilities of the ONNX export with ultralytics'"""
+    from model.onnxModel import ONNXModel
+    from model.yoloModel import YOLOModel
+
+    reference = YOLOModel(weights)
+    candidate = ONNXModel(onnx_path)
+
+    started = time.perf_counter()
+    expected = np.stack(
+        [
+            r.probs.data.cpu().numpy()
+            for r in reference.model.predict(images, verbose=False)
+        ]
+    )
+    reference_ms = (time.perf_counter() - started) * 1000 / len(images)
+
+    started = time.perf_counter()
+    actual = candidate.predict_proba(images)
+    candidate_ms = (time.perf_counter() - started) * 1000 / len(images)
+
+    return {
+        "images": len(images),
+        "max_abs_diff": float(np.abs(expected - actual).max()),
+        "top1_agreement": float((expected.argmax(1) == actual.argmax(1)).mean()),
+        "ultralytics_ms_per_image": reference_ms,
+        "onnx_ms_per_image": candidate_ms,
+    }
+
+
+def check_parity(
+    weights: str, folder: Optional[str], count: int, atol: float
+) -> Optional[dict]:
+    """Export `weights` to a temporary file and verify it
+
+    Returns None when the check cannot run here: the weights are not
+    shipped with every checkout, and ultralytics and onnxruntime are
+    optional. The export works on a copy so no .onnx next to `weights` is
+    touched.
+    """
+    if not Path(weights).is_file():
+        print(f"Skipping the ONNX parity check, no weights at {weights}")
+        return None
+    for module in ("ultralytics", "onnxruntime", "onnx"):
+        if importlib.util.find_spec(module) is None:
+            print(f"Skipping the ONNX parity check, {module} is not installed")
+            return None
+
+    with tempfile.TemporaryDirectory() as tmp:
+        copy = shutil.copy(weights, tmp)
+        onnx_path = export_onnx(copy, str(Path(tmp) / "model.onnx"))
+        return verify(copy, onnx_path, load_images(folder, count))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--weights", default="model/cls_v0.0.pt")
+    parser.add_argument("--output", help="path of the .onnx file to write")
+    parser.add_argument("--imgsz", type=int, help="input size, default from weights")
+    parser.add_argument("--static", action="store_true", help="fix the batch size to 1")
+    parser.add_argument(
+        "--verify", metavar="ONNX", help="compare this export instead of exporting"
+    )
+    parser.add_argument(
+        "--check",
+        action="store_true",
+        help="export to a temporary file and verify it, skipped without weights",
+    )
+    parser.add_argument("--images", help="folder of images to verify on")
+    parser.add_argument("--count", type=int, default=32)
+    parser.add_argument("--atol", type=float, default=1e-4)
+    args = parser.parse_args()
+
+    if args.check:
+        report = check_parity(args.weights, args.images, args.count, args.atol)
+        if report is None:
+            return
+    elif not args.verify:
+        print(export_onnx(args.weights, args.output, args.imgsz, not args.static))
+        return
+    else:
+        images = load_images(args.images, args.count)
+        if not images:
+            sys.exit(f"No images found in {args.images}")
+        report = verify(args.weights, args.verify, images)
+    print(json.dumps(report, indent=2))
+    if report["max_abs_diff"] > args.atol or report["top1_agreement"] < 1.0:
+        sys.exit(f"Export does not match ultralytics within {args.atol}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,17 +1,426 @@
-from modelFactory import ModelFactory
+"""Classify directories of field photos in bulk
+
+python -m model.main photos/ --output results.csv
+python -m model.main photos/ archive/ --output results.parquet --backend onnx --weights model/cls_v0.0.onnx
+python -m model.main photos/ --db
+
+Images are decoded by a pool of processes while the model classifies the
+previous batch. Results are written after every batch, to CSV, to a
+directory of Parquet files (one per batch), or as found items into
+DATABASE_URL. Every written image is recorded in a checkpoint file, so a
+run that is stopped resumes where it left off when started again with the
+same arguments.
+"""
+
+import argparse
+import concurrent.futures
+import csv
+import multiprocessing
+import os
+import sys
+import time
+from collections import deque
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Iterable, Iterator, List, NamedTuple, Optional, Sequence, Set
+
 from PIL import Image
 
+from model.modelFactory import MODEL_TYPES, ModelFactory
+
+IMAGE_SUFFIXES = {".jpg", ".jpeg", ".png", ".bmp", ".webp", ".heic", ".heif"}
+
+RESULT_COLUMNS = ("path", "top_name", "top_conf", "lat", "lon", "error")
+
+
+class Decoded(NamedTuple):
+    path: str
+    image: Optional[Image.Image]
+    lat: Optional[float]
+    lon: Optional[float]
+    error: Optional[str]
+
+
+class Result(NamedTuple):
+    path: str
+    top_name: Optional[str]
+    top_conf: Optional[float]
+    lat: Optional[float]
+    lon: Optional[float]
+    error: Optional[str]
+
+
+def find_images(roots: Sequence[str]) -> Iterator[str]:
+    """Image files under `roots`, in a stable order across runs"""
+    for root in roots:
+        if os.path.isfile(root):
+            yield root
+            continue
+        for folder, dirs, files in os.walk(root):
+            dirs.sort()
+            for name in sorted(files):
+                if Path(name).suffix.lower() in IMAGE_SUFFIXES:
+                    yield os.path.join(folder, name)
+
+
+def decode(path: str, size: int) -> Decoded:
+    """Read one photo, its EXIF GPS and pixels scaled down for the model
+
+    The shorter side is resized to `size`, the same bilinear resize the
+    model's preprocessing starts with, so only small images travel back
+    from the decoding processes.
+    """
+    from backend.utils.geo import valid_coordinates
+    from backend.utils.imaging import decode_image
+
+    try:
+        with open(path, "rb") as f:
+            image, gps = decode_image(f.read(), size)
+        scale = size / min(image.size)
+        if scale < 1:
+            image = image.resize(
+                (round(image.width * scale), round(image.height * scale)),
+                Image.Resampling.BILINEAR,
+            )
+    except Exception as e:
+        return Decoded(path, None, None, None, f"{type(e).__name__}: {e}")
+    # e.g. 0/0 EXIF rationals, saved without coordinates like missing GPS
+    lat, lon = gps if gps and valid_coordinates(*gps) else (None, None)
+    return Decoded(path, image, lat, lon, None)
+
+
+def decode_many(paths: List[str], size: int) -> List[Decoded]:
+    return [decode(path, size) for path in paths]
+
+
+class Checkpoint:
+    """Append-only list of the images whose results were written
+
+    A line is added only after the results of its batch are written, so an
+    interrupted run redoes at most the batch in flight.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.done: Set[str] = set()
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                self.done = {line.rstrip("\n") for line in f if line.strip()}
+        self._file = open(path, "a", encoding="utf-8")
+
+    def __contains__(self, image_path: str) -> bool:
+        return image_path in self.done
+
+    def add(self, image_paths: Iterable[str]):
+        for image_path in image_paths:
+            self._file.write(image_path + "\n")
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    def close(self):
+        self._file.close()
+
+
+class CSVSink:
+    def __init__(self, path: str):
+        exists = os.path.exists(path) and os.path.getsize(path) > 0
+        self._file = open(path, "a", newline="", encoding="utf-8")
+        self._writer = csv.writer(self._file)
+        if not exists:
+            self._writer.writerow(RESULT_COLUMNS)
+
+    def write(self, results: List[Result]):
+        self._writer.writerows(results)
+        # on disk before the checkpoint names these images as done
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    def close(self):
+        self._file.close()
+
+
+class ParquetSink:
+    """A directory of Parquet files, one per batch
+
+    A Parquet file is only readable once closed, so every batch goes to its
+    own file, written under a dot name and renamed into place, before the
+    checkpoint records it. A stopped run leaves complete files only. Read
+    the directory as one dataset, e.g. `pandas.read_parquet(path)`.
+    """
+
+    def __init__(self, path: str):
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            sys.exit("Parquet output needs pyarrow installed")
+
+        self.pa = pa
+        self.pq = pq
+        self.schema = pa.schema(
+            [
+                ("path", pa.string()),
+                ("top_name", pa.string()),
+                ("top_conf", pa.float64()),
+                ("lat", pa.float64()),
+                ("lon", pa.float64()),
+                ("error", pa.string()),
+            ]
+        )
+        self.path = path
+        os.makedirs(path, exist_ok=True)
+        self._prefix = f"part-{datetime.now():%Y%m%d-%H%M%S}-{os.getpid()}"
+        self._parts = 0
+
+    def write(self, results: List[Result]):
+        columns = list(zip(*results))
+        table = self.pa.Table.from_arrays(
+            [self.pa.array(values) for values in columns], schema=self.schema
+        )
+        name = f"{self._prefix}-{self._parts:06d}.parquet"
+        # dot files are skipped by Parquet dataset readers until renamed
+        partial = os.path.join(self.path, "." + name)
+        self.pq.write_table(table, partial)
+        with open(partial, "rb") as f:
+            os.fsync(f.fileno())
+        os.replace(partial, os.path.join(self.path, name))
+        self._parts += 1
+
+    def close(self):
+        pass
+
+
+class DatabaseSink:
+    """Confident detections of known item types as found items
+
+    Same rules as POST /api/image: the top class must reach
+    MIN_PREDICTION_CONFIDENCE and match an item type title, and a report
+    near a recent found item of its type is merged into it as a sighting.
+    Photos without GPS are saved without coordinates rather than random
+    ones. Every batch is committed before the checkpoint records it.
+    """
+
+    def __init__(self):
+        from backend.config import get_settings
+        from backend.db import crud, schemas
+        from backend.db.database import SessionLocal
+        from backend.db.item_types import item_type_registry
+        from backend.db.writer import found_item_writer, queue_found_items
+        from backend.dedup import recent_detections
+
+        self.schemas = schemas
+        self.item_types = item_type_registry
+        self.writer = found_item_writer
+        self.queue_found_items = queue_found_items
+        self.min_confidence = get_settings().MIN_PREDICTION_CONFIDENCE
+        self.saved = 0
+        self.merged = 0
+
+        # reports of this run merge with items the API saved lately as well
+        now = datetime.now(timezone.utc).replace(tzinfo=None)
+        since = now - timedelta(seconds=recent_detections.window_s)
+        db = SessionLocal()
+        try:
+            recent_detections.load(crud.get_recent_found_items(db, since), now)
+        finally:
+            db.close()
+
+    def write(self, results: List[Result]):
+        objs = []
+        for result in results:
+            if result.error or result.top_conf < self.min_confidence:
+                continue
+            item_type = self.item_types.get_by_title(result.top_name)
+            if item_type is not None:
+                objs.append(
+                    self.schemas.FoundItemCreate(
+                        lat=result.lat, lon=result.lon, type_id=item_type.id
+                    )
+                )
+        if not objs:
+            return
+        saved, merged = self.queue_found_items(objs)
+        # flushed right here rather than behind, the checkpoint comes next
+        while self.writer.queue_depth:
+            self.writer.flush()
+        self.saved += saved
+        self.merged += merged
+
+    def close(self):
+        print(
+            f"Saved {self.saved} found items and {self.merged} sightings",
+            file=sys.stderr,
+        )
+
+
+def create_sink(output: Optional[str], db: bool):
+    if db:
+        return DatabaseSink()
+    if output.endswith(".csv"):
+        return CSVSink(output)
+    if output.endswith(".parquet"):
+        return ParquetSink(output)
+    sys.exit(f"Unknown output format of '{output}', expected .csv or .parquet")
+
+
+class Progress:
+    """Prints images done, images/sec and the time left at most every `every` s"""
+
+    def __init__(self, total: int, skipped: int = 0, every: float = 5.0):
+        self.total = total
+        self.skipped = skipped
+        self.every = every
+        self.done = 0
+        self.failed = 0
+        self.started = time.perf_counter()
+        self._printed = self.started
+
+    def update(self, done: int, failed: int):
+        self.done += done
+        self.failed += failed
+        now = time.perf_counter()
+        if now - self._printed >= self.every:
+            self._printed = now
+            self.print()
+
+    @property
+    def rate(self) -> float:
+        elapsed = time.perf_counter() - self.started
+        return self.done / elapsed if elapsed > 0 else 0.0
+
+    def print(self, final: bool = False):
+        left = self.total - self.done
+        eta = f", {left / self.rate:.0f} s left" if self.rate and not final else ""
+        print(
+            f"{self.done}/{self.total} images, {self.rate:.1f} images/s, "
+            f"{self.failed} unreadable{eta}"
+            + (f" ({self.skipped} done in earlier runs)" if self.skipped else ""),
+            file=sys.stderr,
+            flush=True,
+        )
+
+
+def classify(
+    model,
+    paths: List[str],
+    sink,
+    checkpoint: Checkpoint,
+    progress: Progress,
+    batch_size: int = 32,
+    workers: int = 0,
+):
+    """Decode `paths` in worker processes, classify and write them in batches
+
+    At most a few batches are decoded ahead of the model, so memory stays
+    bounded however many images there are.
+    """
+    size = model.input_size
+    workers = workers or os.cpu_count() or 1
+    chunk = max(1, batch_size // workers)
+    # spawn: forking a process that already runs torch or ONNX Runtime
+    # threads can deadlock the children
+    context = multiprocessing.get_context("spawn")
+    with concurrent.futures.ProcessPoolExecutor(workers, mp_context=context) as pool:
+        pending = deque()
+        next_path = 0
+        batch: List[Decoded] = []
+
+        def submit():
+            nonlocal next_path
+            while next_path < len(paths) and len(pending) < workers * 4:
+                pending.append(
+                    pool.submit(decode_many, paths[next_path : next_path + chunk], size)
+                )
+                next_path += chunk
+
+        submit()
+        while pending:
+            batch.extend(pending.popleft().result())
+            submit()
+            if len(batch) >= batch_size or not pending:
+                _classify_batch(model, batch, sink, checkpoint, progress)
+                batch = []
+
+
+def _classify_batch(model, batch, sink, checkpoint, progress):
+    readable = [decoded for decoded in batch if decoded.image is not None]
+    predictions = iter(
+        model.predict_batch([decoded.image for decoded in readable]) if readable else []
+    )
+    results = []
+    for decoded in batch:
+        if decoded.image is None:
+            results.append(Result(decoded.path, None, None, None, None, decoded.error))
+            continue
+        prediction = next(predictions)
+        results.append(
+            Result(
+                decoded.path,
+                prediction.top_name,
+                prediction.top_conf,
+                decoded.lat,
+                decoded.lon,
+                None,
+            )
+        )
+    sink.write(results)
+    checkpoint.add(decoded.path for decoded in batch)
+    progress.update(len(batch), len(batch) - len(readable))
+
 
-def identify(photo):
-    pass
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__.splitlines()[0],
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="\n".join(__doc__.splitlines()[2:5]),
+    )
+    parser.add_argument("paths", nargs="+", help="image files or directories")
+    output = parser.add_mutually_exclusive_group(required=True)
+    output.add_argument("--output", help="results .csv file or .parquet directory")
+    output.add_argument(
+        "--db", action="store_true", help="save found items to DATABASE_URL"
+    )
+    parser.add_argument("--backend", default="yolo", choices=MODEL_TYPES)
+    parser.add_argument("--weights", default="model/cls_v0.0.pt")
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument(
+        "--workers", type=int, default=0, help="decoding processes, 0 is one per CPU"
+    )
+    parser.add_argument(
+        "--checkpoint",
+        help="file of images already done, default next to the output",
+    )
+    parser.add_argument("--progress-every", type=float, default=5.0, metavar="SECONDS")
+    args = parser.parse_args()
 
+    checkpoint_path = args.checkpoint or (
+        "found_items.checkpoint" if args.db else args.output + ".checkpoint"
+    )
+    checkpoint = Checkpoint(checkpoint_path)
+    found = list(find_images(args.paths))
+    paths = [path for path in found if path not in checkpoint]
+    print(
+        f"{len(found)} images found, {len(found) - len(paths)} already done "
+        f"according to {checkpoint_path}",
+        file=sys.stderr,
+    )
+    if not paths:
+        return
 
-img_path = ""
-model = ModelFactory.create("yolo", weights_path="model/cls_v0.0.pt")
-image = Image.open(img_path).convert("RGB")
-result = model.predict(image)
+    model = ModelFactory.create(args.backend, weights_path=args.weights)
+    sink = create_sink(args.output, args.db)
+    progress = Progress(len(paths), len(found) - len(paths), args.progress_every)
+    try:
+        classify(
+            model, paths, sink, checkpoint, progress, args.batch_size, args.workers
+        )
+    except KeyboardInterrupt:
+        print("Interrupted, run again to resume", file=sys.stderr)
+    finally:
+        sink.close()
+        checkpoint.close()
+        progress.print(final=True)
 
-top_conf = result[0].probs.top1conf
-top_name = result[0].names[result[0].probs.top1]
 
-print(f"Result: {top_name} {float(top_conf):.2f}")
+if __name__ == "__main__":
+    main()
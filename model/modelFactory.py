@@ -1,10 +1,22 @@
-from yoloModel import YOLOModel
+from model.baseModel import BaseModel
+
+# "onnx-int8" runs a model/quantize.py output, it is served like any ONNX file
+MODEL_TYPES = ("yolo", "onnx", "onnx-int8")
 
 
 class ModelFactory:
     @staticmethod
-    def create(model_type: str, **kwargs):
-        if model_type == "yolo":
-            return YOLOModel(**kwargs)
+    def create(model_type: str, **kwargs) -> BaseModel:
+        if model_type not in MODEL_TYPES:
+            raise ValueError(
+                f"Unknown model type '{model_type}', expected one of {MODEL_TYPES}"
+            )
+        # imported on demand, each backend pulls in its own heavy runtime
+        if model_type in ("onnx", "onnx-int8"):
+            from model.onnxModel import ONNXModel
+
+            return ONNXModel(**kwargs)
         else:
+            from model.yoloModel import YOLOModel
+
             return YOLOModel(**kwargs)
@@ -0,0 +1,94 @@
+import ast
+from typing import Any, Dict, List, Sequence
+
+import numpy as np
+from PIL import Image
+
+from model.baseModel import BaseModel, Prediction
+
+
+def preprocess(images: Sequence[Any], size: int) -> np.ndarray:
+    """Batch of images as the classifier's float32 NCHW input
+
+    Matches ultralytics' classification transforms: bilinear resize of the
+    shorter side to `size`, center crop to `size` x `size`, scale to [0, 1].
+    """
+    batch = np.empty((len(images), 3, size, size), dtype=np.float32)
+    for i, image in enumerate(images):
+        if not isinstance(image, Image.Image):
+            image = Image.fromarray(np.asarray(image, dtype=np.uint8))
+        if image.mode != "RGB":
+            image = image.convert("RGB")
+
+        width, height = image.size
+        if width <= height:
+            resized = (size, int(size * height / width))
+        else:
+            resized = (int(size * width / height), size)
+        if resized != image.size:
+            image = image.resize(resized, Image.Resampling.BILINEAR)
+
+        left = int(round((resized[0] - size) / 2.0))
+        top = int(round((resized[1] - size) / 2.0))
+        pixels = np.asarray(image)[top : top + size, left : left + size]
+        np.multiply(
+            pixels.transpose(2, 0, 1), 1 / 255.0, out=batch[i], casting="unsafe"
+        )
+    return batch
+
+
+class ONNXModel(BaseModel):
+    """Classifier exported to ONNX (see model/export.py), run with ONNX Runtime
+
+    Skips the ultralytics predictor entirely: preprocessing is a resize and
+    crop in PIL/NumPy and the session returns class probabilities directly.
+    Class names and input size are read from the metadata ultralytics
+    writes into the exported file.
+    """
+
+    def __init__(self, weights_path: str, threads: int = 0):
+        import onnxruntime as ort
+
+        options = ort.SessionOptions()
+        if threads:
+            options.intra_op_num_threads = threads
+        self.session = ort.InferenceSession(
+            weights_path, options, providers=["CPUExecutionProvider"]
+        )
+
+        model_input = self.session.get_inputs()[0]
+        self.input_name = model_input.name
+        # a static export fixes the batch dimension, a dynamic one names it
+        batch = model_input.shape[0]
+        self.max_batch = batch if isinstance(batch, int) else None
+
+        metadata = self.session.get_modelmeta().custom_metadata_map
+        self.names: Dict[int, str] = ast.literal_eval(metadata["names"])
+        imgsz = ast.literal_eval(metadata.get("imgsz", str(model_input.shape[2])))
+        self._input_size = int(max(imgsz) if isinstance(imgsz, list) else imgsz)
+
+    @property
+    def input_size(self) -> int:
+        return self._input_size
+
+    def predict_proba(self, images: Sequence[Any]) -> np.ndarray:
+        """Class probabilities, one row per image"""
+        batch = preprocess(images, self.input_size)
+        step = self.max_batch or len(batch)
+        return np.concatenate(
+            [
+                self.session.run(None, {self.input_name: batch[i : i + step]})[0]
+                for i in range(0, len(batch), step)
+            ]
+        )
+
+    def predict(self, image):
+        return self.predict_batch([image])[0]
+
+    def predict_batch(self, images) -> List[Prediction]:
+        probs = self.predict_proba(list(images))
+        top1 = probs.argmax(axis=1)
+        return [
+            Prediction(top_name=self.names[int(index)], top_conf=float(row[index]))
+            for index, row in zip(top1, probs)
+        ]
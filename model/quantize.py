@@ -0,0 +1,137 @@
+"""Quantize an ONNX export of the classifier to INT8
+
+Static quantization calibrates activation ranges on a folder of local
+images, dynamic quantization needs no calibration data but only covers the
+weights. Serve the result with MODEL_BACKEND=onnx-int8.
+
+python -m model.quantize --model model/cls_v0.0.onnx --calibration photos/
+python -m model.quantize --model model/cls_v0.0.onnx --mode dynamic
+"""
+
+import argparse
+import os
+import tempfile
+from pathlib import Path
+from typing import Iterator, List, Optional
+
+import numpy as np
+
+from model.export import load_images
+from model.onnxModel import ONNXModel, preprocess
+
+QUANTIZATION_MODES = ("static", "dynamic")
+
+
+class ImageCalibrationReader:
+    """Feeds preprocessed calibration images to the ONNX Runtime calibrator"""
+
+    def __init__(self, input_name: str, batches: List[np.ndarray]):
+        self.input_name = input_name
+        self._batches: Iterator[np.ndarray] = iter(batches)
+
+    def get_next(self) -> Optional[dict]:
+        batch = next(self._batches, None)
+        return None if batch is None else {self.input_name: batch}
+
+
+def _copy_metadata(source, target_path: str):
+    """Quantization drops the class names ultralytics stored in the export"""
+    import onnx
+
+    model = onnx.load(target_path)
+    existing = {prop.key for prop in model.metadata_props}
+    for prop in source.metadata_props:
+        if prop.key not in existing:
+            model.metadata_props.add(key=prop.key, value=prop.value)
+    onnx.save(model, target_path)
+
+
+def quantize(
+    model_path: str,
+    output: Optional[str] = None,
+    mode: str = "static",
+    calibration: Optional[str] = None,
+    calibration_count: int = 200,
+    per_channel: bool = True,
+) -> str:
+    """Write an INT8 copy of `model_path`, `<name>.int8.onnx` by default"""
+    if mode not in QUANTIZATION_MODES:
+        raise ValueError(f"Unknown quantization mode '{mode}'")
+
+    import onnx
+    from onnxruntime.quantization import (
+        CalibrationMethod,
+        QuantFormat,
+        QuantType,
+        quantize_dynamic,
+        quantize_static,
+    )
+    from onnxruntime.quantization.shape_inference import quant_pre_process
+
+    output = output or str(Path(model_path).with_suffix(".int8.onnx"))
+    source = onnx.load(model_path)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        # fold constants and infer shapes first, the quantizer relies on both
+        prepared = os.path.join(tmp, "prepared.onnx")
+        quant_pre_process(model_path, prepared)
+
+        if mode == "dynamic":
+            quantize_dynamic(
+                prepared,
+                output,
+                weight_type=QuantType.QInt8,
+                per_channel=per_channel,
+            )
+        else:
+            # a dynamic export leaves the spatial axes unnamed, take the
+            # input size from the metadata like the serving path does
+            fp32 = ONNXModel(model_path)
+            images = load_images(calibration, calibration_count)
+            if not images:
+                raise ValueError(f"No calibration images found in {calibration}")
+            batches = [preprocess([image], fp32.input_size) for image in images]
+            quantize_static(
+                prepared,
+                output,
+                ImageCalibrationReader(fp32.input_name, batches),
+                quant_format=QuantFormat.QDQ,
+                activation_type=QuantType.QUInt8,
+                weight_type=QuantType.QInt8,
+                per_channel=per_channel,
+                calibrate_method=CalibrationMethod.MinMax,
+            )
+
+    _copy_metadata(source, output)
+    return output
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--model", default="model/cls_v0.0.onnx", help="FP32 export")
+    parser.add_argument("--output", help="path of the INT8 .onnx file to write")
+    parser.add_argument("--mode", choices=QUANTIZATION_MODES, default="static")
+    parser.add_argument(
+        "--calibration",
+        help="folder of representative images, synthetic ones when omitted",
+    )
+    parser.add_argument("--count", type=int, default=200, help="calibration images")
+    parser.add_argument(
+        "--per-tensor", action="store_true", help="one weight scale per tensor"
+    )
+    args = parser.parse_args()
+
+    print(
+        quantize(
+            args.model,
+            args.output,
+            args.mode,
+            args.calibration,
+            args.count,
+            not args.per_tensor,
+        )
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -1,12 +1,33 @@
-from ultralytics import YOLO
-
-from model.baseModel import BaseModel
+from model.baseModel import BaseModel, Prediction
 
 
 class YOLOModel(BaseModel):
     def __init__(self, weights_path: str):
+        # ultralytics pulls in torch, which takes seconds to import; deferring
+        # it keeps importing this module (and the API) cheap
+        from ultralytics import YOLO
+
         self.model = YOLO(weights_path)
 
+    @property
+    def input_size(self) -> int:
+        """Square input resolution the classifier was trained with"""
+        imgsz = self.model.overrides.get("imgsz") or 224
+        if isinstance(imgsz, (list, tuple)):
+            imgsz = max(imgsz)
+        return int(imgsz)
+
     def predict(self, image):
         results = self.model.predict(image)
         return results
+
+    def predict_batch(self, images):
+        """Classify several images with a single forward pass"""
+        results = self.model.predict(list(images), verbose=False)
+        return [
+            Prediction(
+                top_name=str(result.names[result.probs.top1]),
+                top_conf=float(result.probs.top1conf),
+            )
+            for result in results
+        ]
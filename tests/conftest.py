@@ -0,0 +1,42 @@
+import os
+import tempfile
+
+# settings are read when backend modules are imported, point them at a
+# throwaway SQLite database before any test module imports one
+_db_dir = tempfile.mkdtemp(prefix="vanguard-tests-")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_db_dir, 'test.db')}"
+os.environ["ASYNC_DATABASE_URL"] = ""
+for name in ("POSTGRES_USER", "POSTGRES_PASSWORD", "POSTGRES_DB"):
+    os.environ.setdefault(name, "test")
+
+import pytest  # noqa: E402
+
+from backend.db import tables  # noqa: E402
+from backend.db.database import Base, SessionLocal, engine  # noqa: E402
+from backend.dedup import recent_detections  # noqa: E402
+
+
+@pytest.fixture
+def db():
+    Base.metadata.create_all(engine)
+    session = SessionLocal()
+    try:
+        yield session
+    finally:
+        session.close()
+        Base.metadata.drop_all(engine)
+
+
+@pytest.fixture
+def item_type(db):
+    row = tables.ItemType(title="landmines", explosion_radius=8.0)
+    db.add(row)
+    db.commit()
+    return row
+
+
+@pytest.fixture(autouse=True)
+def clear_recent_detections():
+    recent_detections.load([])
+    yield
+    recent_detections.load([])
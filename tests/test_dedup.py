@@ -0,0 +1,117 @@
+import math
+import uuid
+from datetime import datetime, timedelta
+
+import pytest
+
+from backend.db import schemas
+from backend.db.writer import found_item_writer, queue_found_items
+from backend.dedup import METERS_PER_DEG_LAT, RecentDetections, RecentItem
+
+T0 = datetime(2024, 6, 1, 12, 0, 0)
+LANDMINE, GRENADE = uuid.uuid4(), uuid.uuid4()
+
+
+@pytest.fixture
+def recent():
+    return RecentDetections(distance_m=25.0, window_s=900.0)
+
+
+def _north(lat, metres):
+    return lat + metres / METERS_PER_DEG_LAT
+
+
+def test_report_nearby_merges_into_the_first(recent):
+    first = uuid.uuid4()
+    assert recent.claim(first, LANDMINE, 50.0, 30.0, T0) is None
+    assert recent.claim(uuid.uuid4(), LANDMINE, _north(50.0, 10), 30.0, T0) == first
+    assert recent.stats() == {"items": 1, "merged": 1}
+
+
+def test_other_type_or_far_away_is_a_new_item(recent):
+    recent.claim(uuid.uuid4(), LANDMINE, 50.0, 30.0, T0)
+    assert recent.claim(uuid.uuid4(), GRENADE, 50.0, 30.0, T0) is None
+    assert recent.claim(uuid.uuid4(), LANDMINE, _north(50.0, 40), 30.0, T0) is None
+    assert len(recent) == 3
+
+
+def test_nearest_match_wins(recent):
+    near, far = uuid.uuid4(), uuid.uuid4()
+    recent.claim(far, LANDMINE, _north(50.0, -20), 30.0, T0)
+    recent.claim(near, LANDMINE, _north(50.0, 30), 30.0, T0)
+    assert recent.claim(uuid.uuid4(), LANDMINE, _north(50.0, 15), 30.0, T0) == near
+
+
+def test_reports_across_a_cell_edge_merge(recent):
+    edge = 1000 * recent.cell_deg
+    first = uuid.uuid4()
+    recent.claim(first, LANDMINE, edge - 5e-5, 0.0, T0)
+    assert recent.claim(uuid.uuid4(), LANDMINE, edge + 5e-5, 0.0, T0) == first
+
+
+def test_items_expire_after_the_window(recent):
+    recent.claim(uuid.uuid4(), LANDMINE, 50.0, 30.0, T0)
+    later = T0 + timedelta(seconds=901)
+    assert recent.claim(uuid.uuid4(), LANDMINE, 50.0, 30.0, later) is None
+    assert len(recent) == 1
+
+
+def test_a_sighting_extends_the_window(recent):
+    first = uuid.uuid4()
+    recent.claim(first, LANDMINE, 50.0, 30.0, T0)
+    assert (
+        recent.claim(uuid.uuid4(), LANDMINE, 50.0, 30.0, T0 + timedelta(seconds=600))
+        == first
+    )
+    assert (
+        recent.claim(uuid.uuid4(), LANDMINE, 50.0, 30.0, T0 + timedelta(seconds=1200))
+        == first
+    )
+
+
+def test_removed_item_is_not_matched(recent):
+    first = uuid.uuid4()
+    recent.claim(first, LANDMINE, 50.0, 30.0, T0)
+    recent.remove(first)
+    assert recent.claim(uuid.uuid4(), LANDMINE, 50.0, 30.0, T0) is None
+
+
+def test_load_keeps_only_recent_valid_items(recent):
+    kept = uuid.uuid4()
+    recent.load(
+        [
+            RecentItem(kept, LANDMINE, 50.0, 30.0, T0),
+            RecentItem(uuid.uuid4(), LANDMINE, 51.0, 30.0, T0 - timedelta(hours=1)),
+            RecentItem(uuid.uuid4(), LANDMINE, math.nan, 30.0, T0),
+        ],
+        now=T0,
+    )
+    assert len(recent) == 1
+    assert recent.claim(uuid.uuid4(), LANDMINE, 50.0, 30.0, T0) == kept
+
+
+def test_disabled_never_merges():
+    recent = RecentDetections(enabled=False)
+    recent.claim(uuid.uuid4(), LANDMINE, 50.0, 30.0, T0)
+    assert recent.claim(uuid.uuid4(), LANDMINE, 50.0, 30.0, T0) is None
+
+
+@pytest.mark.parametrize(
+    "lat,lon",
+    [(math.nan, 30.0), (50.0, math.nan), (math.inf, 30.0), (91.0, 30.0), (0.0, -181.0)],
+)
+def test_invalid_coordinates_are_rejected(recent, lat, lon):
+    with pytest.raises(ValueError):
+        recent.claim(uuid.uuid4(), LANDMINE, lat, lon, T0)
+    assert len(recent) == 0
+
+
+def test_queue_found_items_rejects_invalid_coordinates_before_queueing():
+    depth = found_item_writer.queue_depth
+    found_items = [
+        schemas.FoundItemCreate(lat=50.0, lon=30.0, type_id=LANDMINE),
+        schemas.FoundItemCreate(lat=math.nan, lon=30.0, type_id=LANDMINE),
+    ]
+    with pytest.raises(ValueError):
+        queue_found_items(found_items, T0)
+    assert found_item_writer.queue_depth == depth
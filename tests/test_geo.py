@@ -0,0 +1,111 @@
+import random
+
+import pytest
+
+from backend.db import crud, schemas
+from backend.spatial import GridIndex, found_item_index
+from backend.utils.geo import (
+    BBox,
+    bbox_around,
+    geohash_cover,
+    geohash_encode,
+    haversine_m,
+)
+
+# a city, and the corner where the first geohash bits of lat and lon flip
+CENTRES = [(50.4501, 30.5234), (0.0, 0.0)]
+
+
+def _random_bbox(rng):
+    lat, lon = rng.uniform(-80, 80), rng.uniform(-170, 170)
+    height, width = 10 ** rng.uniform(-4, 1), 10 ** rng.uniform(-4, 1)
+    return BBox(lat, lon, min(90.0, lat + height), min(180.0, lon + width))
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_geohash_cover_holds_every_point_of_the_box(seed):
+    rng = random.Random(seed)
+    bbox = _random_bbox(rng)
+    cover = geohash_cover(bbox)
+
+    assert 0 < len(cover) <= 16
+    points = [
+        (bbox.min_lat, bbox.min_lon),
+        (bbox.max_lat, bbox.max_lon),
+        (bbox.min_lat, bbox.max_lon),
+        (bbox.max_lat, bbox.min_lon),
+    ] + [
+        (
+            rng.uniform(bbox.min_lat, bbox.max_lat),
+            rng.uniform(bbox.min_lon, bbox.max_lon),
+        )
+        for _ in range(200)
+    ]
+    for lat, lon in points:
+        geohash = geohash_encode(lat, lon)
+        assert any(geohash.startswith(cell) for cell in cover), (lat, lon)
+
+
+def test_geohash_cover_of_the_whole_map():
+    cover = geohash_cover(BBox(-90.0, -180.0, 90.0, 180.0))
+    for lat, lon in [(-90.0, -180.0), (90.0, 180.0), (0.0, 0.0), (-45.0, 135.0)]:
+        assert any(geohash_encode(lat, lon).startswith(cell) for cell in cover)
+
+
+@pytest.fixture
+def points(db, item_type):
+    rng = random.Random(7)
+    objs = [
+        schemas.FoundItemCreate(
+            lat=lat + rng.uniform(-0.05, 0.05),
+            lon=lon + rng.uniform(-0.05, 0.05),
+            type_id=item_type.id,
+        )
+        for lat, lon in CENTRES
+        for _ in range(300)
+    ]
+    crud.create_found_items(db, objs)
+    # with the shared grid unloaded crud answers from the geohash column
+    assert not found_item_index.loaded
+    return crud.get_found_item_points(db)
+
+
+@pytest.fixture
+def grid(points):
+    index = GridIndex(cell_deg=0.01)
+    index.load(points)
+    return index
+
+
+@pytest.mark.parametrize("lat,lon", CENTRES)
+@pytest.mark.parametrize("radius_m", [50.0, 500.0, 3000.0])
+def test_grid_and_geohash_near_agree(db, points, grid, lat, lon, radius_m):
+    expected = {
+        point.id
+        for point in points
+        if haversine_m(lat, lon, point.lat, point.lon) <= radius_m
+    }
+
+    from_db = crud.get_found_items_near(db, lat, lon, radius_m)
+    from_grid = grid.near(lat, lon, radius_m)
+
+    assert {row.id for _, row in from_db} == expected
+    assert {point.id for _, point in from_grid} == expected
+    distances = [distance for distance, _ in from_db]
+    assert distances == sorted(distances)
+
+
+@pytest.mark.parametrize("lat,lon", CENTRES)
+@pytest.mark.parametrize("radius_m", [200.0, 2500.0])
+def test_grid_and_geohash_bbox_agree(db, points, grid, lat, lon, radius_m):
+    bbox = bbox_around(lat, lon, radius_m)
+    expected = {point.id for point in points if bbox.contains(point.lat, point.lon)}
+
+    from_db = crud.get_found_items_in_bbox(db, bbox, limit=len(points))
+    from_grid = grid.within(bbox)
+
+    assert {row.id for row in from_db} == expected
+    assert {point.id for point in from_grid} == expected
+    assert {point.id for point in crud.get_found_item_points_in_bbox(db, bbox)} == (
+        expected
+    )
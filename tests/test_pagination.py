@@ -0,0 +1,105 @@
+import uuid
+from datetime import datetime, timedelta
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from backend.api import items
+from backend.db import crud, schemas
+from backend.utils.pagination import decode_cursor, encode_cursor
+
+
+@pytest.fixture
+def client(db):
+    app = FastAPI()
+    app.include_router(items.router)
+    return TestClient(app)
+
+
+def _create(db, type_id, created_at, count=1):
+    objs = [
+        schemas.FoundItemCreate(
+            lat=50.0, lon=30.0, type_id=type_id, created_at=created_at
+        )
+        for _ in range(count)
+    ]
+    return crud.create_found_items(db, objs)
+
+
+def _walk(client, **params):
+    ids, cursor, pages = [], None, 0
+    while True:
+        query = dict(params, **({"cursor": cursor} if cursor else {}))
+        body = client.get("/api/items/found", params=query).json()
+        ids += [uuid.UUID(item["id"]) for item in body["items"]]
+        pages += 1
+        cursor = body["next_cursor"]
+        if cursor is None:
+            return ids, pages
+
+
+def test_cursor_round_trip():
+    created_at = datetime(2024, 1, 15, 10, 30, 0, 123456)
+    item_id = uuid.uuid4()
+    cursor = encode_cursor(created_at, item_id)
+    assert "=" not in cursor
+    assert decode_cursor(cursor) == (created_at, item_id)
+
+
+@pytest.mark.parametrize(
+    "cursor",
+    ["", "not a cursor", encode_cursor(datetime(2024, 1, 1), uuid.uuid4())[:-4]],
+)
+def test_decode_cursor_rejects_malformed(cursor):
+    with pytest.raises(ValueError):
+        decode_cursor(cursor)
+
+
+def test_pages_cover_every_row_once_newest_first(db, client, item_type):
+    start = datetime(2024, 1, 1)
+    # rows sharing a timestamp are ordered by id, pages split inside them
+    for minute in range(5):
+        _create(db, item_type.id, start + timedelta(minutes=minute), count=3)
+    expected = [
+        row.id
+        for row in sorted(
+            crud.get_found_items(db, 100), key=lambda row: (row.created_at, row.id)
+        )
+    ][::-1]
+
+    ids, pages = _walk(client, limit=4)
+    assert ids == expected
+    assert pages == 4
+
+
+def test_page_size_dividing_the_rows_ends_without_an_empty_page(db, client, item_type):
+    _create(db, item_type.id, datetime(2024, 1, 1), count=6)
+
+    ids, pages = _walk(client, limit=3)
+    assert len(set(ids)) == 6
+    assert pages == 2
+
+
+def test_filters_apply_across_pages(db, client, item_type):
+    start = datetime(2024, 1, 1)
+    for day in range(6):
+        _create(db, item_type.id, start + timedelta(days=day), count=2)
+
+    ids, _ = _walk(
+        client,
+        limit=3,
+        since=(start + timedelta(days=1)).isoformat(),
+        until=(start + timedelta(days=4)).isoformat(),
+    )
+    rows = crud.get_found_items_by_ids(db, ids)
+    assert len(rows) == 6
+    assert all(
+        start + timedelta(days=1) <= row.created_at < start + timedelta(days=4)
+        for row in rows
+    )
+
+
+def test_invalid_cursor_is_a_bad_request(client):
+    response = client.get("/api/items/found", params={"cursor": "garbage"})
+    assert response.status_code == 400
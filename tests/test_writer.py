@@ -0,0 +1,94 @@
+import uuid
+
+import pytest
+from sqlalchemy.exc import OperationalError
+
+from backend.db import crud, schemas, tables
+from backend.db.database import SessionLocal
+from backend.db.writer import FoundItemWriter
+from backend.dedup import recent_detections
+
+
+@pytest.fixture
+def writer(db):
+    return FoundItemWriter(SessionLocal, flush_size=8)
+
+
+def _found_item(item_type, lon=30.0):
+    return schemas.FoundItemCreate(lat=50.0, lon=lon, type_id=item_type.id)
+
+
+def _count(db):
+    db.expire_all()
+    return db.query(tables.FoundItem).count()
+
+
+def test_flush_inserts_queued_rows(db, writer, item_type):
+    ids = writer.enqueue_many([_found_item(item_type, i) for i in range(5)])
+    assert writer.flush() == 5
+    assert {row.id for row in crud.get_found_items_by_ids(db, ids)} == set(ids)
+    assert writer.stats()["dropped"] == 0
+
+
+def test_flush_is_capped_at_flush_size(db, writer, item_type):
+    writer.enqueue_many([_found_item(item_type, i) for i in range(20)])
+    assert writer.flush() == 8
+    assert writer.queue_depth == 12
+
+
+def test_rejected_rows_are_dropped_and_the_rest_inserted(db, writer, item_type):
+    taken = writer.enqueue(_found_item(item_type))
+    writer.flush()
+
+    ids = [uuid.uuid4() for _ in range(8)]
+    # two rows reusing a saved id fail the primary key
+    ids[2] = ids[6] = taken
+    writer.enqueue_many([_found_item(item_type, i) for i in range(8)], ids)
+
+    assert writer.flush() == 6
+    assert writer.stats()["dropped"] == 2
+    assert writer.queue_depth == 0
+    assert _count(db) == 7
+
+
+def test_dropped_item_is_forgotten_with_its_sightings(db, writer, item_type):
+    taken = writer.enqueue(_found_item(item_type, 40.0))
+    writer.flush()
+
+    # a report held by the dedup step whose insert fails the primary key
+    kept = uuid.uuid4()
+    recent_detections.claim(taken, item_type.id, 51.0, 30.0)
+    recent_detections.claim(kept, item_type.id, 52.0, 30.0)
+    writer.enqueue_many([_found_item(item_type), _found_item(item_type)], [taken, kept])
+    writer.enqueue_sighting(taken)
+    writer.enqueue_sighting(taken)
+    writer.enqueue_sighting(kept)
+
+    assert writer.flush() == 1
+    stats = writer.stats()
+    assert stats["dropped"] == 1
+    assert stats["dropped_sightings"] == 2
+    assert stats["sightings"] == 1
+    assert writer.queue_depth == 0
+    # later reports nearby are new items rather than merged into a lost one
+    assert recent_detections.claim(uuid.uuid4(), item_type.id, 51.0, 30.0) is None
+    assert recent_detections.claim(uuid.uuid4(), item_type.id, 52.0, 30.0) == kept
+
+
+def test_transient_error_keeps_the_rows_queued(db, writer, item_type, monkeypatch):
+    writer.enqueue_many([_found_item(item_type, i) for i in range(3)])
+    writer.enqueue_sighting(uuid.uuid4())
+
+    def lost_connection(*args, **kwargs):
+        raise OperationalError("INSERT", {}, Exception("connection lost"))
+
+    with monkeypatch.context() as patch:
+        patch.setattr(crud, "create_found_items", lost_connection)
+        with pytest.raises(OperationalError):
+            writer.flush()
+    assert writer.queue_depth == 4
+    assert writer.stats()["failed_flushes"] == 1
+
+    assert writer.flush() == 3
+    assert writer.stats()["dropped"] == 0
+    assert _count(db) == 3